@@ -0,0 +1,53 @@
+from logging.config import fileConfig
+
+from sqlalchemy import engine_from_config, pool
+
+from alembic import context, util
+from app.core.db_base import Base
+from app.core.db_config import DATABASE_URL, USE_SQL
+from app.db_models import wish  # noqa: F401  # регистрирует таблицы в metadata
+
+config = context.config
+
+if config.config_file_name is not None:
+    fileConfig(config.config_file_name)
+
+if not config.get_main_option("sqlalchemy.url"):
+    if not USE_SQL:
+        # memory:// — хранилище в процессе, мигрировать нечего
+        raise util.CommandError(
+            f"DATABASE_URL={DATABASE_URL!r} is not a SQL database; set it to the "
+            "database to migrate, e.g. DATABASE_URL=sqlite:///./wishes.db"
+        )
+    config.set_main_option("sqlalchemy.url", DATABASE_URL)
+
+target_metadata = Base.metadata
+
+
+def run_migrations_offline() -> None:
+    context.configure(
+        url=config.get_main_option("sqlalchemy.url"),
+        target_metadata=target_metadata,
+        literal_binds=True,
+        dialect_opts={"paramstyle": "named"},
+    )
+    with context.begin_transaction():
+        context.run_migrations()
+
+
+def run_migrations_online() -> None:
+    connectable = engine_from_config(
+        config.get_section(config.config_ini_section, {}),
+        prefix="sqlalchemy.",
+        poolclass=pool.NullPool,
+    )
+    with connectable.connect() as connection:
+        context.configure(connection=connection, target_metadata=target_metadata)
+        with context.begin_transaction():
+            context.run_migrations()
+
+
+if context.is_offline_mode():
+    run_migrations_offline()
+else:
+    run_migrations_online()
@@ -0,0 +1,33 @@
+"""add wish query indexes
+
+Revision ID: 3f1c9a2d7e41
+Revises: 6b2db7809e79
+Create Date: 2026-10-18 12:00:00.000000
+
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = "3f1c9a2d7e41"
+down_revision: Union[str, Sequence[str], None] = "6b2db7809e79"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_index("ix_wishes_owner_category", "wishes", ["owner", "category", "id"])
+    op.create_index(
+        "ix_wishes_owner_price", "wishes", ["owner", "price_estimate", "id"]
+    )
+    op.create_index("ix_wishes_owner_title", "wishes", ["owner", "title", "id"])
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index("ix_wishes_owner_title", table_name="wishes")
+    op.drop_index("ix_wishes_owner_price", table_name="wishes")
+    op.drop_index("ix_wishes_owner_category", table_name="wishes")
@@ -0,0 +1,31 @@
+"""add category price index
+
+Revision ID: 8d4e2b6f1a93
+Revises: 3f1c9a2d7e41
+Create Date: 2026-10-18 12:00:00.000000
+
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = "8d4e2b6f1a93"
+down_revision: Union[str, Sequence[str], None] = "3f1c9a2d7e41"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_index(
+        "ix_wishes_owner_category_price",
+        "wishes",
+        ["owner", "category", "price_estimate"],
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index("ix_wishes_owner_category_price", table_name="wishes")
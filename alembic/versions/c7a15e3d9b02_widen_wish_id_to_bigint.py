@@ -0,0 +1,34 @@
+"""widen wish id to bigint
+
+Revision ID: c7a15e3d9b02
+Revises: 8d4e2b6f1a93
+Create Date: 2026-10-18 12:00:00.000000
+
+"""
+
+from typing import Sequence, Union
+
+import sqlalchemy as sa
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = "c7a15e3d9b02"
+down_revision: Union[str, Sequence[str], None] = "8d4e2b6f1a93"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # В SQLite INTEGER и так 64-битный, а ALTER COLUMN не поддерживается
+    if op.get_bind().dialect.name == "sqlite":
+        return
+    op.alter_column("wishes", "id", existing_type=sa.Integer(), type_=sa.BigInteger())
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    if op.get_bind().dialect.name == "sqlite":
+        return
+    op.alter_column("wishes", "id", existing_type=sa.BigInteger(), type_=sa.Integer())
@@ -0,0 +1,85 @@
+"""add folded search columns
+
+Revision ID: e2f4a6c8b013
+Revises: c7a15e3d9b02
+Create Date: 2026-10-18 12:00:00.000000
+
+"""
+
+from typing import Sequence, Union
+
+import sqlalchemy as sa
+
+from alembic import op
+from app.core.search import search_text
+
+# revision identifiers, used by Alembic.
+revision: str = "e2f4a6c8b013"
+down_revision: Union[str, Sequence[str], None] = "c7a15e3d9b02"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+_wishes = sa.table(
+    "wishes",
+    sa.column("owner", sa.String),
+    sa.column("id", sa.BigInteger),
+    sa.column("title", sa.String),
+    sa.column("notes", sa.String),
+    sa.column("category", sa.String),
+    sa.column("search_text", sa.Text),
+    sa.column("category_folded", sa.String),
+)
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column(
+        "wishes",
+        sa.Column("search_text", sa.Text(), server_default="", nullable=False),
+    )
+    op.add_column(
+        "wishes", sa.Column("category_folded", sa.String(length=90), nullable=True)
+    )
+    # Свёртка — Python casefold, как у приложения: в SQL её не повторить,
+    # поэтому скрипт --sql (offline) колонки не заполняет
+    if op.get_context().as_sql:
+        return
+    bind = op.get_bind()
+    rows = bind.execute(
+        sa.select(
+            _wishes.c.owner,
+            _wishes.c.id,
+            _wishes.c.title,
+            _wishes.c.notes,
+            _wishes.c.category,
+        )
+    ).all()
+    update = (
+        _wishes.update()
+        .where(
+            _wishes.c.owner == sa.bindparam("b_owner"),
+            _wishes.c.id == sa.bindparam("b_id"),
+        )
+        .values(
+            search_text=sa.bindparam("b_text"),
+            category_folded=sa.bindparam("b_category"),
+        )
+    )
+    params = [
+        {
+            "b_owner": owner,
+            "b_id": wish_id,
+            "b_text": search_text(title, notes, category),
+            "b_category": None if category is None else category.casefold(),
+        }
+        for owner, wish_id, title, notes, category in rows
+    ]
+    if params:
+        bind.execute(update, params)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    with op.batch_alter_table("wishes") as batch:
+        batch.drop_column("category_folded")
+        batch.drop_column("search_text")
@@ -1,13 +1,16 @@
 from fastapi import Header, HTTPException
 
-from app.core.secrets import get_token_map
+from app.core.secrets import lookup_user
+from app.core.telemetry import span
 
 
-def get_current_user(token: str | None = Header(None, alias="X-Auth-Token")) -> str:
+async def get_current_user(
+    token: str | None = Header(None, alias="X-Auth-Token")
+) -> str:
     if token is None:
         raise HTTPException(status_code=401, detail="unauthorized")
-    users = get_token_map()
-    user = users.get(token)
+    with span("auth"):
+        user = lookup_user(token)
     if not user:
         raise HTTPException(status_code=401, detail="unauthorized")
     return user
@@ -0,0 +1,69 @@
+from __future__ import annotations
+
+from typing import Any, Callable, Literal, NamedTuple
+
+Record = dict[str, Any]
+
+
+class Change(NamedTuple):
+    """Операция пакета: create/update/delete желания wish_id; record — новые данные."""
+
+    op: Literal["create", "update", "delete"]
+    wish_id: int
+    record: Record | None = None
+
+
+# Почему запись не заменена: exists — новый id уже занят, missing — записи нет,
+# changed — запись изменилась после чтения (compare-and-swap)
+Conflict = Literal["exists", "missing", "changed"]
+
+
+class BatchConflict(NamedTuple):
+    """Почему пакет отклонён: номер операции и причина."""
+
+    index: int
+    # exists — id уже занят, missing — записи нет
+    reason: Literal["exists", "missing"]
+
+
+class BatchPlan(NamedTuple):
+    # id, которые были до пакета и исчезли после
+    deleted: list[int]
+    # Итоговые записи затронутых id (вставка или перезапись)
+    records: list[Record]
+
+
+def plan_batch(
+    changes: list[Change], exists: Callable[[int], bool]
+) -> BatchPlan | BatchConflict:
+    """
+    Проверяет операции по порядку поверх текущего состояния (exists) и сводит
+    их к итоговому эффекту: что удалить и что записать. Первая невыполнимая
+    операция отклоняет весь пакет.
+    """
+    after: dict[int, Record | None] = {}
+
+    def present(wish_id: int) -> bool:
+        if wish_id in after:
+            return after[wish_id] is not None
+        return exists(wish_id)
+
+    for index, change in enumerate(changes):
+        if change.op == "create":
+            if present(change.wish_id):
+                return BatchConflict(index, "exists")
+            after[change.wish_id] = change.record
+            continue
+        if not present(change.wish_id):
+            return BatchConflict(index, "missing")
+        if change.op == "delete":
+            after[change.wish_id] = None
+            continue
+        new_id = change.record["id"]
+        if new_id != change.wish_id:
+            if present(new_id):
+                return BatchConflict(index, "exists")
+            after[change.wish_id] = None
+        after[new_id] = change.record
+    deleted = [i for i, r in after.items() if r is None and exists(i)]
+    return BatchPlan(deleted, [r for r in after.values() if r is not None])
@@ -1 +1,3 @@
-_DB = {"wishes": []}
+from app.core.store import WishStore
+
+store = WishStore()
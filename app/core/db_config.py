@@ -2,8 +2,74 @@ from __future__ import annotations
 
 import os
 
-DATABASE_URL: str = os.getenv("DATABASE_URL", "sqlite:///./app.db")
+# memory:// — данные живут в процессе (WishStore); любой другой URL — SQLAlchemy
+DATABASE_URL: str = os.getenv("DATABASE_URL", "memory://")
+
+USE_SQL: bool = not DATABASE_URL.startswith("memory:")
 
 SQLITE_CONNECT_ARGS = (
     {"check_same_thread": False} if DATABASE_URL.startswith("sqlite") else {}
 )
+
+
+def _env_bool(name: str, default: bool) -> bool:
+    raw = os.getenv(name)
+    if raw is None:
+        return default
+    return raw.strip().lower() in ("1", "true", "yes", "on")
+
+
+# Сохранение in-memory хранилища: снимок раз в STORE_SNAPSHOT_INTERVAL_S и
+# журнал изменений между снимками. Пусто — данные живут только в процессе
+STORE_DATA_DIR: str = os.getenv("STORE_DATA_DIR", "")
+STORE_SNAPSHOT_INTERVAL_S = float(os.getenv("STORE_SNAPSHOT_INTERVAL_S", "300"))
+# fsync журнала на каждую запись: переживает отключение питания, но медленнее
+STORE_WAL_FSYNC = _env_bool("STORE_WAL_FSYNC", False)
+
+# Пул соединений: суммарно воркеры держат до
+# (DB_POOL_SIZE + DB_MAX_OVERFLOW) * число воркеров соединений к БД
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "5"))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "10"))
+DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", "30"))
+# Переподключение раньше, чем сервер/балансировщик закроет простаивающее соединение
+DB_POOL_RECYCLE = int(os.getenv("DB_POOL_RECYCLE", "1800"))
+DB_POOL_PRE_PING = _env_bool("DB_POOL_PRE_PING", True)
+
+# Применяются к каждому новому соединению SQLite: WAL пускает читателей
+# параллельно с писателем, busy_timeout ждёт блокировку вместо ошибки
+SQLITE_PRAGMAS = (
+    ("journal_mode", "WAL"),
+    ("synchronous", "NORMAL"),
+    ("busy_timeout", os.getenv("SQLITE_BUSY_TIMEOUT_MS", "5000")),
+    ("foreign_keys", "ON"),
+)
+
+
+def _is_memory_sqlite(url: str) -> bool:
+    return url.startswith("sqlite") and (
+        url.rstrip("/").endswith(":") or ":memory:" in url or "mode=memory" in url
+    )
+
+
+def engine_options(url: str) -> dict:
+    """Параметры пула для create_engine/create_async_engine по URL."""
+    if _is_memory_sqlite(url):
+        # Для in-memory SQLite пул фиксированный (одно соединение на поток)
+        return {}
+    return {
+        "pool_size": DB_POOL_SIZE,
+        "max_overflow": DB_MAX_OVERFLOW,
+        "pool_timeout": DB_POOL_TIMEOUT,
+        "pool_recycle": DB_POOL_RECYCLE,
+        "pool_pre_ping": DB_POOL_PRE_PING,
+    }
+
+
+def async_url(url: str) -> str:
+    """Тот же URL с async-драйвером: sqlite -> aiosqlite, postgresql -> psycopg 3."""
+    scheme, sep, rest = url.partition("://")
+    drivers = {"sqlite": "sqlite+aiosqlite", "postgresql": "postgresql+psycopg"}
+    return drivers.get(scheme, scheme) + sep + rest
+
+
+ASYNC_DATABASE_URL: str = async_url(DATABASE_URL)
@@ -1,13 +1,59 @@
 from __future__ import annotations
 
-from sqlalchemy import create_engine
+from typing import Any, AsyncIterator
+
+from sqlalchemy import Engine, create_engine, event
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
 from sqlalchemy.orm import Session, sessionmaker
+from sqlalchemy.pool import QueuePool
+
+from app.core.db_config import (
+    ASYNC_DATABASE_URL,
+    DATABASE_URL,
+    SQLITE_CONNECT_ARGS,
+    SQLITE_PRAGMAS,
+    USE_SQL,
+    engine_options,
+)
+
+
+def _apply_sqlite_pragmas(dbapi_connection: Any, _record: Any) -> None:
+    cursor = dbapi_connection.cursor()
+    try:
+        for name, value in SQLITE_PRAGMAS:
+            cursor.execute(f"PRAGMA {name}={value}")
+    finally:
+        cursor.close()
+
+
+def _configure(engine: Engine) -> Engine:
+    if engine.dialect.name == "sqlite":
+        event.listen(engine, "connect", _apply_sqlite_pragmas)
+    return engine
+
 
-from app.core.db_config import DATABASE_URL, SQLITE_CONNECT_ARGS
+def make_engine(url: str) -> Engine:
+    return _configure(
+        create_engine(url, connect_args=SQLITE_CONNECT_ARGS, **engine_options(url))
+    )
 
-engine = create_engine(DATABASE_URL, connect_args=SQLITE_CONNECT_ARGS)
+
+def make_async_engine(url: str):
+    engine = create_async_engine(url, **engine_options(url))
+    _configure(engine.sync_engine)
+    return engine
+
+
+engine = make_engine(DATABASE_URL) if USE_SQL else None
 SessionLocal = sessionmaker(bind=engine, autocommit=False, autoflush=False)
 
+# Маршруты /wishes работают через async-движок; синхронный остаётся для
+# миграций, скриптов и бенчмарков
+async_engine = make_async_engine(ASYNC_DATABASE_URL) if USE_SQL else None
+AsyncSessionLocal = async_sessionmaker(
+    bind=async_engine, autoflush=False, expire_on_commit=False
+)
+
 
 def get_db() -> Session:
     db = SessionLocal()
@@ -15,3 +61,25 @@ def get_db() -> Session:
         yield db
     finally:
         db.close()
+
+
+async def get_async_db() -> AsyncIterator[AsyncSession]:
+    async with AsyncSessionLocal() as db:
+        yield db
+
+
+def pool_stats(target: Engine | None = None) -> dict[str, int] | None:
+    """Состояние пула async-движка (или target); None без SQL или без QueuePool."""
+    if target is None:
+        if async_engine is None:
+            return None
+        target = async_engine.sync_engine
+    pool = target.pool
+    if not isinstance(pool, QueuePool):
+        return None
+    return {
+        "size": pool.size(),
+        "checked_in": pool.checkedin(),
+        "checked_out": pool.checkedout(),
+        "overflow": max(0, pool.overflow()),
+    }
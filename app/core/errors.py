@@ -1,15 +1,84 @@
-from uuid import uuid4
+import itertools
+import json
+import logging
+import os
+import re
+from functools import lru_cache
 
 from fastapi import HTTPException, Request
 from fastapi.exceptions import RequestValidationError
-from fastapi.responses import JSONResponse
+from starlette.responses import Response
+
+from app.core.serialization import PreEncodedJSONResponse
+
+CORRELATION_HEADER = "X-Correlation-ID"
+# Входящий id принимается только в безопасной форме: он попадает в логи и ответ
+_CORRELATION_ID = re.compile(r"[A-Za-z0-9._:-]{1,64}")
+# Сколько разных (код, сообщение) держит кэш готовых тел ошибок; статичные
+# сообщения всегда в нём, динамические («operation 3: ...») вытесняют друг друга
+ENVELOPE_CACHE_SIZE = 1024
+
+logger = logging.getLogger("app.errors")
+
+
+def _reset_correlation_ids() -> None:
+    # Случайный префикс на процесс и счётчик: id уникальны между воркерами и
+    # рестартами, а новый id — это next() и форматирование, без uuid4()
+    global _cid_prefix, _cid_counter
+    _cid_prefix = os.urandom(6).hex()
+    _cid_counter = itertools.count(1)
+
+
+_reset_correlation_ids()
+# Воркер после fork не должен продолжать счётчик родителя с тем же префиксом
+os.register_at_fork(after_in_child=_reset_correlation_ids)
+
+
+def new_correlation_id() -> str:
+    return f"{_cid_prefix}-{next(_cid_counter):x}"
+
+
+def correlation_id(request: Request) -> str:
+    """id из заголовка X-Correlation-ID, если он корректен, иначе новый."""
+    incoming = request.headers.get(CORRELATION_HEADER)
+    if incoming is not None and _CORRELATION_ID.fullmatch(incoming):
+        return incoming
+    return new_correlation_id()
+
+
+def _dumps(payload: dict) -> bytes:
+    # Те же байты, что у JSONResponse
+    return json.dumps(payload, ensure_ascii=False, separators=(",", ":")).encode(
+        "utf-8"
+    )
+
+
+@lru_cache(maxsize=ENVELOPE_CACHE_SIZE)
+def _envelope(code: str, message: str) -> bytes:
+    return _dumps({"error": {"code": code, "message": message}})
+
+
+@lru_cache(maxsize=ENVELOPE_CACHE_SIZE)
+def _problem_parts(
+    status: int, title: str, detail: str, type_: str
+) -> tuple[bytes, bytes]:
+    """Тело RFC 7807 до и после correlation_id — id вставляется между ними."""
+    payload = {"type": type_, "title": title, "status": status, "detail": detail}
+    return _dumps(payload)[:-1] + b',"correlation_id":"', b'"}'
 
 
 class ApiError(Exception):
-    def __init__(self, code: str, message: str, status: int = 400):
+    def __init__(
+        self,
+        code: str,
+        message: str,
+        status: int = 400,
+        headers: dict[str, str] | None = None,
+    ):
         self.code = code
         self.message = message
         self.status = status
+        self.headers = headers
 
 
 class AppValidationError(ApiError):
@@ -22,16 +91,30 @@ class NotFoundError(ApiError):
         super().__init__(code="not_found", message=message, status=404)
 
 
-def problem(status: int, title: str, detail: str, type_: str = "about:blank"):
-    cid = str(uuid4())
-    payload = {
-        "type": type_,
-        "title": title,
-        "status": status,
-        "detail": detail,
-        "correlation_id": cid,
-    }
-    return JSONResponse(payload, status_code=status)
+class RateLimitedError(ApiError):
+    def __init__(self, retry_after: int, message: str = "too many requests"):
+        super().__init__(
+            code="rate_limited",
+            message=message,
+            status=429,
+            headers={"Retry-After": str(retry_after)},
+        )
+
+
+def problem(
+    status: int,
+    title: str,
+    detail: str,
+    type_: str = "about:blank",
+    headers: dict[str, str] | None = None,
+    cid: str | None = None,
+) -> Response:
+    if cid is None:
+        cid = new_correlation_id()
+    head, tail = _problem_parts(status, title, detail, type_)
+    # Формат id (префикс и счётчик или проверенный заголовок) не требует экранирования
+    body = head + cid.encode("ascii") + tail
+    return PreEncodedJSONResponse(body, status_code=status, headers=headers)
 
 
 def _wants_problem(request: Request) -> bool:
@@ -39,41 +122,59 @@ def _wants_problem(request: Request) -> bool:
     return "application/problem+json" in accept.lower()
 
 
-async def api_error_handler(request: Request, exc: ApiError):
+def _error_response(
+    request: Request,
+    status: int,
+    code: str,
+    message: str,
+    *,
+    title: str,
+    type_: str = "about:blank",
+    headers: dict[str, str] | None = None,
+) -> Response:
+    """
+    Ответ об ошибке из готовых байтов (см. _envelope и _problem_parts). id
+    корреляции — в заголовке ответа, в теле RFC 7807 и в строке лога.
+    """
+    cid = correlation_id(request)
+    if logger.isEnabledFor(logging.INFO):
+        path = request.scope["path"]
+        logger.info("%s %s -> %d %s cid=%s", request.method, path, status, code, cid)
+    headers = {CORRELATION_HEADER: cid, **(headers or {})}
     if _wants_problem(request):
-        return problem(
-            status=exc.status,
-            title=exc.code,
-            detail=exc.message,
-            type_=f"urn:secdev:error:{exc.code}",
-        )
-    return JSONResponse(
-        status_code=exc.status,
-        content={"error": {"code": exc.code, "message": exc.message}},
+        return problem(status, title, message, type_, headers=headers, cid=cid)
+    return PreEncodedJSONResponse(
+        _envelope(code, message), status_code=status, headers=headers
+    )
+
+
+async def api_error_handler(request: Request, exc: ApiError):
+    return _error_response(
+        request,
+        exc.status,
+        exc.code,
+        exc.message,
+        title=exc.code,
+        type_=f"urn:secdev:error:{exc.code}",
+        headers=exc.headers,
     )
 
 
 async def http_exception_handler(request: Request, exc: HTTPException):
     detail = exc.detail if isinstance(exc.detail, str) else "http_error"
-    if _wants_problem(request):
-        return problem(status=exc.status_code, title="HTTP Error", detail=detail)
-    return JSONResponse(
-        status_code=exc.status_code,
-        content={"error": {"code": "http_error", "message": detail}},
+    return _error_response(
+        request, exc.status_code, "http_error", detail, title="HTTP Error"
     )
 
 
 async def request_validation_error_handler(
     request: Request, exc: RequestValidationError
 ):
-    if _wants_problem(request):
-        return problem(
-            status=422,
-            title="Validation Error",
-            detail="validation error",
-            type_="urn:secdev:error:validation_error",
-        )
-    return JSONResponse(
-        status_code=422,
-        content={"error": {"code": "validation_error", "message": "validation error"}},
+    return _error_response(
+        request,
+        422,
+        "validation_error",
+        "validation error",
+        title="Validation Error",
+        type_="urn:secdev:error:validation_error",
     )
@@ -0,0 +1,73 @@
+from __future__ import annotations
+
+import math
+from bisect import bisect_left, bisect_right, insort
+from typing import Any, Iterable, Iterator
+
+# Ключ индекса — (значение, id): id делает порядок полным и стабильным.
+IndexKey = tuple[Any, int]
+
+
+class SortedIndex:
+    """Упорядоченный список ключей (value, id) с инкрементальной поддержкой."""
+
+    __slots__ = ("_keys",)
+
+    def __init__(self) -> None:
+        self._keys: list[IndexKey] = []
+
+    def __len__(self) -> int:
+        return len(self._keys)
+
+    def add(self, value: Any, wish_id: int) -> None:
+        insort(self._keys, (value, wish_id))
+
+    def discard(self, value: Any, wish_id: int) -> None:
+        key = (value, wish_id)
+        i = bisect_left(self._keys, key)
+        if i < len(self._keys) and self._keys[i] == key:
+            del self._keys[i]
+
+    def clear(self) -> None:
+        self._keys.clear()
+
+    def rebuild(self, keys: Iterable[IndexKey]) -> None:
+        """Перестраивает индекс целиком — дешевле серии insort для больших пачек."""
+        self._keys = sorted(keys)
+
+    def _span(self, below: Any, above: Any, start: Any) -> tuple[int, int]:
+        keys = self._keys
+        lo = 0 if above is None else bisect_right(keys, (above, math.inf))
+        if start is not None:
+            lo = max(lo, bisect_left(keys, (start,)))
+        hi = len(keys) if below is None else bisect_left(keys, (below,))
+        return lo, max(lo, hi)
+
+    def count(self, *, below: Any = None, above: Any = None, start: Any = None) -> int:
+        """Число ключей в границах walk() — два bisect, без обхода."""
+        lo, hi = self._span(below, above, start)
+        return hi - lo
+
+    def walk(
+        self,
+        *,
+        ascending: bool = True,
+        after: IndexKey | None = None,
+        below: Any = None,
+        above: Any = None,
+        start: Any = None,
+    ) -> Iterator[IndexKey]:
+        """
+        Ленивый обход ключей в заданном направлении.
+        below/above — строгие границы по значению, start — нестрогая нижняя,
+        after — ключ-курсор (обход продолжается со следующего за ним ключа).
+        """
+        keys = self._keys
+        lo, hi = self._span(below, above, start)
+        if after is not None:
+            if ascending:
+                lo = max(lo, bisect_right(keys, after))
+            else:
+                hi = min(hi, bisect_left(keys, after))
+        positions = range(lo, hi) if ascending else range(hi - 1, lo - 1, -1)
+        return (keys[i] for i in positions)
@@ -1,9 +1,18 @@
 from __future__ import annotations
 
+import codecs
 import json
+import re
+from typing import Any, AsyncIterator
 
 MAX_JSON_BYTES = 2_000_000
 
+# Поиск конца значения: внутри строки важны кавычка и экранирование, снаружи —
+# кавычки и скобки; скаляр заканчивается на разделителе
+_STRING_STOP = re.compile(r'["\\]')
+_STRUCT_STOP = re.compile(r'["\[\]{}]')
+_SCALAR_END = re.compile(r"[\s,\]}:]")
+
 
 class JsonTooLargeError(ValueError):
     pass
@@ -23,3 +32,219 @@ def safe_json_loads(raw: bytes) -> dict:
     if not isinstance(data, dict):
         raise ValueError("root must be an object")
     return data
+
+
+class _StreamReader:
+    """
+    Буфер поверх асинхронного потока байтов с подкачкой по требованию.
+    Конец очередного значения ищется с сохранением состояния между чанками,
+    поэтому каждый символ просматривается один раз, а json разбирает значение
+    один раз — когда оно пришло целиком.
+    """
+
+    # Сколько уже разобранного текста держать, прежде чем сдвинуть буфер
+    _COMPACT_AT = 64 * 1024
+
+    def __init__(self, chunks: AsyncIterator[bytes], max_bytes: int):
+        self._chunks = chunks
+        self._max_bytes = max_bytes
+        self._utf8 = codecs.getincrementaldecoder("utf-8")()
+        self._decoder = json.JSONDecoder(parse_float=str)
+        self.buf = ""
+        self.pos = 0
+        self.received = 0
+        self.eof = False
+
+    async def more(self, want: int = 1) -> bool:
+        """
+        Докачивает не меньше want символов (или до конца потока) и склеивает
+        их с буфером одним копированием. False — поток кончился, ничего не придя.
+        """
+        if self.eof:
+            return False
+        parts = [self.buf]
+        if self.pos > self._COMPACT_AT:
+            parts[0] = self.buf[self.pos :]
+            self.pos = 0
+        got = 0
+        while got < want:
+            chunk = await anext(self._chunks, None)
+            if chunk is None:
+                self.eof = True
+                parts.append(self._utf8.decode(b"", final=True))
+                break
+            self.received += len(chunk)
+            if self.received > self._max_bytes:
+                raise JsonTooLargeError("json body too large")
+            text = self._utf8.decode(chunk)
+            parts.append(text)
+            got += len(text)
+        self.buf = "".join(parts)
+        return got > 0
+
+    async def pending(self, limit: int | None = None) -> bool:
+        """
+        Подкачка для незавершённого значения, начатого в pos; False — конец.
+        Докачивается не меньше, чем уже накоплено, — копирование буфера
+        остаётся линейным и для значения, пришедшего мелкими чанками.
+        """
+        size = self.check_value(len(self.buf), limit)
+        if limit is not None:
+            size = min(size, limit + 1 - size)
+        return await self.more(max(1, size))
+
+    def check_value(self, end: int, limit: int | None) -> int:
+        """Размер значения от pos до end; больше limit — JsonTooLargeError."""
+        size = end - self.pos
+        if limit is not None and size > limit:
+            raise JsonTooLargeError("json value too large")
+        return size
+
+    async def peek(self) -> str:
+        """Следующий значимый символ (пробелы пропускаются); "" — конец потока."""
+        while True:
+            while self.pos < len(self.buf) and self.buf[self.pos] in " \t\r\n":
+                self.pos += 1
+            if self.pos < len(self.buf):
+                return self.buf[self.pos]
+            if not await self.more():
+                return ""
+
+    async def expect(self, chars: str) -> str:
+        ch = await self.peek()
+        if not ch or ch not in chars:
+            raise ValueError(f"expected one of {chars!r}")
+        self.pos += 1
+        return ch
+
+    def decode(self, text: str) -> Any:
+        return self._decoder.decode(text)
+
+    async def _scalar_end(self, limit: int | None) -> int:
+        scanned = 0
+        while True:
+            m = _SCALAR_END.search(self.buf, self.pos + scanned)
+            if m is not None:
+                return m.start()
+            scanned = len(self.buf) - self.pos
+            if not await self.pending(limit):
+                return len(self.buf)
+
+    async def _nested_end(self, limit: int | None) -> int:
+        # Смещения — относительно pos: more() может сдвинуть буфер
+        scanned, depth, in_string = 0, 0, False
+        while True:
+            buf, i = self.buf, self.pos + scanned
+            while True:
+                m = (_STRING_STOP if in_string else _STRUCT_STOP).search(buf, i)
+                if m is None:
+                    i = len(buf)
+                    break
+                ch, i = m.group(), m.end()
+                if ch == "\\":
+                    if i == len(buf):
+                        # Экранируемый символ ещё не пришёл
+                        i -= 1
+                        break
+                    i += 1
+                elif ch == '"':
+                    in_string = not in_string
+                    if not in_string and depth == 0:
+                        return i
+                elif ch in "[{":
+                    depth += 1
+                else:
+                    depth -= 1
+                    if depth <= 0:
+                        return i
+            scanned = i - self.pos
+            if not await self.pending(limit):
+                # Оборванное значение: ошибку сформулирует json
+                return len(self.buf)
+
+    async def value(self, limit: int | None = None) -> Any:
+        """Следующее значение; limit — предел его длины в символах (None — нет)."""
+        first = await self.peek()
+        # Конец значения найден (или поток кончился) — json разбирает его один раз
+        if first and first in '"[{':
+            end = await self._nested_end(limit)
+        else:
+            end = await self._scalar_end(limit)
+        self.check_value(end, limit)
+        obj, self.pos = self._decoder.raw_decode(self.buf, self.pos)
+        return obj
+
+
+async def iter_json_array(
+    chunks: AsyncIterator[bytes],
+    key: str,
+    max_bytes: int = MAX_JSON_BYTES,
+    max_item: int | None = None,
+) -> AsyncIterator[Any]:
+    """
+    Потоковый разбор объекта верхнего уровня вида {"<key>": [...], ...}:
+    - элементы массива key отдаются по одному, не дожидаясь конца тела
+    - лимит max_bytes проверяется по мере чтения (JsonTooLargeError), как и
+      max_item — предел длины одного элемента key в символах
+    - parse_float=str, как и в safe_json_loads
+    Нарушение формата — ValueError; отсутствие key — пустая выдача.
+    """
+    reader = _StreamReader(chunks, max_bytes)
+    await reader.expect("{")
+    seen = False
+    if await reader.peek() == "}":
+        reader.pos += 1
+    else:
+        while True:
+            name = await reader.value()
+            if not isinstance(name, str):
+                raise ValueError("object key must be a string")
+            await reader.expect(":")
+            if name != key:
+                await reader.value()
+            elif seen:
+                raise ValueError(f"duplicate {key!r} key")
+            else:
+                seen = True
+                await reader.expect("[")
+                if await reader.peek() == "]":
+                    reader.pos += 1
+                else:
+                    while True:
+                        yield await reader.value(max_item)
+                        if await reader.expect(",]") == "]":
+                            break
+            if await reader.expect(",}") == "}":
+                break
+    if await reader.peek():
+        raise ValueError("trailing data after json document")
+
+
+async def iter_ndjson(
+    chunks: AsyncIterator[bytes],
+    max_bytes: int = MAX_JSON_BYTES,
+    max_item: int | None = None,
+) -> AsyncIterator[Any]:
+    """
+    Потоковый разбор NDJSON: по одному JSON-значению на строку, пустые строки
+    пропускаются. Лимиты (max_item — на строку) и parse_float=str — как в
+    iter_json_array.
+    """
+    reader = _StreamReader(chunks, max_bytes)
+    scanned = 0
+    while True:
+        # Поиск перевода строки продолжается с места, где остановился прошлый
+        nl = reader.buf.find("\n", reader.pos + scanned)
+        if nl < 0:
+            scanned = len(reader.buf) - reader.pos
+            if await reader.pending(max_item):
+                continue
+            nl = len(reader.buf)
+        reader.check_value(nl, max_item)
+        line = reader.buf[reader.pos : nl].strip()
+        reader.pos = nl + 1
+        scanned = 0
+        if line:
+            yield reader.decode(line)
+        if reader.eof and reader.pos >= len(reader.buf):
+            return
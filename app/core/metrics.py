@@ -0,0 +1,51 @@
+from __future__ import annotations
+
+from typing import Iterable, NamedTuple
+
+PROM_CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+Labels = dict[str, str]
+
+
+class MetricFamily(NamedTuple):
+    name: str
+    type: str  # counter | gauge | histogram
+    help: str
+    # (суффикс имени, метки, значение): суффикс нужен гистограммам (_bucket и т.п.)
+    samples: list[tuple[str, Labels, float]]
+
+
+def gauge(name: str, help_: str, value: float, labels: Labels | None = None):
+    return MetricFamily(name, "gauge", help_, [("", labels or {}, value)])
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(labels: Labels) -> str:
+    if not labels:
+        return ""
+    inner = ",".join(f'{k}="{_escape(v)}"' for k, v in labels.items())
+    return "{" + inner + "}"
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    if isinstance(value, int) or float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+def render_prometheus(families: Iterable[MetricFamily]) -> str:
+    """Текстовый формат экспозиции Prometheus 0.0.4."""
+    lines: list[str] = []
+    for family in families:
+        lines.append(f"# HELP {family.name} {family.help}")
+        lines.append(f"# TYPE {family.name} {family.type}")
+        for suffix, labels, value in family.samples:
+            lines.append(
+                f"{family.name}{suffix}{_format_labels(labels)} {_format_value(value)}"
+            )
+    return "\n".join(lines) + "\n"
@@ -0,0 +1,93 @@
+from __future__ import annotations
+
+import base64
+import json
+from decimal import Decimal, InvalidOperation
+
+from fastapi import Query
+
+from app.core.errors import AppValidationError
+from app.core.indexes import IndexKey
+
+MAX_PAGE_SIZE = 1000
+MAX_CURSOR_LEN = 512
+
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+
+
+def _decimal(value: object) -> Decimal:
+    if not isinstance(value, str):
+        raise ValueError("price must be a string")
+    try:
+        price = Decimal(value)
+    except InvalidOperation:
+        raise ValueError("bad price")
+    if not price.is_finite():
+        raise ValueError("bad price")
+    return price
+
+
+def _int(value: object) -> int:
+    if not isinstance(value, int) or isinstance(value, bool):
+        raise ValueError("id must be an integer")
+    return value
+
+
+def _str(value: object) -> str:
+    if not isinstance(value, str):
+        raise ValueError("title must be a string")
+    return value
+
+
+# Как восстановить значение ключа из курсора для каждого индекса
+# (у поиска ключ — (-ранг, id))
+_VALUE_DECODERS = {
+    "id": _int,
+    "price_estimate": _decimal,
+    "title": _str,
+    "search": _int,
+}
+
+
+def encode_cursor(index: str, key: IndexKey) -> str:
+    """Непрозрачный курсор: base64url(JSON) с именем индекса и ключом (value, id)."""
+    value, wish_id = key
+    if isinstance(value, Decimal):
+        value = str(value)
+    raw = json.dumps([index, value, wish_id], separators=(",", ":")).encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor: str, index: str) -> IndexKey:
+    """Разбирает курсор; курсор чужого индекса или битый курсор — 422."""
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        name, value, wish_id = json.loads(base64.urlsafe_b64decode(padded))
+        if name != index:
+            raise ValueError("cursor index mismatch")
+        return _VALUE_DECODERS[index](value), _int(wish_id)
+    except (ValueError, TypeError, KeyError):
+        raise AppValidationError("invalid cursor")
+
+
+class PageParams:
+    """Общие параметры постраничной выдачи: limit/offset и keyset-курсор."""
+
+    __slots__ = ("limit", "offset", "cursor")
+
+    def __init__(self, limit: int | None, offset: int, cursor: str | None):
+        self.limit = limit
+        self.offset = offset
+        self.cursor = cursor
+
+    def after(self, index: str) -> IndexKey | None:
+        return None if self.cursor is None else decode_cursor(self.cursor, index)
+
+
+async def paging(
+    limit: int | None = Query(None, ge=1, le=MAX_PAGE_SIZE),
+    offset: int = Query(0, ge=0),
+    cursor: str | None = Query(None, max_length=MAX_CURSOR_LEN),
+) -> PageParams:
+    # async-зависимость: FastAPI не гоняет её через пул потоков
+    return PageParams(limit, offset, cursor)
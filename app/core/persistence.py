@@ -0,0 +1,340 @@
+from __future__ import annotations
+
+import asyncio
+import json
+import logging
+import mmap
+import os
+import re
+import struct
+import sys
+import threading
+from contextlib import asynccontextmanager, suppress
+from pathlib import Path
+from typing import Any, AsyncIterator
+
+from starlette.concurrency import run_in_threadpool
+
+from app.core import db_config
+from app.core.db import store
+from app.core.records import CompactWish
+from app.core.secure_fs import resolve_inside
+from app.core.serialization import encode_record, join_array
+from app.core.store import Record, WishStore
+
+logger = logging.getLogger("app.persistence")
+
+SNAPSHOT_NAME = "snapshot.bin"
+_WAL_NAME = re.compile(r"wal-(\d{8})\.log")
+
+# Снимок: заголовок (magic, первый сегмент журнала после снимка, число владельцев),
+# затем по владельцу — длина имени, число записей, имя и записи. Запись —
+# (id, копейки, есть ли цена, длины title/link/notes/category) и строки UTF-8
+# подряд; длина _NONE означает None
+_MAGIC = b"WISHSNP1"
+_HEADER = struct.Struct("<8sQQ")
+_OWNER = struct.Struct("<IQ")
+_WISH = struct.Struct("<qqB4I")
+_NONE = 0xFFFFFFFF
+
+
+def _wal_name(seq: int) -> str:
+    return f"wal-{seq:08d}.log"
+
+
+def _fsync_dir(path: Path) -> None:
+    fd = os.open(path, os.O_RDONLY)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+
+def write_snapshot(
+    path: Path, wal_seq: int, owners: list[tuple[str, list[CompactWish]]]
+) -> None:
+    """Пишет снимок атомарно: во временный файл рядом, fsync, затем rename."""
+    tmp = path.with_name(path.name + ".tmp")
+    with open(tmp, "wb") as f:
+        f.write(_HEADER.pack(_MAGIC, wal_seq, len(owners)))
+        for owner, wishes in owners:
+            name = owner.encode("utf-8")
+            parts = [_OWNER.pack(len(name), len(wishes)), name]
+            for w in wishes:
+                strings = [
+                    None if v is None else v.encode("utf-8")
+                    for v in (w.title, w.link, w.notes, w.category)
+                ]
+                parts.append(
+                    _WISH.pack(
+                        w.id,
+                        w.cents or 0,
+                        w.cents is not None,
+                        *(_NONE if b is None else len(b) for b in strings),
+                    )
+                )
+                parts.extend(b for b in strings if b)
+            f.write(b"".join(parts))
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp, path)
+    _fsync_dir(path.parent)
+
+
+def read_snapshot(path: Path, target: WishStore) -> int:
+    """Загружает снимок в target; возвращает первый сегмент журнала для повтора."""
+    with open(path, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+        magic, wal_seq, owners = _HEADER.unpack_from(mm, 0)
+        if magic != _MAGIC:
+            raise ValueError(f"{path.name} is not a wish snapshot")
+        pos = _HEADER.size
+        unpack, size = _WISH.unpack_from, _WISH.size
+        for _ in range(owners):
+            name_len, count = _OWNER.unpack_from(mm, pos)
+            pos += _OWNER.size
+            owner = mm[pos : pos + name_len].decode("utf-8")
+            pos += name_len
+            wishes = []
+            for _ in range(count):
+                wish_id, cents, priced, *lengths = unpack(mm, pos)
+                pos += size
+                fields: list[Any] = []
+                for n in lengths:
+                    if n == _NONE:
+                        fields.append(None)
+                    else:
+                        fields.append(mm[pos : pos + n].decode("utf-8"))
+                        pos += n
+                title, link, notes, category = fields
+                if category is not None:
+                    category = sys.intern(category)
+                wishes.append(
+                    CompactWish(
+                        wish_id, title, link, cents if priced else None, notes, category
+                    )
+                )
+            target.restore(owner, wishes)
+    return wal_seq
+
+
+def replay(path: Path, target: WishStore) -> int:
+    """Повторяет сегмент журнала на target; возвращает число операций."""
+    ops = 0
+    with open(path, "rb") as f:
+        for line in f:
+            # Оборванная последняя строка — запись, не завершённая до падения
+            if not line.endswith(b"\n"):
+                break
+            op, *args = json.loads(line)
+            if op == "put":
+                owner, records = args
+                target.extend(owner, records)
+            elif op == "del":
+                owner, wish_id = args
+                target.remove(owner, wish_id)
+            elif op == "apply":
+                owner, deleted, records = args
+                for wish_id in deleted:
+                    target.remove(owner, wish_id)
+                target.extend(owner, records)
+            elif op == "clear":
+                target.clear()
+            else:
+                raise ValueError(f"unknown journal operation {op!r}")
+            ops += 1
+    return ops
+
+
+class WriteAheadLog:
+    """
+    Журнал изменений между снимками: одна JSON-строка на операцию, только
+    дозапись. Строка пишется одним write() без буфера процесса, поэтому
+    падение процесса теряет не больше незавершённой строки.
+    """
+
+    def __init__(self, data_dir: Path, seq: int, *, fsync: bool = False) -> None:
+        self._dir = data_dir
+        self._fsync = fsync
+        self.seq = seq
+        self.ops = 0
+        # Пишут владельцы из разных полос хранилища; замок держит строки целыми
+        # и не даёт rotate() закрыть файл посреди записи
+        self._lock = threading.Lock()
+        self._file = open(resolve_inside(data_dir, _wal_name(seq)), "ab", buffering=0)
+
+    def _append(self, line: bytes) -> None:
+        with self._lock:
+            self._file.write(line)
+            if self._fsync:
+                os.fsync(self._file.fileno())
+            self.ops += 1
+
+    def put(self, owner: str, records: list[Record]) -> None:
+        head = b'["put",' + json.dumps(owner).encode("utf-8") + b","
+        self._append(head + join_array(encode_record(r) for r in records) + b"]\n")
+
+    def delete(self, owner: str, wish_id: int) -> None:
+        self._append(json.dumps(["del", owner, wish_id]).encode("utf-8") + b"\n")
+
+    def apply(self, owner: str, deleted: list[int], records: list[Record]) -> None:
+        head = json.dumps(["apply", owner, deleted]).encode("utf-8")[:-1] + b","
+        self._append(head + join_array(encode_record(r) for r in records) + b"]\n")
+
+    def clear(self) -> None:
+        self._append(b'["clear"]\n')
+
+    def rotate(self) -> int:
+        """Начинает новый сегмент; возвращает его номер."""
+        with self._lock:
+            self._file.close()
+            self.seq += 1
+            self.ops = 0
+            self._file = open(
+                resolve_inside(self._dir, _wal_name(self.seq)), "ab", buffering=0
+            )
+            return self.seq
+
+    def close(self) -> None:
+        with self._lock:
+            self._file.close()
+
+
+class StorePersistence:
+    """
+    Снимок и журнал in-memory хранилища в data_dir. open() загружает снимок
+    (через mmap) и повторяет журнал; checkpoint() снимает новый снимок и удаляет
+    сегменты журнала, которые в него вошли.
+    """
+
+    def __init__(
+        self, target: WishStore, data_dir: str | Path, *, fsync: bool = False
+    ) -> None:
+        Path(data_dir).mkdir(mode=0o700, parents=True, exist_ok=True)
+        self._store = target
+        self._dir = Path(data_dir).resolve(strict=True)
+        self._snapshot = resolve_inside(self._dir, SNAPSHOT_NAME)
+        self._fsync = fsync
+        self._wal: WriteAheadLog | None = None
+        # Снимки пишутся по одному: фоновый и финальный при остановке не пересекаются
+        self._write_lock = threading.Lock()
+        self.snapshots = 0
+        self.failures = 0
+
+    def _segments(self) -> list[tuple[int, Path]]:
+        found = []
+        for path in self._dir.iterdir():
+            m = _WAL_NAME.fullmatch(path.name)
+            if m:
+                found.append((int(m.group(1)), resolve_inside(self._dir, path.name)))
+        return sorted(found)
+
+    def _drop_segments(self, below: int) -> None:
+        for seq, path in self._segments():
+            if seq < below:
+                path.unlink(missing_ok=True)
+
+    def open(self) -> int:
+        """Восстанавливает хранилище; возвращает число записей после загрузки."""
+        self._store.journal = None
+        first = (
+            read_snapshot(self._snapshot, self._store) if self._snapshot.exists() else 0
+        )
+        last = first - 1
+        for seq, path in self._segments():
+            if seq >= first:
+                replay(path, self._store)
+                last = seq
+        self._drop_segments(below=first)
+        self._wal = WriteAheadLog(self._dir, last + 1, fsync=self._fsync)
+        self._store.journal = self._wal
+        return len(self._store)
+
+    @property
+    def dirty(self) -> bool:
+        """Есть ли изменения, ещё не попавшие в снимок."""
+        return self._wal is not None and (
+            self._wal.ops > 0 or len(self._segments()) > 1
+        )
+
+    def capture(self) -> tuple[int, list[tuple[str, list[CompactWish]]]]:
+        """
+        Переключение журнала на новый сегмент и срез хранилища. Изменение,
+        пришедшее между ними, попадёт и в снимок, и в новый сегмент — операции
+        журнала идемпотентны, поэтому повтор поверх снимка даёт то же состояние.
+        """
+        seq = self._wal.rotate()
+        return seq, self._store.snapshot()
+
+    def write(self, seq: int, owners: list[tuple[str, list[CompactWish]]]) -> None:
+        with self._write_lock:
+            write_snapshot(self._snapshot, seq, owners)
+            self._drop_segments(below=seq)
+            self.snapshots += 1
+
+    def checkpoint(self) -> None:
+        self.write(*self.capture())
+
+    async def acheckpoint(self) -> None:
+        """
+        checkpoint() для цикла событий: срез (он берёт все полосы хранилища и
+        копирует записи), сериализация и запись — в пуле потоков. Любой сбой
+        считается и пишется в лог, но не прерывает фоновый цикл.
+        """
+        try:
+            await run_in_threadpool(self.checkpoint)
+        except Exception:
+            # Снимок не записан, но сегменты журнала целы — данные не теряются
+            self.failures += 1
+            logger.exception("store snapshot failed")
+
+    async def run(self, interval: float) -> None:
+        while True:
+            await asyncio.sleep(interval)
+            if self.dirty:
+                await self.acheckpoint()
+
+    def close(self) -> None:
+        self._store.journal = None
+        if self._wal is not None:
+            self._wal.close()
+            self._wal = None
+
+
+@asynccontextmanager
+async def persisted(
+    target: WishStore,
+    data_dir: str | Path,
+    *,
+    interval: float,
+    fsync: bool = False,
+) -> AsyncIterator[StorePersistence]:
+    """Восстанавливает target при входе, снимает снимки по таймеру и при выходе."""
+    persistence = StorePersistence(target, data_dir, fsync=fsync)
+    await run_in_threadpool(persistence.open)
+    task = asyncio.create_task(persistence.run(interval))
+    try:
+        yield persistence
+    finally:
+        task.cancel()
+        with suppress(asyncio.CancelledError):
+            await task
+        try:
+            if persistence.dirty:
+                await persistence.acheckpoint()
+        finally:
+            persistence.close()
+
+
+@asynccontextmanager
+async def lifespan(_app: Any) -> AsyncIterator[None]:
+    """Lifespan приложения: сохранение включается для memory:// и STORE_DATA_DIR."""
+    if db_config.USE_SQL or not db_config.STORE_DATA_DIR:
+        yield
+        return
+    async with persisted(
+        store,
+        db_config.STORE_DATA_DIR,
+        interval=db_config.STORE_SNAPSHOT_INTERVAL_S,
+        fsync=db_config.STORE_WAL_FSYNC,
+    ):
+        yield
@@ -0,0 +1,103 @@
+from __future__ import annotations
+
+import sys
+from decimal import Decimal
+from typing import NamedTuple
+
+from app.core.records import CompactWish
+
+# Индексы-источники кандидатов в порядке предпочтения при равной оценке
+DRIVERS = ("category", "price_estimate", "title", "id")
+
+
+class WishQuery(NamedTuple):
+    """Составной запрос: все заданные условия должны выполняться одновременно."""
+
+    # Любая из категорий (точное совпадение, как у /wishes/category)
+    categories: tuple[str, ...] = ()
+    # Строгие ценовые границы; желания без цены под них не попадают
+    above: Decimal | None = None
+    below: Decimal | None = None
+    # Начало названия с учётом регистра — так упорядочен индекс title
+    title_prefix: str | None = None
+    has_link: bool | None = None
+    order_by: str = "id"
+    ascending: bool = True
+
+    @property
+    def priced(self) -> bool:
+        return self.above is not None or self.below is not None
+
+
+class QueryPlan(NamedTuple):
+    # Индекс, из которого берутся кандидаты (см. DRIVERS)
+    driver: str
+    # Число кандидатов — для индексов в памяти точное
+    estimate: int
+    # Условия, которые проверяются на каждом кандидате
+    residual: tuple[str, ...]
+    # Кандидаты идут в порядке выдачи: страницу можно отдать, не дочитывая их
+    ordered: bool
+
+
+def prefix_end(prefix: str) -> str | None:
+    """Первая строка после всех строк с началом prefix (строгая верхняя граница)."""
+    last = ord(prefix[-1])
+    if last == sys.maxunicode:
+        return None
+    return prefix[:-1] + chr(last + 1)
+
+
+def _is_ordered(driver: str, q: WishQuery) -> bool:
+    # Индекс категории упорядочен по id
+    return driver == q.order_by or (driver == "category" and q.order_by == "id")
+
+
+def choose_plan(q: WishQuery, estimates: dict[str, int]) -> QueryPlan:
+    """
+    Выбирает самый селективный индекс из доступных (estimates: индекс -> число
+    кандидатов). При равной оценке выигрывает индекс в порядке выдачи, затем —
+    порядок DRIVERS. Остальные условия запроса проверяются на кандидатах.
+    """
+    driver = min(
+        estimates,
+        key=lambda d: (estimates[d], not _is_ordered(d, q), DRIVERS.index(d)),
+    )
+    residual = []
+    if q.categories and driver != "category":
+        residual.append("category")
+    if q.priced and driver != "price_estimate":
+        residual.append("price_estimate")
+    if q.title_prefix is not None and driver != "title":
+        residual.append("title")
+    if q.has_link is not None:
+        residual.append("link")
+    return QueryPlan(driver, estimates[driver], tuple(residual), _is_ordered(driver, q))
+
+
+def matches(
+    wish: CompactWish,
+    q: WishQuery,
+    residual: tuple[str, ...],
+    above: Decimal | None,
+    below: Decimal | None,
+) -> bool:
+    """Проверка остаточных условий; above/below — границы в копейках."""
+    for name in residual:
+        if name == "category":
+            if wish.category not in q.categories:
+                return False
+        elif name == "price_estimate":
+            cents = wish.cents
+            if cents is None:
+                return False
+            if above is not None and cents <= above:
+                return False
+            if below is not None and cents >= below:
+                return False
+        elif name == "title":
+            if not wish.title.startswith(q.title_prefix):
+                return False
+        elif (wish.link is not None) != q.has_link:
+            return False
+    return True
@@ -0,0 +1,260 @@
+from __future__ import annotations
+
+import math
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, AsyncIterator, Callable, NamedTuple, Protocol
+
+from fastapi import Depends
+from fastapi.responses import StreamingResponse
+
+from app.core.auth import get_current_user
+from app.core.errors import RateLimitedError
+
+# Обычные запросы: RATE_LIMIT_RPS в среднем и всплеск до RATE_LIMIT_BURST
+RATE_LIMIT_RPS = float(os.getenv("RATE_LIMIT_RPS", "50"))
+RATE_LIMIT_BURST = float(os.getenv("RATE_LIMIT_BURST", "200"))
+# Импорт, экспорт и пакеты: отдельный бюджет в минуту и предел одновременных
+RATE_LIMIT_BULK_PER_MIN = float(os.getenv("RATE_LIMIT_BULK_PER_MIN", "30"))
+RATE_LIMIT_BULK_BURST = float(os.getenv("RATE_LIMIT_BULK_BURST", "10"))
+RATE_LIMIT_BULK_CONCURRENCY = int(os.getenv("RATE_LIMIT_BULK_CONCURRENCY", "2"))
+
+# Предел числа вёдер в процессе: вытесняется давно не обращавшийся пользователь
+# (его ведро к тому времени обычно уже полное)
+MAX_BUCKETS = 100_000
+# Сколько раз общий бэкенд повторяет compare-and-set при гонке с другим воркером
+CAS_ATTEMPTS = 8
+
+
+class Budget(NamedTuple):
+    name: str
+    # Пополнение, токенов в секунду, и ёмкость ведра
+    rate: float
+    burst: float
+
+
+DEFAULT = Budget("default", RATE_LIMIT_RPS, RATE_LIMIT_BURST)
+BULK = Budget("bulk", RATE_LIMIT_BULK_PER_MIN / 60, RATE_LIMIT_BULK_BURST)
+
+
+def take_token(
+    state: tuple[float, float] | None, budget: Budget, now: float
+) -> tuple[tuple[float, float], float]:
+    """
+    Шаг token bucket: новое состояние (токены, время) и 0, если запрос
+    пропущен, иначе — через сколько секунд появится следующий токен.
+    """
+    if state is None:
+        tokens = budget.burst
+    else:
+        tokens, updated = state
+        tokens = min(budget.burst, tokens + max(0.0, now - updated) * budget.rate)
+    if tokens >= 1:
+        return (tokens - 1, now), 0.0
+    return (tokens, now), (1 - tokens) / budget.rate
+
+
+class BucketBackend(Protocol):
+    """Хранилище вёдер; take() атомарен для ключа и возвращает ожидание (0 — можно)."""
+
+    def take(self, key: str, budget: Budget, now: float) -> float: ...
+
+
+class MemoryBuckets:
+    """Вёдра в памяти процесса: лимит действует на каждый воркер отдельно."""
+
+    def __init__(self, max_buckets: int = MAX_BUCKETS) -> None:
+        self._buckets: OrderedDict[str, tuple[float, float]] = OrderedDict()
+        self._max = max_buckets
+        self._lock = threading.Lock()
+
+    def take(self, key: str, budget: Budget, now: float) -> float:
+        with self._lock:
+            state, wait = take_token(self._buckets.get(key), budget, now)
+            self._buckets[key] = state
+            self._buckets.move_to_end(key)
+            if len(self._buckets) > self._max:
+                self._buckets.popitem(last=False)
+        return wait
+
+
+class KeyValue(Protocol):
+    """
+    Общее хранилище ключей между воркерами (Redis, memcached): чтение и
+    compare-and-set; ttl — когда ключ можно забыть.
+    """
+
+    def get(self, key: str) -> str | None: ...
+
+    def compare_and_set(
+        self, key: str, expected: str | None, value: str, ttl: float
+    ) -> bool: ...
+
+
+class LocalKeyValue:
+    """Локальная замена общего хранилища для dev и тестов — с той же семантикой CAS."""
+
+    def __init__(self, clock: Callable[[], float] = time.time) -> None:
+        self._data: dict[str, tuple[str, float]] = {}
+        self._clock = clock
+        self._lock = threading.Lock()
+
+    def _live(self, key: str) -> str | None:
+        item = self._data.get(key)
+        if item is None or item[1] <= self._clock():
+            return None
+        return item[0]
+
+    def get(self, key: str) -> str | None:
+        with self._lock:
+            return self._live(key)
+
+    def compare_and_set(
+        self, key: str, expected: str | None, value: str, ttl: float
+    ) -> bool:
+        with self._lock:
+            if self._live(key) != expected:
+                return False
+            self._data[key] = (value, self._clock() + ttl)
+            return True
+
+
+class SharedBuckets:
+    """
+    Вёдра в общем хранилище: лимит один на все воркеры. Состояние ведра —
+    строка «токены:время»; списание — оптимистичный compare-and-set.
+    """
+
+    def __init__(self, kv: KeyValue, attempts: int = CAS_ATTEMPTS) -> None:
+        self._kv = kv
+        self._attempts = attempts
+
+    def take(self, key: str, budget: Budget, now: float) -> float:
+        # Пустое ведро наполняется за burst / rate: после этого ключ не нужен
+        ttl = budget.burst / budget.rate
+        for _ in range(self._attempts):
+            raw = self._kv.get(key)
+            state = None
+            if raw is not None:
+                tokens, updated = raw.split(":")
+                state = (float(tokens), float(updated))
+            (tokens, updated), wait = take_token(state, budget, now)
+            if self._kv.compare_and_set(key, raw, f"{tokens!r}:{updated!r}", ttl):
+                return wait
+        # Ключ всё время меняют другие воркеры — запрос не пропускаем
+        return 1 / budget.rate
+
+
+def backend_from_env() -> BucketBackend:
+    if os.getenv("RATE_LIMIT_BACKEND", "memory") == "local-shared":
+        return SharedBuckets(LocalKeyValue())
+    return MemoryBuckets()
+
+
+class RateLimiter:
+    """Token bucket на пользователя и бюджет; отказ — RateLimitedError (429)."""
+
+    def __init__(
+        self, backend: BucketBackend, *, clock: Callable[[], float] = time.time
+    ) -> None:
+        self._backend = backend
+        self._clock = clock
+        self._rejected: dict[str, int] = {}
+
+    def check(self, user: str, budget: Budget) -> None:
+        wait = self._backend.take(f"{budget.name}:{user}", budget, self._clock())
+        if wait:
+            self._rejected[budget.name] = self._rejected.get(budget.name, 0) + 1
+            raise RateLimitedError(retry_after=max(1, math.ceil(wait)))
+
+    def stats(self) -> dict[str, int]:
+        return dict(self._rejected)
+
+
+class Slot:
+    """Место в лимите одновременных операций; release() можно звать повторно."""
+
+    __slots__ = ("_limit", "_user", "_held", "handed_off")
+
+    def __init__(self, limit: ConcurrencyLimit, user: str) -> None:
+        self._limit = limit
+        self._user = user
+        self._held = True
+        # Место передано потоковому ответу и освобождается по концу передачи
+        self.handed_off = False
+
+    def release(self) -> None:
+        if self._held:
+            self._held = False
+            self._limit._release(self._user)
+
+
+class ConcurrencyLimit:
+    """
+    Не больше limit одновременных тяжёлых операций на пользователя в процессе.
+    Лишний запрос сразу получает 429, а не ждёт в очереди пула потоков.
+    """
+
+    def __init__(self, limit: int) -> None:
+        self._limit = limit
+        self._active: dict[str, int] = {}
+        self._lock = threading.Lock()
+
+    def acquire(self, user: str) -> Slot:
+        with self._lock:
+            active = self._active.get(user, 0)
+            if active >= self._limit:
+                raise RateLimitedError(
+                    retry_after=1, message="too many concurrent bulk operations"
+                )
+            self._active[user] = active + 1
+        return Slot(self, user)
+
+    def _release(self, user: str) -> None:
+        with self._lock:
+            left = self._active[user] - 1
+            if left:
+                self._active[user] = left
+            else:
+                del self._active[user]
+
+    def active(self, user: str) -> int:
+        return self._active.get(user, 0)
+
+
+class SlotStreamingResponse(StreamingResponse):
+    """Потоковый ответ, который держит место ConcurrencyLimit до конца передачи."""
+
+    def __init__(self, content: Any, *, slot: Slot, **kwargs: Any) -> None:
+        super().__init__(content, **kwargs)
+        self.slot = slot
+        slot.handed_off = True
+
+    async def __call__(self, scope: Any, receive: Any, send: Any) -> None:
+        try:
+            await super().__call__(scope, receive, send)
+        finally:
+            self.slot.release()
+
+
+limiter = RateLimiter(backend_from_env())
+bulk_slots = ConcurrencyLimit(RATE_LIMIT_BULK_CONCURRENCY)
+
+
+async def rate_limited(user: str = Depends(get_current_user)) -> str:
+    """Зависимость: пользователь после списания токена из общего бюджета."""
+    limiter.check(user, DEFAULT)
+    return user
+
+
+async def bulk_admission(user: str = Depends(rate_limited)) -> AsyncIterator[Slot]:
+    """Зависимость тяжёлых операций: бюджет BULK и место в bulk_slots."""
+    limiter.check(user, BULK)
+    slot = bulk_slots.acquire(user)
+    try:
+        yield slot
+    finally:
+        if not slot.handed_off:
+            slot.release()
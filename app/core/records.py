@@ -0,0 +1,82 @@
+from __future__ import annotations
+
+import sys
+from decimal import Context, Decimal
+from typing import Any
+
+
+def to_cents(price: Any) -> int | None:
+    """Цена в целых копейках: Wish ограничивает price_estimate двумя знаками."""
+    if price is None:
+        return None
+    return int(Decimal(price).scaleb(2))
+
+
+# Без ловушек: граница за пределами экспоненты Decimal (1e999999) переводится
+# в бесконечность, а не в decimal.Overflow
+_BOUNDS = Context(traps=[])
+
+
+def cents_bound(price: Decimal) -> Decimal:
+    """
+    Ценовая граница или ключ курсора в масштабе копеек — Decimal, а не int:
+    дробная граница и бесконечность сравниваются с копейками точно.
+    """
+    return price.scaleb(2, _BOUNDS)
+
+
+def from_cents(cents: int | None) -> Decimal | None:
+    return None if cents is None else Decimal(cents).scaleb(-2)
+
+
+def _intern(value: str | None) -> str | None:
+    return None if value is None else sys.intern(value)
+
+
+class CompactWish:
+    """
+    Запись желания в in-memory хранилище: слоты вместо dict, цена в копейках,
+    категория интернирована, owner не хранится — его знает бакет владельца.
+    В форму Wish (dict) запись разворачивается только при выдаче наружу.
+    """
+
+    __slots__ = ("id", "title", "link", "cents", "notes", "category")
+
+    def __init__(
+        self,
+        id: int,
+        title: str,
+        link: str | None,
+        cents: int | None,
+        notes: str | None,
+        category: str | None,
+    ) -> None:
+        self.id = id
+        self.title = title
+        self.link = link
+        self.cents = cents
+        self.notes = notes
+        self.category = category
+
+    @classmethod
+    def pack(cls, record: dict[str, Any]) -> CompactWish:
+        return cls(
+            record["id"],
+            record["title"],
+            record.get("link"),
+            to_cents(record.get("price_estimate")),
+            record.get("notes"),
+            _intern(record.get("category")),
+        )
+
+    def unpack(self, owner: str) -> dict[str, Any]:
+        # Порядок ключей — как в схеме Wish
+        return {
+            "id": self.id,
+            "title": self.title,
+            "link": self.link,
+            "price_estimate": from_cents(self.cents),
+            "notes": self.notes,
+            "category": self.category,
+            "owner": owner,
+        }
@@ -0,0 +1,109 @@
+from __future__ import annotations
+
+from decimal import Decimal
+from typing import AsyncIterator, Protocol
+
+from app.core.batch import BatchConflict, Change, Conflict
+from app.core.db import store
+from app.core.db_config import USE_SQL
+from app.core.db_session import AsyncSessionLocal
+from app.core.indexes import IndexKey
+from app.core.query import WishQuery
+from app.core.sql_store import AsyncSqlWishRepository
+from app.core.store import AsyncWishStore, Page, Record
+from app.core.telemetry import instrument
+
+
+class ImportBatch(Protocol):
+    """Транзакция потокового импорта: write() по частям, затем commit()/rollback()."""
+
+    async def write(self, records: list[Record]) -> list[int]: ...
+
+    async def commit(self) -> list[int]: ...
+
+    async def rollback(self) -> None: ...
+
+
+class WishRepository(Protocol):
+    """Контракт хранилища желаний; все операции выполняются в рамках владельца."""
+
+    async def get(self, owner: str, wish_id: int) -> Record | None: ...
+
+    async def exists(self, owner: str, wish_id: int) -> bool: ...
+
+    async def add(self, owner: str, record: Record) -> bool: ...
+
+    async def replace(
+        self, owner: str, wish_id: int, record: Record
+    ) -> Conflict | None: ...
+
+    async def remove(self, owner: str, wish_id: int) -> bool: ...
+
+    async def version(self, owner: str) -> int | None: ...
+
+    async def encode(self, owner: str, records: list[Record]) -> bytes: ...
+
+    async def add_many(self, owner: str, records: list[Record]) -> list[int]: ...
+
+    async def apply(
+        self, owner: str, changes: list[Change]
+    ) -> BatchConflict | None: ...
+
+    def begin_import(self, owner: str) -> ImportBatch: ...
+
+    def iter_pages(self, owner: str, size: int) -> AsyncIterator[list[Record]]: ...
+
+    async def search(
+        self,
+        owner: str,
+        terms: list[str],
+        *,
+        category: str | None = None,
+        after: IndexKey | None = None,
+        offset: int = 0,
+        limit: int | None = None,
+    ) -> Page: ...
+
+    async def category_stats(self, owner: str) -> list[Record]: ...
+
+    async def query(
+        self,
+        owner: str,
+        q: WishQuery,
+        *,
+        after: IndexKey | None = None,
+        offset: int = 0,
+        limit: int | None = None,
+    ) -> Page: ...
+
+    async def page(
+        self,
+        owner: str,
+        index: str = "id",
+        *,
+        ascending: bool = True,
+        after: IndexKey | None = None,
+        offset: int = 0,
+        limit: int | None = None,
+        below: Decimal | None = None,
+        above: Decimal | None = None,
+        category: str | None = None,
+    ) -> Page: ...
+
+
+_memory = AsyncWishStore(store)
+
+
+async def get_repository() -> AsyncIterator[WishRepository]:
+    """
+    Зависимость FastAPI: бэкенд выбирается по DATABASE_URL.
+    memory:// — хранилище процесса, иначе — SQL-репозиторий на AsyncSession.
+    """
+    if not USE_SQL:
+        yield instrument(_memory)
+        return
+    repo = AsyncSqlWishRepository(sessions=AsyncSessionLocal)
+    try:
+        yield instrument(repo)
+    finally:
+        await repo.close()
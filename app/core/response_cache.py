@@ -0,0 +1,100 @@
+from __future__ import annotations
+
+import os
+import threading
+import uuid
+from collections import OrderedDict
+from typing import NamedTuple
+
+# Ограничения LRU: по числу тел и по суммарному размеру
+CACHE_MAX_ENTRIES = int(os.getenv("RESPONSE_CACHE_ENTRIES", "1024"))
+CACHE_MAX_BYTES = int(os.getenv("RESPONSE_CACHE_BYTES", str(64 * 1024 * 1024)))
+
+# Версии хранилища живут в памяти процесса, поэтому ETag включает метку
+# запуска: после рестарта старый ETag не совпадёт с новой версией
+_EPOCH = uuid.uuid4().hex[:12]
+
+CacheKey = tuple[str, str, str]
+
+
+class CachedBody(NamedTuple):
+    version: int
+    body: bytes
+    headers: dict[str, str]
+
+
+def make_etag(version: int) -> str:
+    return f'"{_EPOCH}-{version}"'
+
+
+def etag_matches(if_none_match: str | None, etag: str) -> bool:
+    """If-None-Match использует слабое сравнение: W/"x" совпадает с "x"."""
+    if not if_none_match:
+        return False
+    for candidate in if_none_match.split(","):
+        candidate = candidate.strip()
+        if candidate == "*" or candidate.removeprefix("W/") == etag:
+            return True
+    return False
+
+
+class ResponseCache:
+    """
+    LRU сериализованных тел ответов по (owner, path, query). Запись хранит версию
+    владельца, с которой была построена: после изменения данных она просто не
+    совпадает и перезаписывается, явная инвалидация не нужна.
+    """
+
+    def __init__(
+        self, max_entries: int = CACHE_MAX_ENTRIES, max_bytes: int = CACHE_MAX_BYTES
+    ) -> None:
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._entries: OrderedDict[CacheKey, CachedBody] = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: CacheKey, version: int) -> CachedBody | None:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry.version != version:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry
+
+    def put(
+        self, key: CacheKey, version: int, body: bytes, headers: dict[str, str]
+    ) -> CachedBody:
+        entry = CachedBody(version, body, headers)
+        if len(body) > self.max_bytes:
+            return entry
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self._bytes -= len(old.body)
+            self._entries[key] = entry
+            self._bytes += len(body)
+            while len(self._entries) > self.max_entries or self._bytes > self.max_bytes:
+                _, evicted = self._entries.popitem(last=False)
+                self._bytes -= len(evicted.body)
+        return entry
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def stats(self) -> dict[str, int]:
+        return {
+            "entries": len(self._entries),
+            "bytes": self._bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+        }
+
+
+response_cache = ResponseCache()
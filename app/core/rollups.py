@@ -0,0 +1,97 @@
+from __future__ import annotations
+
+from bisect import bisect_left, insort
+from decimal import Decimal
+from typing import Any, Iterable
+
+from app.core.records import from_cents
+
+_NO_PRICES = Decimal("0.00")
+
+
+def summary(
+    category: str | None,
+    count: int,
+    priced: int,
+    price_sum: Decimal | None,
+    price_min: Decimal | None,
+    price_max: Decimal | None,
+    middle: list[Decimal],
+) -> dict[str, Any]:
+    """
+    Сводка категории в форме CategoryStats. middle — одна или две средние цены
+    (для чётного числа цен медиана — их среднее).
+    """
+    return {
+        "category": category,
+        "count": count,
+        "priced": priced,
+        "price_sum": _NO_PRICES if price_sum is None else price_sum,
+        "price_min": price_min,
+        "price_max": price_max,
+        "price_median": sum(middle) / len(middle) if middle else None,
+    }
+
+
+def sort_key(row: dict[str, Any]) -> tuple[bool, str]:
+    # Желания без категории — последней строкой
+    return row["category"] is None, row["category"] or ""
+
+
+class CategoryRollup:
+    """
+    Агрегаты одной категории владельца, обновляемые на каждой записи: число
+    желаний, сумма и отсортированный список цен в копейках — min, max и
+    медиана берутся по позиции, без обхода записей.
+    """
+
+    __slots__ = ("count", "cents_sum", "prices")
+
+    def __init__(self) -> None:
+        self.count = 0
+        self.cents_sum = 0
+        self.prices: list[int] = []
+
+    def add(self, cents: int | None) -> None:
+        self.count += 1
+        if cents is not None:
+            self.cents_sum += cents
+            insort(self.prices, cents)
+
+    def remove(self, cents: int | None) -> None:
+        self.count -= 1
+        if cents is not None:
+            self.cents_sum -= cents
+            del self.prices[bisect_left(self.prices, cents)]
+
+    def summary(self, category: str | None) -> dict[str, Any]:
+        prices = self.prices
+        n = len(prices)
+        middle = sorted({(n - 1) // 2, n // 2}) if n else []
+        return summary(
+            category,
+            self.count,
+            n,
+            from_cents(self.cents_sum),
+            from_cents(prices[0]) if n else None,
+            from_cents(prices[-1]) if n else None,
+            [from_cents(prices[i]) for i in middle],
+        )
+
+
+def build(
+    entries: Iterable[tuple[str | None, int | None]],
+) -> dict[str | None, CategoryRollup]:
+    """Агрегаты по парам (категория, копейки) — списки цен сортируются один раз."""
+    rollups: dict[str | None, CategoryRollup] = {}
+    for category, cents in entries:
+        rollup = rollups.get(category)
+        if rollup is None:
+            rollup = rollups[category] = CategoryRollup()
+        rollup.count += 1
+        if cents is not None:
+            rollup.cents_sum += cents
+            rollup.prices.append(cents)
+    for rollup in rollups.values():
+        rollup.prices.sort()
+    return rollups
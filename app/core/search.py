@@ -0,0 +1,169 @@
+from __future__ import annotations
+
+import re
+from bisect import bisect_left, bisect_right, insort
+from typing import Iterable
+
+from app.core.indexes import IndexKey
+
+# Вес совпадения по полю: совпадение в названии важнее, чем в заметках
+TITLE_WEIGHT = 3
+CATEGORY_WEIGHT = 2
+NOTES_WEIGHT = 1
+
+MAX_QUERY_TERMS = 10
+
+_TOKEN = re.compile(r"\w+")
+
+# Ключ категории в постингах: \x00 не встречается в словах, поэтому с термами
+# запроса и префиксным поиском он не пересекается
+_CATEGORY = "\x00"
+
+
+def tokenize(text: str | None) -> list[str]:
+    return [] if text is None else _TOKEN.findall(text.casefold())
+
+
+def category_key(category: str) -> str:
+    return _CATEGORY + category.casefold()
+
+
+def parse_query(query: str) -> list[str]:
+    """Термы запроса; последний ищется как префикс (подсказки по мере ввода)."""
+    return tokenize(query)[:MAX_QUERY_TERMS]
+
+
+def doc_weights(title: str, notes: str | None, category: str | None) -> dict[str, int]:
+    """Вес каждого слова записи: сумма весов полей по всем вхождениям."""
+    weights: dict[str, int] = {}
+    for tokens, weight in (
+        (tokenize(title), TITLE_WEIGHT),
+        (tokenize(category), CATEGORY_WEIGHT),
+        (tokenize(notes), NOTES_WEIGHT),
+    ):
+        for token in tokens:
+            weights[token] = weights.get(token, 0) + weight
+    if category is not None:
+        weights[category_key(category)] = 0
+    return weights
+
+
+def search_text(title: str, notes: str | None, category: str | None) -> str:
+    """
+    Слова записи для SQL-бэкенда: свёрнуты тем же casefold, что и термы, и
+    обрамлены пробелами — терм ищется как « терм » (слово) или « терм»
+    (начало слова) обычным LIKE, без ILIKE с его правилами свёртки.
+    """
+    words = tokenize(title) + tokenize(category) + tokenize(notes)
+    return " " + " ".join(words) + " "
+
+
+def score(weights: dict[str, int], terms: list[str], category: str | None) -> int:
+    """
+    Ранг записи по запросу (0 — не подходит): все термы обязательны, последний —
+    префикс, из его совпадений берётся лучшее. Тот же расчёт, что и у индекса.
+    """
+    if category is not None and category_key(category) not in weights:
+        return 0
+    total = 0
+    for i, term in enumerate(terms):
+        if i == len(terms) - 1:
+            best = max(
+                (w for t, w in weights.items() if t.startswith(term)), default=None
+            )
+        else:
+            best = weights.get(term)
+        if best is None:
+            return 0
+        total += best
+    return total
+
+
+def page_keys(
+    keys: list[IndexKey], after: IndexKey | None, offset: int, limit: int | None
+) -> tuple[list[IndexKey], IndexKey | None]:
+    """Страница упорядоченных ключей (-ранг, id) после курсора after."""
+    start = (0 if after is None else bisect_right(keys, after)) + offset
+    if limit is None:
+        return keys[start:], None
+    chunk = keys[start : start + limit]
+    more = start + limit < len(keys)
+    return chunk, chunk[-1] if more and chunk else None
+
+
+class SearchIndex:
+    """
+    Инвертированный индекс записей владельца: слово -> {id -> вес}. Словарь
+    слов хранится отсортированным, поэтому префикс — это bisect и срез, как
+    в SortedIndex. Поиск трогает только записи, где встречаются слова запроса.
+    """
+
+    __slots__ = ("postings", "vocabulary")
+
+    def __init__(self) -> None:
+        self.postings: dict[str, dict[int, int]] = {}
+        self.vocabulary: list[str] = []
+
+    def add(self, wish_id: int, weights: dict[str, int]) -> None:
+        for token, weight in weights.items():
+            docs = self.postings.get(token)
+            if docs is None:
+                docs = self.postings[token] = {}
+                if not token.startswith(_CATEGORY):
+                    insort(self.vocabulary, token)
+            docs[wish_id] = weight
+
+    def remove(self, wish_id: int, weights: dict[str, int]) -> None:
+        for token in weights:
+            docs = self.postings.get(token)
+            if docs is None:
+                continue
+            docs.pop(wish_id, None)
+            if not docs:
+                del self.postings[token]
+                if not token.startswith(_CATEGORY):
+                    i = bisect_left(self.vocabulary, token)
+                    del self.vocabulary[i]
+
+    def rebuild(self, docs: Iterable[tuple[int, dict[str, int]]]) -> None:
+        self.postings = {}
+        for wish_id, weights in docs:
+            for token, weight in weights.items():
+                self.postings.setdefault(token, {})[wish_id] = weight
+        self.vocabulary = sorted(
+            t for t in self.postings if not t.startswith(_CATEGORY)
+        )
+
+    def _prefixed(self, prefix: str) -> dict[int, int]:
+        """Лучший вес каждой записи среди слов, начинающихся с prefix."""
+        vocabulary = self.vocabulary
+        best: dict[int, int] = {}
+        i = bisect_left(vocabulary, prefix)
+        while i < len(vocabulary) and vocabulary[i].startswith(prefix):
+            for wish_id, weight in self.postings[vocabulary[i]].items():
+                if weight > best.get(wish_id, -1):
+                    best[wish_id] = weight
+            i += 1
+        return best
+
+    def search(self, terms: list[str], category: str | None = None) -> list[IndexKey]:
+        """Ключи (-ранг, id) подходящих записей: сначала лучшие, затем по id."""
+        if not terms:
+            return []
+        matches = [self.postings.get(t, {}) for t in terms[:-1]]
+        matches.append(self._prefixed(terms[-1]))
+        if category is not None:
+            matches.append(self.postings.get(category_key(category), {}))
+        smallest = min(matches, key=len)
+        keys = []
+        for wish_id in smallest:
+            total = 0
+            for docs in matches:
+                weight = docs.get(wish_id)
+                if weight is None:
+                    break
+                total += weight
+            else:
+                keys.append((-total, wish_id))
+        keys.sort()
+        return keys
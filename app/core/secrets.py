@@ -2,39 +2,200 @@ from __future__ import annotations
 
 import json
 import os
-from typing import Dict
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, Callable, Dict, Protocol
 
 _DEFAULT_TOKEN_MAP: Dict[str, str] = {
     "token123": "alice",
     "token456": "bob",
 }
 
+# Сколько секунд карта токенов считается свежей и сколько помнится промах
+DEFAULT_TTL_S = float(os.getenv("SECRETS_TTL_S", "30"))
+DEFAULT_NEGATIVE_TTL_S = float(os.getenv("SECRETS_NEGATIVE_TTL_S", "5"))
+# Предел негативного кэша: перебор случайных токенов не раздувает память
+NEGATIVE_CACHE_SIZE = 10_000
+
+
+def _parse_token_map(data: Any) -> Dict[str, str] | None:
+    if isinstance(data, dict) and all(
+        isinstance(k, str) and isinstance(v, str) for k, v in data.items()
+    ):
+        return dict(data)
+    return None
+
+
+class TokenSource(Protocol):
+    """Источник карты token -> user; None — источник сейчас недоступен или пуст."""
+
+    def load(self) -> Dict[str, str] | None: ...
+
+
+class EnvTokenSource:
+    def __init__(self, var: str = "VAULT_TOKEN_MAP_JSON") -> None:
+        self.var = var
+
+    def load(self) -> Dict[str, str] | None:
+        raw = os.getenv(self.var)
+        if not raw:
+            return None
+        try:
+            return _parse_token_map(json.loads(raw))
+        except ValueError:
+            return None
+
+
+class FileTokenSource:
+    """JSON-файл с картой; перечитывается только при смене mtime/размера."""
+
+    def __init__(self, path: str | Path) -> None:
+        self.path = Path(path)
+        self._stamp: tuple[int, int] | None = None
+        self._data: Dict[str, str] | None = None
+
+    def _extract(self, data: Any) -> Dict[str, str] | None:
+        return _parse_token_map(data)
+
+    def load(self) -> Dict[str, str] | None:
+        try:
+            st = self.path.stat()
+            stamp = (st.st_mtime_ns, st.st_size)
+            if stamp != self._stamp:
+                data = json.loads(self.path.read_text(encoding="utf-8"))
+                self._data = self._extract(data)
+                self._stamp = stamp
+        except (OSError, ValueError):
+            return None
+        return self._data
+
+
+class LocalVaultTokenSource(FileTokenSource):
+    """
+    Локальная замена Vault: файл в формате ответа KV v2
+    ({"data": {"data": {token: user}}}), чтобы dev и CI не зависели от сервера.
+    """
+
+    def _extract(self, data: Any) -> Dict[str, str] | None:
+        try:
+            return _parse_token_map(data["data"]["data"])
+        except (KeyError, TypeError):
+            return None
+
+
+def source_from_env() -> TokenSource:
+    kind = os.getenv("SECRETS_SOURCE", "env")
+    if kind == "file":
+        return FileTokenSource(os.environ["SECRETS_FILE"])
+    if kind == "vault":
+        return LocalVaultTokenSource(os.environ["SECRETS_FILE"])
+    return EnvTokenSource()
+
 
 class SecretsProvider:
-    def __init__(self, env_json_var: str = "VAULT_TOKEN_MAP_JSON"):
-        self._env_json_var = env_json_var
+    """
+    Карта токенов с TTL. Первая загрузка синхронная; после истечения TTL
+    запросы продолжают работать со старой картой, а фоновый поток грузит
+    новую и подменяет её одной ссылкой. Неизвестные токены попадают в
+    ограниченный негативный кэш: повторный промах не дёргает источник,
+    а первый — запускает внеочередное обновление (токен мог быть выдан только что).
+    """
+
+    def __init__(
+        self,
+        env_json_var: str = "VAULT_TOKEN_MAP_JSON",
+        *,
+        source: TokenSource | None = None,
+        ttl: float = DEFAULT_TTL_S,
+        negative_ttl: float = DEFAULT_NEGATIVE_TTL_S,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self._source = source if source is not None else EnvTokenSource(env_json_var)
+        self._ttl = ttl
+        self._negative_ttl = negative_ttl
+        self._clock = clock
         self._cache: Dict[str, str] | None = None
+        self._expires = 0.0
+        self._loaded_at = 0.0
+        self._misses: OrderedDict[str, float] = OrderedDict()
+        self._misses_lock = threading.Lock()
+        self._lock = threading.Lock()
+        self._refreshing = False
 
-    def get_token_map(self) -> Dict[str, str]:
-        if self._cache is not None:
-            return self._cache
-        raw = os.getenv(self._env_json_var)
-        if raw:
+    def _load(self) -> Dict[str, str] | None:
+        try:
+            return self._source.load()
+        except Exception:
+            return None
+
+    def _store(self, data: Dict[str, str] | None) -> None:
+        if data is not None:
+            self._cache = data
+            self._misses = OrderedDict()
+        elif self._cache is None:
+            self._cache = dict(_DEFAULT_TOKEN_MAP)
+        # Ошибка источника не сбрасывает рабочую карту — ждём следующего TTL
+        self._loaded_at = self._clock()
+        self._expires = self._loaded_at + self._ttl
+
+    def refresh(self) -> None:
+        """Синхронно перечитывает источник."""
+        self._store(self._load())
+
+    def _refresh_in_background(self) -> None:
+        with self._lock:
+            if self._refreshing:
+                return
+            self._refreshing = True
+
+        def run() -> None:
             try:
-                data = json.loads(raw)
-                if isinstance(data, dict) and all(
-                    isinstance(k, str) and isinstance(v, str) for k, v in data.items()
-                ):
-                    self._cache = data
-                    return self._cache
-            except Exception:
-                pass
-        self._cache = dict(_DEFAULT_TOKEN_MAP)
-        return self._cache
+                self.refresh()
+            finally:
+                self._refreshing = False
+
+        threading.Thread(target=run, name="secrets-refresh", daemon=True).start()
+
+    def get_token_map(self) -> Dict[str, str]:
+        cache = self._cache
+        if cache is None:
+            with self._lock:
+                if self._cache is None:
+                    self.refresh()
+            return self._cache  # type: ignore[return-value]
+        if self._clock() >= self._expires:
+            self._refresh_in_background()
+        return cache
 
+    def lookup(self, token: str) -> str | None:
+        user = self.get_token_map().get(token)
+        if user is not None:
+            return user
+        now = self._clock()
+        with self._misses_lock:
+            misses = self._misses
+            expires = misses.get(token)
+            if expires is not None and expires > now:
+                return None
+            misses[token] = now + self._negative_ttl
+            misses.move_to_end(token)
+            if len(misses) > NEGATIVE_CACHE_SIZE:
+                misses.popitem(last=False)
+        # Внеочередное обновление не чаще раза в negative_ttl, чтобы поток
+        # случайных токенов не превратился в поток запросов к источнику
+        if now - self._loaded_at >= self._negative_ttl:
+            self._refresh_in_background()
+        return None
 
-_provider = SecretsProvider()
+
+_provider = SecretsProvider(source=source_from_env())
 
 
 def get_token_map() -> Dict[str, str]:
     return _provider.get_token_map()
+
+
+def lookup_user(token: str) -> str | None:
+    return _provider.lookup(token)
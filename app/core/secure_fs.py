@@ -33,6 +33,18 @@ def secure_save(base_dir: str | Path, data: bytes) -> Tuple[Path, MimeType]:
     if mt is None:
         raise AppValidationError("unsupported file type")
 
+    # Имя файла — UUID + расширение по типу
+    ext = ".png" if mt == "image/png" else ".jpg"
+    path = resolve_inside(base_dir, f"{uuid.uuid4()}{ext}")
+
+    # Сохраняем
+    with open(path, "wb") as f:
+        f.write(data)
+    return path, mt
+
+
+def resolve_inside(base_dir: str | Path, name: str) -> Path:
+    """Путь к файлу name внутри base_dir по тем же правилам, что и у загрузок."""
     # Канонизируем и требуем, чтобы корневая папка существовала
     root = Path(base_dir).resolve(strict=True)
 
@@ -40,16 +52,9 @@ def secure_save(base_dir: str | Path, data: bytes) -> Tuple[Path, MimeType]:
     if any(p.is_symlink() for p in root.parents):
         raise AppValidationError("symlink parent not allowed")
 
-    # Имя файла — UUID + расширение по типу
-    ext = ".png" if mt == "image/png" else ".jpg"
-    name = f"{uuid.uuid4()}{ext}"
     path = (root / name).resolve()
 
     # Гарантируем, что путь остаётся внутри корня
-    if not str(path).startswith(str(root)):
+    if not path.is_relative_to(root) or path == root:
         raise AppValidationError("path traversal detected")
-
-    # Сохраняем
-    with open(path, "wb") as f:
-        f.write(data)
-    return path, mt
+    return path
@@ -0,0 +1,45 @@
+from __future__ import annotations
+
+import json
+from decimal import Decimal
+from typing import Any, Iterable
+
+from starlette.responses import Response
+
+from app.models.wish import Wish
+
+# Порядок полей — как в схеме Wish, чтобы байты совпадали с response_model
+WISH_FIELDS = tuple(Wish.model_fields)
+
+
+def _default(value: Any) -> str:
+    if isinstance(value, Decimal):
+        return str(value)
+    raise TypeError(f"unserializable {type(value).__name__}")
+
+
+_encoder = json.JSONEncoder(default=_default, ensure_ascii=False, separators=(",", ":"))
+
+
+def encode_record(record: dict[str, Any]) -> bytes:
+    """
+    JSON записи хранилища без повторной валидации: записи уже прошли Wish
+    на входе, поэтому вывод тот же, что у TypeAdapter(Wish).dump_json.
+    """
+    return _encoder.encode({name: record.get(name) for name in WISH_FIELDS}).encode(
+        "utf-8"
+    )
+
+
+def join_array(fragments: Iterable[bytes]) -> bytes:
+    return b"[" + b",".join(fragments) + b"]"
+
+
+def encode_records(records: Iterable[dict[str, Any]]) -> bytes:
+    return join_array(encode_record(r) for r in records)
+
+
+class PreEncodedJSONResponse(Response):
+    """JSON-ответ из готовых байтов: FastAPI не валидирует и не сериализует его."""
+
+    media_type = "application/json"
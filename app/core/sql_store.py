@@ -0,0 +1,526 @@
+from __future__ import annotations
+
+import heapq
+from decimal import Decimal
+from itertools import islice
+from typing import Any, AsyncIterator, Callable, Iterator, NamedTuple
+
+from sqlalchemy import Select, and_, delete, false, insert, select, true, tuple_, update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.sql import func, or_
+
+from app.core.batch import BatchConflict, Change, Conflict, plan_batch
+from app.core.indexes import IndexKey
+from app.core.query import WishQuery, prefix_end
+from app.core.rollups import sort_key, summary
+from app.core.search import doc_weights, page_keys, score, search_text
+from app.core.serialization import encode_records
+from app.core.store import Page, Record, awalk_pages
+from app.db_models.wish import WishORM
+
+_ZERO = Decimal("0")
+
+# Размер списка в IN (...): SQLite ограничивает число параметров запроса
+_IN_CHUNK = 500
+
+_FIELDS = ("id", "title", "link", "price_estimate", "notes", "category")
+
+
+def _to_record(row: WishORM) -> Record:
+    record: Record = {name: getattr(row, name) for name in _FIELDS}
+    record["owner"] = row.owner
+    return record
+
+
+def _columns(owner: str, record: Record) -> dict[str, Any]:
+    values = {name: record.get(name) for name in _FIELDS}
+    values["owner"] = owner
+    category = values["category"]
+    values["search_text"] = search_text(values["title"], values["notes"], category)
+    values["category_folded"] = None if category is None else category.casefold()
+    return values
+
+
+def _sort_value(index: str, record: Record) -> Any:
+    if index == "price_estimate":
+        price = record.get("price_estimate")
+        return _ZERO if price is None else price
+    return record[index]
+
+
+def _where(owner: str, wish_id: int):
+    return and_(WishORM.owner == owner, WishORM.id == wish_id)
+
+
+def _id_chunks(owner: str, ids: list[int]) -> Iterator[Select]:
+    for start in range(0, len(ids), _IN_CHUNK):
+        chunk = ids[start : start + _IN_CHUNK]
+        yield select(WishORM.id).where(WishORM.owner == owner, WishORM.id.in_(chunk))
+
+
+def _touched(changes: list[Change]) -> list[int]:
+    ids = {c.wish_id for c in changes}
+    ids.update(c.record["id"] for c in changes if c.record is not None)
+    return sorted(ids)
+
+
+def _delete_chunks(owner: str, ids: list[int]) -> Iterator[Any]:
+    for start in range(0, len(ids), _IN_CHUNK):
+        chunk = ids[start : start + _IN_CHUNK]
+        yield delete(WishORM).where(WishORM.owner == owner, WishORM.id.in_(chunk))
+
+
+def _search_stmt(owner: str, terms: list[str], category: str | None) -> Select:
+    """
+    Отбор строк для поиска по свёрнутым колонкам (search_text, category_folded):
+    свёртка та же, что у in-memory индекса, поэтому LIKE отбирает ровно те
+    записи, где каждый терм — слово, а последний — начало слова.
+    """
+    stmt = select(WishORM).where(WishORM.owner == owner)
+    for i, term in enumerate(terms):
+        word = " " + term.replace("_", "\\_")
+        pattern = "%" + word + ("%" if i == len(terms) - 1 else " %")
+        stmt = stmt.where(WishORM.search_text.like(pattern, escape="\\"))
+    if category is not None:
+        stmt = stmt.where(WishORM.category_folded == category.casefold())
+    return stmt
+
+
+def _ranked_page(
+    rows: list[WishORM],
+    terms: list[str],
+    category: str | None,
+    after: IndexKey | None,
+    offset: int,
+    limit: int | None,
+) -> Page:
+    """Ранжирует строки тем же расчётом, что и индекс in-memory хранилища."""
+    by_id = {}
+    keys = []
+    for row in rows:
+        rank = score(doc_weights(row.title, row.notes, row.category), terms, category)
+        if rank:
+            by_id[row.id] = row
+            keys.append((-rank, row.id))
+    keys.sort()
+    chunk, next_key = page_keys(keys, after, offset, limit)
+    return Page([_to_record(by_id[i]) for _, i in chunk], next_key)
+
+
+def _ordered(stmt: Select, column: Any, ascending: bool) -> Select:
+    columns = [WishORM.id] if column is WishORM.id else [column, WishORM.id]
+    return stmt.order_by(*(c.asc() if ascending else c.desc() for c in columns))
+
+
+def _seek(column: Any, after: IndexKey, ascending: bool):
+    if column is WishORM.id:
+        key, value = WishORM.id, after[1]
+    else:
+        # Сравнение кортежей (value, id) > (?, ?) СУБД отрабатывает поиском по
+        # составному индексу, в отличие от эквивалентного OR из двух условий
+        key, value = tuple_(column, WishORM.id), tuple_(*after)
+    return key > value if ascending else key < value
+
+
+def _unpriced_after(after: IndexKey, ascending: bool):
+    """Условие на желания без цены (ключ (0, id)) после курсора after."""
+    value, wish_id = after
+    if value == _ZERO:
+        return WishORM.id > wish_id if ascending else WishORM.id < wish_id
+    return true() if (value < _ZERO) == ascending else false()
+
+
+class _PagePlan(NamedTuple):
+    statements: list[Select]
+    index: str
+    ascending: bool
+    # Если запросов несколько, offset/limit применяются после слияния
+    offset: int
+    limit: int | None
+
+
+def _page_plan(
+    owner: str,
+    index: str,
+    *,
+    ascending: bool,
+    after: IndexKey | None,
+    offset: int,
+    limit: int | None,
+    below: Decimal | None,
+    above: Decimal | None,
+    category: str | None,
+    where: tuple[Any, ...] = (),
+) -> _PagePlan:
+    """
+    Запросы страницы, каждый из которых обслуживается одним индексом
+    (owner, <поле>, id) — без сортировки во временной таблице.
+    where — дополнительные условия (составной запрос).
+    """
+    base = select(WishORM).where(WishORM.owner == owner, *where)
+    if category is not None:
+        index, column = "id", WishORM.id
+        base = base.where(WishORM.category == category)
+    elif index == "price_estimate":
+        column = WishORM.price_estimate
+    else:
+        column = getattr(WishORM, index)
+
+    if index == "price_estimate":
+        priced = base.where(column.is_not(None))
+        if below is not None:
+            priced = priced.where(column < below)
+        if above is not None:
+            priced = priced.where(column > above)
+        if after is not None:
+            priced = priced.where(_seek(column, after, ascending))
+        priced = _ordered(priced, column, ascending)
+        if below is None and above is None:
+            # Желания без цены сортируются как бесплатные (как в памяти):
+            # отдельный запрос по тому же индексу и слияние двух потоков
+            unpriced = base.where(column.is_(None))
+            if after is not None:
+                unpriced = unpriced.where(_unpriced_after(after, ascending))
+            unpriced = _ordered(unpriced, WishORM.id, ascending)
+            statements = [priced, unpriced]
+            if limit is not None:
+                statements = [s.limit(offset + limit + 1) for s in statements]
+            return _PagePlan(statements, index, ascending, offset, limit)
+        stmt = priced
+    else:
+        stmt = base
+        if after is not None:
+            stmt = stmt.where(_seek(column, after, ascending))
+        stmt = _ordered(stmt, column, ascending)
+
+    if offset:
+        stmt = stmt.offset(offset)
+    if limit is not None:
+        stmt = stmt.limit(limit + 1)
+    return _PagePlan([stmt], index, ascending, 0, limit)
+
+
+def _query_plan(
+    owner: str,
+    q: WishQuery,
+    *,
+    after: IndexKey | None,
+    offset: int,
+    limit: int | None,
+) -> _PagePlan:
+    """
+    Составной запрос: все условия — в WHERE одного запроса, индекс выбирает
+    планировщик БД. Ценовые границы при сортировке по цене идут в _page_plan,
+    чтобы не строить лишний запрос по желаниям без цены.
+    """
+    where = []
+    if q.categories:
+        where.append(WishORM.category.in_(q.categories))
+    by_price = q.order_by == "price_estimate"
+    if not by_price:
+        if q.above is not None:
+            where.append(WishORM.price_estimate > q.above)
+        if q.below is not None:
+            where.append(WishORM.price_estimate < q.below)
+    if q.title_prefix:
+        # Диапазон, а не LIKE: тот же порядок строк, что у индекса в памяти,
+        # и поиск по индексу (owner, title, id)
+        where.append(WishORM.title >= q.title_prefix)
+        end = prefix_end(q.title_prefix)
+        if end is not None:
+            where.append(WishORM.title < end)
+    if q.has_link is not None:
+        link = WishORM.link
+        where.append(link.is_not(None) if q.has_link else link.is_(None))
+    return _page_plan(
+        owner,
+        q.order_by,
+        ascending=q.ascending,
+        after=after,
+        offset=offset,
+        limit=limit,
+        below=q.below if by_price else None,
+        above=q.above if by_price else None,
+        category=None,
+        where=tuple(where),
+    )
+
+
+def _stats_stmts(owner: str) -> tuple[Select, Select]:
+    """
+    Сводка по категориям: агрегаты одним GROUP BY и средние цены (медиана)
+    через row_number() по категории. Оба запроса читают только индекс
+    (owner, category, price_estimate) — и уже в нужном порядке.
+    """
+    category, price = WishORM.category, WishORM.price_estimate
+    totals = (
+        select(
+            category,
+            func.count(),
+            func.count(price),
+            func.sum(price),
+            func.min(price),
+            func.max(price),
+        )
+        .where(WishORM.owner == owner)
+        .group_by(category)
+    )
+    ranked = (
+        select(
+            category,
+            price,
+            func.row_number().over(partition_by=category, order_by=price).label("rn"),
+            # Та же сортировка, что у row_number(), но рамка — вся категория:
+            # оба окна считаются за один проход по индексу
+            func.count()
+            .over(partition_by=category, order_by=price, rows=(None, None))
+            .label("n"),
+        )
+        .where(WishORM.owner == owner, price.is_not(None))
+        .subquery()
+    )
+    middle = select(ranked.c.category, ranked.c.price_estimate).where(
+        or_(ranked.c.rn == (ranked.c.n + 1) // 2, ranked.c.rn == (ranked.c.n + 2) // 2)
+    )
+    return totals, middle
+
+
+def _to_stats(totals: list[Any], middle: list[Any]) -> list[Record]:
+    medians: dict[str | None, list[Decimal]] = {}
+    for category, price in middle:
+        medians.setdefault(category, []).append(price)
+    rows = [
+        summary(category, *aggregates, medians.get(category, []))
+        for category, *aggregates in totals
+    ]
+    return sorted(rows, key=sort_key)
+
+
+def _to_page(plan: _PagePlan, results: list[list[WishORM]]) -> Page:
+    index, limit = plan.index, plan.limit
+    records = [[_to_record(row) for row in rows] for rows in results]
+    if len(records) == 1:
+        items = records[0]
+    else:
+        merged = heapq.merge(
+            *records,
+            key=lambda r: (_sort_value(index, r), r["id"]),
+            reverse=not plan.ascending,
+        )
+        stop = None if limit is None else plan.offset + limit + 1
+        items = list(islice(merged, plan.offset, stop))
+    next_key = None
+    if limit is not None and len(items) > limit:
+        del items[limit:]
+        last = items[-1]
+        next_key = (_sort_value(index, last), last["id"])
+    return Page(items, next_key)
+
+
+class AsyncSqlWishRepository:
+    """
+    Репозиторий поверх WishORM и AsyncSession: запрос не занимает поток.
+    С sessions= сессия открывается при первом обращении к БД, так что запрос,
+    отклонённый раньше (auth, валидация), не берёт соединение из пула.
+    """
+
+    def __init__(
+        self,
+        db: AsyncSession | None = None,
+        *,
+        sessions: Callable[[], AsyncSession] | None = None,
+    ) -> None:
+        self._db = db
+        self._sessions = sessions
+
+    @property
+    def db(self) -> AsyncSession:
+        if self._db is None:
+            self._db = self._sessions()
+        return self._db
+
+    async def close(self) -> None:
+        if self._db is not None:
+            await self._db.close()
+
+    async def get(self, owner: str, wish_id: int) -> Record | None:
+        row = await self.db.get(WishORM, (owner, wish_id))
+        return None if row is None else _to_record(row)
+
+    async def exists(self, owner: str, wish_id: int) -> bool:
+        stmt = select(WishORM.id).where(_where(owner, wish_id))
+        return (await self.db.execute(stmt)).first() is not None
+
+    async def add(self, owner: str, record: Record) -> bool:
+        self.db.add(WishORM(**_columns(owner, record)))
+        try:
+            await self.db.commit()
+        except IntegrityError:
+            await self.db.rollback()
+            return False
+        return True
+
+    async def replace(
+        self, owner: str, wish_id: int, record: Record
+    ) -> Conflict | None:
+        stmt = (
+            update(WishORM)
+            .where(_where(owner, wish_id))
+            .values(**_columns(owner, record))
+        )
+        try:
+            updated = (await self.db.execute(stmt)).rowcount
+            await self.db.commit()
+        except IntegrityError:
+            await self.db.rollback()
+            return "exists"
+        return None if updated else "missing"
+
+    async def remove(self, owner: str, wish_id: int) -> bool:
+        deleted = await self.db.execute(delete(WishORM).where(_where(owner, wish_id)))
+        await self.db.commit()
+        return deleted.rowcount > 0
+
+    async def version(self, owner: str) -> int | None:
+        # Счётчика версий в БД нет (строки меняют и другие воркеры), поэтому
+        # условные запросы и кэш ответов для SQL-бэкенда не используются
+        return None
+
+    async def encode(self, owner: str, records: list[Record]) -> bytes:
+        return encode_records(records)
+
+    async def _conflicts(self, owner: str, ids: list[int]) -> list[int]:
+        conflicts: list[int] = []
+        for stmt in _id_chunks(owner, ids):
+            conflicts.extend(await self.db.scalars(stmt))
+        return conflicts
+
+    async def add_many(self, owner: str, records: list[Record]) -> list[int]:
+        batch = self.begin_import(owner)
+        conflicts = await batch.write(records)
+        if conflicts:
+            await batch.rollback()
+            return conflicts
+        return await batch.commit()
+
+    async def apply(self, owner: str, changes: list[Change]) -> BatchConflict | None:
+        for attempt in range(2):
+            existing = set(await self._conflicts(owner, _touched(changes)))
+            plan = plan_batch(changes, existing.__contains__)
+            if isinstance(plan, BatchConflict):
+                return plan
+            rewritten = [r["id"] for r in plan.records if r["id"] in existing]
+            try:
+                for stmt in _delete_chunks(owner, plan.deleted + rewritten):
+                    await self.db.execute(stmt)
+                if plan.records:
+                    await self.db.execute(
+                        insert(WishORM), [_columns(owner, r) for r in plan.records]
+                    )
+                await self.db.commit()
+                return None
+            except IntegrityError:
+                await self.db.rollback()
+                if attempt:
+                    raise
+        return None
+
+    async def search(
+        self,
+        owner: str,
+        terms: list[str],
+        *,
+        category: str | None = None,
+        after: IndexKey | None = None,
+        offset: int = 0,
+        limit: int | None = None,
+    ) -> Page:
+        rows = list(await self.db.scalars(_search_stmt(owner, terms, category)))
+        return _ranked_page(rows, terms, category, after, offset, limit)
+
+    async def category_stats(self, owner: str) -> list[Record]:
+        totals, middle = _stats_stmts(owner)
+        return _to_stats(
+            list(await self.db.execute(totals)), list(await self.db.execute(middle))
+        )
+
+    async def query(
+        self,
+        owner: str,
+        q: WishQuery,
+        *,
+        after: IndexKey | None = None,
+        offset: int = 0,
+        limit: int | None = None,
+    ) -> Page:
+        plan = _query_plan(owner, q, after=after, offset=offset, limit=limit)
+        results = [list(await self.db.scalars(s)) for s in plan.statements]
+        return _to_page(plan, results)
+
+    def begin_import(self, owner: str) -> AsyncSqlImport:
+        return AsyncSqlImport(self, owner)
+
+    async def iter_pages(self, owner: str, size: int) -> AsyncIterator[list[Record]]:
+        try:
+            async for records in awalk_pages(self.page, owner, size):
+                yield records
+        finally:
+            await self.close()
+
+    async def page(
+        self,
+        owner: str,
+        index: str = "id",
+        *,
+        ascending: bool = True,
+        after: IndexKey | None = None,
+        offset: int = 0,
+        limit: int | None = None,
+        below: Decimal | None = None,
+        above: Decimal | None = None,
+        category: str | None = None,
+    ) -> Page:
+        plan = _page_plan(
+            owner,
+            index,
+            ascending=ascending,
+            after=after,
+            offset=offset,
+            limit=limit,
+            below=below,
+            above=above,
+            category=category,
+        )
+        results = [list(await self.db.scalars(s)) for s in plan.statements]
+        return _to_page(plan, results)
+
+
+class AsyncSqlImport:
+    def __init__(self, repo: AsyncSqlWishRepository, owner: str) -> None:
+        self._repo = repo
+        self._owner = owner
+
+    async def write(self, records: list[Record]) -> list[int]:
+        if not records:
+            return []
+        db = self._repo.db
+        ids = [r["id"] for r in records]
+        conflicts = await self._repo._conflicts(self._owner, ids)
+        if conflicts:
+            return conflicts
+        try:
+            await db.execute(
+                insert(WishORM), [_columns(self._owner, r) for r in records]
+            )
+        except IntegrityError:
+            await db.rollback()
+            return ids
+        return []
+
+    async def commit(self) -> list[int]:
+        await self._repo.db.commit()
+        return []
+
+    async def rollback(self) -> None:
+        await self._repo.db.rollback()
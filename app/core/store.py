@@ -0,0 +1,945 @@
+from __future__ import annotations
+
+import heapq
+import itertools
+import sys
+import threading
+from bisect import bisect_left, bisect_right
+from collections.abc import AsyncIterator, Awaitable, Callable, Iterable, Iterator
+from contextlib import ExitStack, contextmanager
+from decimal import Decimal
+from itertools import islice
+from typing import Any, NamedTuple, Protocol
+
+from starlette.concurrency import run_in_threadpool
+
+from app.core.batch import BatchConflict, Change, Conflict, Record, plan_batch
+from app.core.indexes import IndexKey, SortedIndex
+from app.core.query import QueryPlan, WishQuery, choose_plan, matches, prefix_end
+from app.core.records import CompactWish, cents_bound, from_cents
+from app.core.rollups import CategoryRollup, build, sort_key
+from app.core.search import SearchIndex, doc_weights, page_keys
+from app.core.serialization import encode_record, encode_records, join_array
+
+# Индексы, по которым можно упорядочить выдачу
+INDEXES = ("id", "price_estimate", "title")
+
+_ZERO = Decimal("0")
+
+# Число замков-полос: владельцы из разных полос пишут параллельно
+LOCK_STRIPES = 64
+
+
+class Page(NamedTuple):
+    items: list[Record]
+    # Ключ последней записи страницы, если дальше есть ещё записи
+    next_key: IndexKey | None
+
+
+def walk_pages(
+    page: Callable[..., Page], owner: str, size: int
+) -> Iterator[list[Record]]:
+    """Обходит все записи владельца страницами keyset-курсора по id."""
+    after = None
+    while True:
+        result = page(owner, after=after, limit=size)
+        if result.items:
+            yield result.items
+        if result.next_key is None:
+            return
+        after = result.next_key
+
+
+async def awalk_pages(
+    page: Callable[..., Awaitable[Page]], owner: str, size: int
+) -> AsyncIterator[list[Record]]:
+    """walk_pages для async-репозитория."""
+    after = None
+    while True:
+        result = await page(owner, after=after, limit=size)
+        if result.items:
+            yield result.items
+        if result.next_key is None:
+            return
+        after = result.next_key
+
+
+class Journal(Protocol):
+    """Получатель изменений WishStore (журнал для восстановления после рестарта)."""
+
+    def put(self, owner: str, records: list[Record]) -> None: ...
+
+    def delete(self, owner: str, wish_id: int) -> None: ...
+
+    def apply(self, owner: str, deleted: list[int], records: list[Record]) -> None: ...
+
+    def clear(self) -> None: ...
+
+
+class StoreStats:
+    """Агрегаты записей, обновляемые на каждой записи — чтение O(1) на полосу."""
+
+    __slots__ = ("total", "priced", "price_cents", "by_category")
+
+    def __init__(self) -> None:
+        self.total = 0
+        self.priced = 0
+        self.price_cents = 0
+        self.by_category: dict[str, int] = {}
+
+    @property
+    def price_sum(self) -> Decimal:
+        return from_cents(self.price_cents)
+
+    def add(self, wish: CompactWish) -> None:
+        self.total += 1
+        if wish.cents is not None:
+            self.priced += 1
+            self.price_cents += wish.cents
+        category = wish.category
+        if category is not None:
+            self.by_category[category] = self.by_category.get(category, 0) + 1
+
+    def remove(self, wish: CompactWish) -> None:
+        self.total -= 1
+        if wish.cents is not None:
+            self.priced -= 1
+            self.price_cents -= wish.cents
+        category = wish.category
+        if category is not None:
+            left = self.by_category[category] - 1
+            if left:
+                self.by_category[category] = left
+            else:
+                del self.by_category[category]
+
+    def merge(self, other: StoreStats) -> None:
+        self.total += other.total
+        self.priced += other.priced
+        self.price_cents += other.price_cents
+        for category, n in other.by_category.items():
+            self.by_category[category] = self.by_category.get(category, 0) + n
+
+    def avg_price(self) -> Decimal:
+        # Как и раньше: желания без цены считаются бесплатными
+        return self.price_sum / self.total if self.total else _ZERO
+
+
+def _weights(wish: CompactWish) -> dict[str, int]:
+    return doc_weights(wish.title, wish.notes, wish.category)
+
+
+def _order_key(wish: CompactWish, index: str) -> IndexKey:
+    if index == "title":
+        return (wish.title, wish.id)
+    if index == "price_estimate":
+        return (wish.cents or 0, wish.id)
+    return (wish.id, wish.id)
+
+
+def _normalized(q: WishQuery) -> WishQuery:
+    return q._replace(
+        categories=tuple(dict.fromkeys(q.categories)),
+        title_prefix=q.title_prefix or None,
+    )
+
+
+class _OwnerBucket:
+    """Записи одного владельца и вторичные индексы поверх них."""
+
+    __slots__ = (
+        "owner",
+        "stats",
+        "records",
+        "by_id",
+        "by_price",
+        "unpriced",
+        "by_title",
+        "by_category",
+        "search",
+        "rollups",
+        "fragments",
+    )
+
+    def __init__(self, owner: str, stats: StoreStats) -> None:
+        self.owner = owner
+        self.stats = stats
+        self.records: dict[int, CompactWish] = {}
+        self.by_id = SortedIndex()
+        # Ключи ценового индекса — копейки. Желания без цены сортируются как
+        # бесплатные, но в ценовые фильтры не попадают — поэтому держим их отдельно
+        self.by_price = SortedIndex()
+        self.unpriced = SortedIndex()
+        self.by_title = SortedIndex()
+        self.by_category: dict[str, SortedIndex] = {}
+        self.search = SearchIndex()
+        # Агрегаты цен по категориям (None — желания без категории) для /stats
+        self.rollups: dict[str | None, CategoryRollup] = {}
+        # Готовый JSON записей, уже попадавших в выдачу; сбрасывается при изменении
+        self.fragments: dict[int, bytes] = {}
+
+    def index(self, wish: CompactWish) -> None:
+        self.stats.add(wish)
+        wish_id = wish.id
+        self.by_id.add(wish_id, wish_id)
+        if wish.cents is None:
+            self.unpriced.add(0, wish_id)
+        else:
+            self.by_price.add(wish.cents, wish_id)
+        self.by_title.add(wish.title, wish_id)
+        self.search.add(wish_id, _weights(wish))
+        rollup = self.rollups.get(wish.category)
+        if rollup is None:
+            rollup = self.rollups[wish.category] = CategoryRollup()
+        rollup.add(wish.cents)
+        if wish.category is not None:
+            self.by_category.setdefault(wish.category, SortedIndex()).add(
+                wish_id, wish_id
+            )
+
+    def unindex(self, wish: CompactWish) -> None:
+        self.stats.remove(wish)
+        wish_id = wish.id
+        self.fragments.pop(wish_id, None)
+        self.by_id.discard(wish_id, wish_id)
+        if wish.cents is None:
+            self.unpriced.discard(0, wish_id)
+        else:
+            self.by_price.discard(wish.cents, wish_id)
+        self.by_title.discard(wish.title, wish_id)
+        self.search.remove(wish_id, _weights(wish))
+        rollup = self.rollups[wish.category]
+        rollup.remove(wish.cents)
+        if not rollup.count:
+            del self.rollups[wish.category]
+        if wish.category is not None:
+            index = self.by_category[wish.category]
+            index.discard(wish_id, wish_id)
+            if not index:
+                del self.by_category[wish.category]
+
+    def reindex(self) -> None:
+        self.fragments.clear()
+        values = self.records.values()
+        self.by_id.rebuild((w.id, w.id) for w in values)
+        self.by_price.rebuild((w.cents, w.id) for w in values if w.cents is not None)
+        self.unpriced.rebuild((0, w.id) for w in values if w.cents is None)
+        self.by_title.rebuild((w.title, w.id) for w in values)
+        self.search.rebuild((w.id, _weights(w)) for w in values)
+        self.rollups = build((w.category, w.cents) for w in values)
+        by_category: dict[str, list[IndexKey]] = {}
+        for w in values:
+            if w.category is not None:
+                by_category.setdefault(w.category, []).append((w.id, w.id))
+        self.by_category = {}
+        for category, keys in by_category.items():
+            self.by_category[category] = index = SortedIndex()
+            index.rebuild(keys)
+
+    def put(self, wish: CompactWish) -> CompactWish | None:
+        old = self.records.get(wish.id)
+        if old is not None:
+            self.unindex(old)
+        self.records[wish.id] = wish
+        self.index(wish)
+        return old
+
+    def put_many(self, wishes: list[CompactWish]) -> None:
+        if len(wishes) <= len(self.records):
+            for wish in wishes:
+                self.put(wish)
+            return
+        for wish in wishes:
+            old = self.records.get(wish.id)
+            if old is not None:
+                self.stats.remove(old)
+            self.records[wish.id] = wish
+            self.stats.add(wish)
+        self.reindex()
+
+    def pop(self, wish_id: int) -> CompactWish | None:
+        old = self.records.pop(wish_id, None)
+        if old is not None:
+            self.unindex(old)
+        return old
+
+    def walk(
+        self,
+        index: str,
+        *,
+        ascending: bool,
+        after: IndexKey | None,
+        below: Decimal | None,
+        above: Decimal | None,
+        category: str | None,
+    ) -> Iterator[IndexKey]:
+        if category is not None:
+            cat_index = self.by_category.get(category)
+            if cat_index is None:
+                return iter(())
+            return cat_index.walk(ascending=ascending, after=after)
+        if index == "id":
+            return self.by_id.walk(ascending=ascending, after=after)
+        if index == "title":
+            return self.by_title.walk(ascending=ascending, after=after)
+        priced = self.by_price.walk(
+            ascending=ascending, after=after, below=below, above=above
+        )
+        if below is not None or above is not None:
+            return priced
+        unpriced = self.unpriced.walk(ascending=ascending, after=after)
+        return heapq.merge(priced, unpriced, reverse=not ascending)
+
+    def take(
+        self, keys: Iterator[IndexKey], offset: int, limit: int | None
+    ) -> tuple[list[Record], IndexKey | None]:
+        """Записи страницы из потока ключей и ключ последней, если есть ещё."""
+        stop = None if limit is None else offset + limit + 1
+        chunk = list(islice(keys, offset, stop))
+        records, owner = self.records, self.owner
+        items = [records[wish_id].unpack(owner) for _, wish_id in chunk]
+        if limit is None or len(chunk) <= limit:
+            return items, None
+        del items[limit:]
+        return items, chunk[limit - 1]
+
+    def estimates(
+        self, q: WishQuery, above: Decimal | None, below: Decimal | None
+    ) -> dict[str, int]:
+        """
+        Число кандидатов от каждого применимого индекса: длины и bisect, без
+        обхода. Индекс порядка выдачи доступен всегда — как полный обход.
+        """
+        found = {"id": len(self.records)}
+        if q.categories:
+            found["category"] = sum(
+                len(self.by_category.get(c, ())) for c in q.categories
+            )
+        if q.priced:
+            found["price_estimate"] = self.by_price.count(below=below, above=above)
+        elif q.order_by == "price_estimate":
+            found["price_estimate"] = len(self.records)
+        if q.title_prefix is not None:
+            found["title"] = self.by_title.count(
+                start=q.title_prefix, below=prefix_end(q.title_prefix)
+            )
+        elif q.order_by == "title":
+            found["title"] = len(self.records)
+        return found
+
+    def candidates(
+        self,
+        plan: QueryPlan,
+        q: WishQuery,
+        *,
+        ascending: bool,
+        after: IndexKey | None,
+        above: Decimal | None,
+        below: Decimal | None,
+    ) -> Iterator[IndexKey]:
+        if plan.driver == "category":
+            walks = [
+                self.by_category[c].walk(ascending=ascending, after=after)
+                for c in q.categories
+                if c in self.by_category
+            ]
+            return heapq.merge(*walks, reverse=not ascending)
+        if plan.driver == "title" and q.title_prefix is not None:
+            return self.by_title.walk(
+                ascending=ascending,
+                after=after,
+                start=q.title_prefix,
+                below=prefix_end(q.title_prefix),
+            )
+        return self.walk(
+            plan.driver,
+            ascending=ascending,
+            after=after,
+            below=below,
+            above=above,
+            category=None,
+        )
+
+
+class StagedImport:
+    """
+    Импорт по частям в in-memory хранилище: пачки копятся до commit(),
+    чтобы ошибка в середине потока не оставила половину записей.
+    """
+
+    def __init__(self, store: WishStore, owner: str) -> None:
+        self._store = store
+        self._owner = owner
+        self._records: list[Record] = []
+
+    def write(self, records: list[Record]) -> list[int]:
+        conflicts = [
+            r["id"] for r in records if self._store.exists(self._owner, r["id"])
+        ]
+        if not conflicts:
+            self._records.extend(records)
+        return conflicts
+
+    def commit(self) -> list[int]:
+        records, self._records = self._records, []
+        return self._store.add_many(self._owner, records)
+
+    def rollback(self) -> None:
+        self._records = []
+
+
+class WishStore:
+    """
+    In-memory хранилище желаний с первичным индексом owner -> {id -> record}.
+    Точечные операции — O(1), выборки по пользователю трогают только его записи;
+    per-owner индексы (id, price_estimate, title, category) поддерживаются на
+    каждой записи, поэтому страница выдачи — это bisect плюс срез. Внутри записи
+    хранятся как CompactWish; наружу отдаются dict в форме Wish.
+
+    Операции над владельцем выполняются под замком его полосы (LOCK_STRIPES
+    замков на всё хранилище): проверка и запись атомарны, а записи разных
+    владельцев идут параллельно. Агрегаты тоже ведутся по полосам.
+    """
+
+    def __init__(self, stripes: int = LOCK_STRIPES) -> None:
+        self._owners: dict[str, _OwnerBucket] = {}
+        self._locks = tuple(threading.Lock() for _ in range(stripes))
+        self._stats = tuple(StoreStats() for _ in range(stripes))
+        # Версия владельца — номер последней изменившей его операции по общему
+        # счётчику: не повторяется, даже если записи владельца удалили и создали снова.
+        # next() у itertools.count атомарен, отдельный замок не нужен
+        self._versions: dict[str, int] = {}
+        self._clock = itertools.count(1)
+        # Журнал вызывается после каждого успешного изменения, до ответа клиенту
+        self.journal: Journal | None = None
+
+    def __len__(self) -> int:
+        return sum(part.total for part in self._stats)
+
+    def _stripe(self, owner: str) -> int:
+        return hash(owner) % len(self._locks)
+
+    def _lock(self, owner: str) -> threading.Lock:
+        return self._locks[self._stripe(owner)]
+
+    @contextmanager
+    def exclusive(self) -> Iterator[None]:
+        """Все полосы сразу (в фиксированном порядке): хранилище целиком неизменно."""
+        with ExitStack() as stack:
+            for lock in self._locks:
+                stack.enter_context(lock)
+            yield
+
+    @property
+    def stats(self) -> StoreStats:
+        total = StoreStats()
+        for lock, part in zip(self._locks, self._stats):
+            with lock:
+                total.merge(part)
+        return total
+
+    def clear(self) -> None:
+        with self.exclusive():
+            self._owners.clear()
+            self._versions.clear()
+            self._stats = tuple(StoreStats() for _ in self._locks)
+            if self.journal is not None:
+                self.journal.clear()
+
+    def _touch(self, owner: str) -> None:
+        self._versions[owner] = next(self._clock)
+
+    def version(self, owner: str) -> int:
+        """Меняется при каждом изменении записей владельца; 0 — изменений не было."""
+        return self._versions.get(owner, 0)
+
+    def _bucket(self, owner: str) -> _OwnerBucket:
+        bucket = self._owners.get(owner)
+        if bucket is None:
+            owner = sys.intern(owner)
+            stats = self._stats[self._stripe(owner)]
+            bucket = self._owners[owner] = _OwnerBucket(owner, stats)
+        return bucket
+
+    def owners(self) -> int:
+        return len(self._owners)
+
+    def count(self, owner: str) -> int:
+        bucket = self._owners.get(owner)
+        return 0 if bucket is None else len(bucket.records)
+
+    def exists(self, owner: str, wish_id: int) -> bool:
+        bucket = self._owners.get(owner)
+        return bucket is not None and wish_id in bucket.records
+
+    def get(self, owner: str, wish_id: int) -> Record | None:
+        with self._lock(owner):
+            bucket = self._owners.get(owner)
+            if bucket is None:
+                return None
+            wish = bucket.records.get(wish_id)
+            return None if wish is None else wish.unpack(bucket.owner)
+
+    def items(self, owner: str) -> list[Record]:
+        with self._lock(owner):
+            bucket = self._owners.get(owner)
+            if bucket is None:
+                return []
+            return [w.unpack(bucket.owner) for w in bucket.records.values()]
+
+    def page(
+        self,
+        owner: str,
+        index: str = "id",
+        *,
+        ascending: bool = True,
+        after: IndexKey | None = None,
+        offset: int = 0,
+        limit: int | None = None,
+        below: Decimal | None = None,
+        above: Decimal | None = None,
+        category: str | None = None,
+    ) -> Page:
+        """
+        Страница записей владельца в порядке индекса index (см. INDEXES).
+        below/above — строгие ценовые границы (только для price_estimate),
+        category — выборка по категории в порядке id.
+        """
+        # Ценовой индекс хранит копейки: границы и курсор переводим в тот же
+        # масштаб (int и Decimal сравниваются точно), ключ страницы — обратно
+        in_cents = index == "price_estimate" and category is None
+        if in_cents:
+            if after is not None:
+                after = (cents_bound(after[0]), after[1])
+            below = None if below is None else cents_bound(below)
+            above = None if above is None else cents_bound(above)
+        with self._lock(owner):
+            bucket = self._owners.get(owner)
+            if bucket is None:
+                return Page([], None)
+            keys = bucket.walk(
+                index,
+                ascending=ascending,
+                after=after,
+                below=below,
+                above=above,
+                category=category,
+            )
+            items, next_key = bucket.take(keys, offset, limit)
+        if next_key is not None and in_cents:
+            next_key = (from_cents(next_key[0]), next_key[1])
+        return Page(items, next_key)
+
+    def explain(self, owner: str, q: WishQuery) -> QueryPlan:
+        """План query(): какой индекс даст кандидатов и что проверяется на них."""
+        q = _normalized(q)
+        above = None if q.above is None else cents_bound(q.above)
+        below = None if q.below is None else cents_bound(q.below)
+        with self._lock(owner):
+            bucket = self._owners.get(owner)
+            if bucket is None:
+                return choose_plan(q, {"id": 0})
+            return choose_plan(q, bucket.estimates(q, above, below))
+
+    def query(
+        self,
+        owner: str,
+        q: WishQuery,
+        *,
+        after: IndexKey | None = None,
+        offset: int = 0,
+        limit: int | None = None,
+    ) -> Page:
+        """
+        Составной запрос (см. WishQuery) в порядке q.order_by. Кандидаты берутся
+        из самого селективного индекса (explain), остальные условия проверяются
+        на них — пересечение без обхода всех записей владельца. Если индекс-
+        источник упорядочен как выдача, страница читается лениво до limit,
+        иначе кандидаты сортируются.
+        """
+        q = _normalized(q)
+        # Цены в копейках, как в ценовом индексе (см. page)
+        above = None if q.above is None else cents_bound(q.above)
+        below = None if q.below is None else cents_bound(q.below)
+        in_cents = q.order_by == "price_estimate"
+        if in_cents and after is not None:
+            after = (cents_bound(after[0]), after[1])
+        with self._lock(owner):
+            bucket = self._owners.get(owner)
+            if bucket is None:
+                return Page([], None)
+            plan = choose_plan(q, bucket.estimates(q, above, below))
+            if plan.estimate == 0:
+                return Page([], None)
+            records = bucket.records
+            if plan.ordered:
+                found = bucket.candidates(
+                    plan,
+                    q,
+                    ascending=q.ascending,
+                    after=after,
+                    above=above,
+                    below=below,
+                )
+                keys = (
+                    key
+                    for key in found
+                    if matches(records[key[1]], q, plan.residual, above, below)
+                )
+            else:
+                found = bucket.candidates(
+                    plan, q, ascending=True, after=None, above=above, below=below
+                )
+                ordered = sorted(
+                    _order_key(wish, q.order_by)
+                    for wish in (records[wish_id] for _, wish_id in found)
+                    if matches(wish, q, plan.residual, above, below)
+                )
+                if q.ascending:
+                    start = 0 if after is None else bisect_right(ordered, after)
+                    keys = iter(ordered[start:])
+                else:
+                    stop = (
+                        len(ordered) if after is None else bisect_left(ordered, after)
+                    )
+                    keys = reversed(ordered[:stop])
+            items, next_key = bucket.take(keys, offset, limit)
+        if next_key is not None and in_cents:
+            next_key = (from_cents(next_key[0]), next_key[1])
+        return Page(items, next_key)
+
+    def iter_pages(self, owner: str, size: int) -> Iterator[list[Record]]:
+        return walk_pages(self.page, owner, size)
+
+    def search(
+        self,
+        owner: str,
+        terms: list[str],
+        *,
+        category: str | None = None,
+        after: IndexKey | None = None,
+        offset: int = 0,
+        limit: int | None = None,
+    ) -> Page:
+        """
+        Поиск по словам названия, заметок и категории (см. search.parse_query):
+        лучшие совпадения первыми, ключ курсора — (-ранг, id).
+        """
+        with self._lock(owner):
+            bucket = self._owners.get(owner)
+            if bucket is None:
+                return Page([], None)
+            keys = bucket.search.search(terms, category)
+            chunk, next_key = page_keys(keys, after, offset, limit)
+            records = bucket.records
+            return Page([records[i].unpack(owner) for _, i in chunk], next_key)
+
+    def category_stats(self, owner: str) -> list[Record]:
+        """Сводка по категориям владельца (см. rollups.summary) — из агрегатов."""
+        with self._lock(owner):
+            bucket = self._owners.get(owner)
+            if bucket is None:
+                return []
+            rows = [r.summary(c) for c, r in bucket.rollups.items()]
+        return sorted(rows, key=sort_key)
+
+    def encode(self, owner: str, records: list[Record]) -> bytes:
+        """
+        JSON-массив записей владельца; JSON каждой записи кэшируется в бакете.
+        Записи прочитаны раньше, под другой блокировкой: фрагмент попадает в кэш,
+        только если запись всё ещё совпадает с хранимой, — иначе между чтением
+        и кодированием её изменили, и кэш остался бы устаревшим.
+        """
+        with self._lock(owner):
+            bucket = self._owners.get(owner)
+            if bucket is None:
+                return encode_records(records)
+            cache, stored = bucket.fragments, bucket.records
+            fragments = []
+            for record in records:
+                wish_id = record["id"]
+                fragment = cache.get(wish_id)
+                if fragment is None:
+                    fragment = encode_record(record)
+                    wish = stored.get(wish_id)
+                    if wish is not None and wish.unpack(owner) == record:
+                        cache[wish_id] = fragment
+                fragments.append(fragment)
+        return join_array(fragments)
+
+    def _current(self, bucket: _OwnerBucket, wish_id: int) -> Record | None:
+        wish = bucket.records.get(wish_id)
+        return None if wish is None else wish.unpack(bucket.owner)
+
+    def add(self, owner: str, record: Record) -> bool:
+        """Проверка и вставка атомарно; False, если id уже занят у этого владельца."""
+        with self._lock(owner):
+            bucket = self._bucket(owner)
+            if record["id"] in bucket.records:
+                return False
+            bucket.put(CompactWish.pack(record))
+            self._touch(owner)
+            if self.journal is not None:
+                self.journal.put(owner, [record])
+            return True
+
+    def replace(
+        self,
+        owner: str,
+        wish_id: int,
+        record: Record,
+        *,
+        expected: Record | None = None,
+    ) -> Conflict | None:
+        """
+        Заменяет запись wish_id на record; id может измениться, но не на занятый.
+        expected — compare-and-swap: замена только если запись всё ещё равна
+        прочитанной ранее (иначе "changed", и можно перечитать и повторить).
+        None — запись заменена, иначе причина отказа (см. Conflict).
+        """
+        with self._lock(owner):
+            bucket = self._owners.get(owner)
+            if bucket is None or wish_id not in bucket.records:
+                return "missing"
+            if expected is not None and self._current(bucket, wish_id) != expected:
+                return "changed"
+            moved = record["id"] != wish_id
+            if moved:
+                if record["id"] in bucket.records:
+                    return "exists"
+                bucket.pop(wish_id)
+            bucket.put(CompactWish.pack(record))
+            self._touch(owner)
+            if self.journal is not None:
+                # Смена id — одна строка журнала: оборванный хвост не оставит
+                # удаление без вставки
+                if moved:
+                    self.journal.apply(owner, [wish_id], [record])
+                else:
+                    self.journal.put(owner, [record])
+            return None
+
+    def remove(
+        self, owner: str, wish_id: int, *, expected: Record | None = None
+    ) -> bool:
+        """Удаляет запись; с expected — только если она не менялась (CAS)."""
+        with self._lock(owner):
+            bucket = self._owners.get(owner)
+            if bucket is None:
+                return False
+            if expected is not None and self._current(bucket, wish_id) != expected:
+                return False
+            if bucket.pop(wish_id) is None:
+                return False
+            if not bucket.records:
+                del self._owners[owner]
+            self._touch(owner)
+            if self.journal is not None:
+                self.journal.delete(owner, wish_id)
+            return True
+
+    def add_many(self, owner: str, records: list[Record]) -> list[int]:
+        """
+        Атомарная пачка: вставляются либо все записи, либо ни одной.
+        Возвращает id, уже занятые у владельца (пусто — пачка записана).
+        """
+        with self._lock(owner):
+            bucket = self._owners.get(owner)
+            if bucket is not None:
+                conflicts = [r["id"] for r in records if r["id"] in bucket.records]
+                if conflicts:
+                    return conflicts
+            self._extend(owner, records)
+            return []
+
+    def apply(self, owner: str, changes: list[Change]) -> BatchConflict | None:
+        """
+        Пакет операций под одним замком владельца: все применяются, либо
+        (при конфликте) ни одна. Журнал получает пакет одной строкой.
+        """
+        with self._lock(owner):
+            bucket = self._owners.get(owner)
+            current = {} if bucket is None else bucket.records
+            plan = plan_batch(changes, current.__contains__)
+            if isinstance(plan, BatchConflict):
+                return plan
+            if not changes:
+                return None
+            bucket = self._bucket(owner)
+            for wish_id in plan.deleted:
+                bucket.pop(wish_id)
+            for record in plan.records:
+                bucket.put(CompactWish.pack(record))
+            if not bucket.records:
+                del self._owners[owner]
+            self._touch(owner)
+            if self.journal is not None:
+                self.journal.apply(owner, plan.deleted, plan.records)
+            return None
+
+    def begin_import(self, owner: str) -> StagedImport:
+        return StagedImport(self, owner)
+
+    def extend(self, owner: str, records: Iterable[Record]) -> int:
+        """Массовая вставка; запись с уже существующим id перезаписывается."""
+        records = list(records)
+        with self._lock(owner):
+            self._extend(owner, records)
+        return len(records)
+
+    def _extend(self, owner: str, records: list[Record]) -> None:
+        self._restore(owner, [CompactWish.pack(r) for r in records])
+        if records and self.journal is not None:
+            self.journal.put(owner, records)
+
+    def restore(self, owner: str, wishes: list[CompactWish]) -> None:
+        """Загружает готовые записи владельца (снимок), минуя журнал."""
+        with self._lock(owner):
+            self._restore(owner, wishes)
+
+    def _restore(self, owner: str, wishes: list[CompactWish]) -> None:
+        bucket = self._bucket(owner)
+        bucket.put_many(wishes)
+        if not bucket.records:
+            del self._owners[owner]
+        if wishes:
+            self._touch(owner)
+
+    def snapshot(self) -> list[tuple[str, list[CompactWish]]]:
+        """
+        Согласованный срез всех записей. CompactWish не меняются после вставки
+        (изменение — это новая запись), поэтому срез можно сериализовать в другом
+        потоке, пока хранилище принимает запросы.
+        """
+        with self.exclusive():
+            return [(o, list(b.records.values())) for o, b in self._owners.items()]
+
+
+async def _mutate(store: WishStore, fn: Callable[..., Any], *args: Any) -> Any:
+    """
+    Изменение хранилища из цикла событий. С журналом изменение — это ещё и
+    write() (и fsync) файла: тогда оно уходит в пул потоков, чтобы не стояли
+    остальные запросы воркера; без журнала — выполняется на месте.
+    """
+    if store.journal is None:
+        return fn(*args)
+    return await run_in_threadpool(fn, *args)
+
+
+class _AsyncImport:
+    __slots__ = ("_store", "_batch")
+
+    def __init__(self, store: WishStore, batch: StagedImport) -> None:
+        self._store = store
+        self._batch = batch
+
+    async def write(self, records: list[Record]) -> list[int]:
+        return self._batch.write(records)
+
+    async def commit(self) -> list[int]:
+        return await _mutate(self._store, self._batch.commit)
+
+    async def rollback(self) -> None:
+        self._batch.rollback()
+
+
+class AsyncWishStore:
+    """
+    Async-фасад WishStore для маршрутов. Чтения не блокируются на вводе-выводе
+    и выполняются прямо в цикле событий; изменения при подключённом журнале
+    пишут в файл и уходят в пул потоков (см. _mutate).
+    """
+
+    __slots__ = ("_store",)
+
+    def __init__(self, store: WishStore) -> None:
+        self._store = store
+
+    async def get(self, owner: str, wish_id: int) -> Record | None:
+        return self._store.get(owner, wish_id)
+
+    async def exists(self, owner: str, wish_id: int) -> bool:
+        return self._store.exists(owner, wish_id)
+
+    async def add(self, owner: str, record: Record) -> bool:
+        return await _mutate(self._store, self._store.add, owner, record)
+
+    async def replace(
+        self, owner: str, wish_id: int, record: Record
+    ) -> Conflict | None:
+        return await _mutate(self._store, self._store.replace, owner, wish_id, record)
+
+    async def remove(self, owner: str, wish_id: int) -> bool:
+        return await _mutate(self._store, self._store.remove, owner, wish_id)
+
+    async def version(self, owner: str) -> int | None:
+        return self._store.version(owner)
+
+    async def encode(self, owner: str, records: list[Record]) -> bytes:
+        return self._store.encode(owner, records)
+
+    async def add_many(self, owner: str, records: list[Record]) -> list[int]:
+        return await _mutate(self._store, self._store.add_many, owner, records)
+
+    async def apply(self, owner: str, changes: list[Change]) -> BatchConflict | None:
+        return await _mutate(self._store, self._store.apply, owner, changes)
+
+    async def query(
+        self,
+        owner: str,
+        q: WishQuery,
+        *,
+        after: IndexKey | None = None,
+        offset: int = 0,
+        limit: int | None = None,
+    ) -> Page:
+        return self._store.query(owner, q, after=after, offset=offset, limit=limit)
+
+    async def category_stats(self, owner: str) -> list[Record]:
+        return self._store.category_stats(owner)
+
+    def begin_import(self, owner: str) -> _AsyncImport:
+        return _AsyncImport(self._store, self._store.begin_import(owner))
+
+    async def iter_pages(self, owner: str, size: int) -> AsyncIterator[list[Record]]:
+        for records in self._store.iter_pages(owner, size):
+            yield records
+
+    async def search(
+        self,
+        owner: str,
+        terms: list[str],
+        *,
+        category: str | None = None,
+        after: IndexKey | None = None,
+        offset: int = 0,
+        limit: int | None = None,
+    ) -> Page:
+        return self._store.search(
+            owner, terms, category=category, after=after, offset=offset, limit=limit
+        )
+
+    async def page(
+        self,
+        owner: str,
+        index: str = "id",
+        *,
+        ascending: bool = True,
+        after: IndexKey | None = None,
+        offset: int = 0,
+        limit: int | None = None,
+        below: Decimal | None = None,
+        above: Decimal | None = None,
+        category: str | None = None,
+    ) -> Page:
+        return self._store.page(
+            owner,
+            index,
+            ascending=ascending,
+            after=after,
+            offset=offset,
+            limit=limit,
+            below=below,
+            above=above,
+            category=category,
+        )
@@ -0,0 +1,285 @@
+from __future__ import annotations
+
+import functools
+import inspect
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from typing import Any, Callable, Iterator
+
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from app.core.metrics import MetricFamily
+
+# Границы подобраны под пороги NFR-08 (100 мс) и NFR-04 (200 мс)
+LATENCY_BUCKETS = (
+    0.001,
+    0.0025,
+    0.005,
+    0.01,
+    0.025,
+    0.05,
+    0.1,
+    0.2,
+    0.3,
+    0.5,
+    1.0,
+    2.5,
+    5.0,
+)
+SIZE_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304)
+
+
+class _Series:
+    __slots__ = ("counts", "sum", "count")
+
+    def __init__(self, buckets: int) -> None:
+        self.counts = [0] * (buckets + 1)
+        self.sum = 0.0
+        self.count = 0
+
+
+class Histogram:
+    """Гистограмма с фиксированными границами и метками, потокобезопасная."""
+
+    def __init__(
+        self,
+        name: str,
+        help_: str,
+        buckets: tuple[float, ...],
+        labelnames: tuple[str, ...],
+    ) -> None:
+        self.name = name
+        self.help = help_
+        self.buckets = buckets
+        self.labelnames = labelnames
+        self._series: dict[tuple[str, ...], _Series] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, labels: tuple[str, ...], value: float) -> None:
+        i = bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(labels)
+            if series is None:
+                series = self._series[labels] = _Series(len(self.buckets))
+            series.counts[i] += 1
+            series.sum += value
+            series.count += 1
+
+    def clear(self) -> None:
+        with self._lock:
+            self._series.clear()
+
+    def _snapshot(self) -> list[tuple[tuple[str, ...], list[int], float, int]]:
+        with self._lock:
+            return [
+                (k, list(s.counts), s.sum, s.count) for k, s in self._series.items()
+            ]
+
+    def quantile(self, counts: list[int], q: float) -> float:
+        """Оценка квантиля линейной интерполяцией внутри корзины, как histogram_quantile."""
+        total = sum(counts)
+        if not total:
+            return 0.0
+        rank = q * total
+        seen = 0
+        for i, n in enumerate(counts):
+            if seen + n >= rank and n:
+                lo = self.buckets[i - 1] if i > 0 else 0.0
+                if i == len(self.buckets):
+                    return lo
+                return lo + (self.buckets[i] - lo) * (rank - seen) / n
+            seen += n
+        return self.buckets[-1]
+
+    def family(self) -> MetricFamily:
+        samples = []
+        for key, counts, total_sum, count in self._snapshot():
+            labels = dict(zip(self.labelnames, key))
+            cumulative = 0
+            for bound, n in zip(self.buckets + (float("inf"),), counts):
+                cumulative += n
+                le = "+Inf" if bound == float("inf") else repr(float(bound))
+                samples.append(("_bucket", {**labels, "le": le}, cumulative))
+            samples.append(("_sum", labels, total_sum))
+            samples.append(("_count", labels, count))
+        return MetricFamily(self.name, "histogram", self.help, samples)
+
+    def summary(self, scale: float = 1.0) -> dict[str, dict[str, Any]]:
+        """Краткая сводка по сериям для JSON-вида /metrics."""
+        out = {}
+        for key, counts, total_sum, count in self._snapshot():
+            out[" ".join(key)] = {
+                "count": count,
+                "avg": round(total_sum / count * scale, 3),
+                "p50": round(self.quantile(counts, 0.50) * scale, 3),
+                "p95": round(self.quantile(counts, 0.95) * scale, 3),
+                "p99": round(self.quantile(counts, 0.99) * scale, 3),
+            }
+        return out
+
+
+class Gauge:
+    __slots__ = ("name", "help", "value", "_lock")
+
+    def __init__(self, name: str, help_: str) -> None:
+        self.name = name
+        self.help = help_
+        self.value = 0
+        self._lock = threading.Lock()
+
+    def add(self, delta: int) -> None:
+        with self._lock:
+            self.value += delta
+
+    def family(self) -> MetricFamily:
+        return MetricFamily(self.name, "gauge", self.help, [("", {}, self.value)])
+
+
+REQUEST_LATENCY = Histogram(
+    "http_request_duration_seconds",
+    "HTTP request latency by route template.",
+    LATENCY_BUCKETS,
+    ("method", "route", "status"),
+)
+RESPONSE_SIZE = Histogram(
+    "http_response_size_bytes",
+    "HTTP response body size by route template.",
+    SIZE_BUCKETS,
+    ("method", "route"),
+)
+SPAN_LATENCY = Histogram(
+    "app_span_duration_seconds",
+    "Latency of instrumented hot-path sections (auth, validation, store).",
+    LATENCY_BUCKETS,
+    ("span",),
+)
+IN_FLIGHT = Gauge("http_requests_in_flight", "HTTP requests currently being served.")
+
+
+@contextmanager
+def span(name: str) -> Iterator[None]:
+    t0 = time.perf_counter()
+    try:
+        yield
+    finally:
+        SPAN_LATENCY.observe((name,), time.perf_counter() - t0)
+
+
+def _timed(name: str, fn: Callable[..., Any]) -> Callable[..., Any]:
+    """Метод прокси: вызов fn на репозитории замеряется как span store.<name>."""
+    label = f"store.{name}"
+    if inspect.isasyncgenfunction(fn):
+        # Генератор (iter_pages у экспорта) меряется по всей итерации, а не по
+        # созданию объекта генератора
+        async def timed_iter(self: Any, *args: Any, **kwargs: Any) -> Any:
+            with span(label):
+                async for item in fn(self._target, *args, **kwargs):
+                    yield item
+
+        return timed_iter
+    if inspect.iscoroutinefunction(fn):
+
+        async def timed_async(self: Any, *args: Any, **kwargs: Any) -> Any:
+            with span(label):
+                return await fn(self._target, *args, **kwargs)
+
+        return timed_async
+
+    def timed(self: Any, *args: Any, **kwargs: Any) -> Any:
+        with span(label):
+            return fn(self._target, *args, **kwargs)
+
+    return timed
+
+
+class _InstrumentedRepository:
+    """
+    Прокси репозитория: каждый вызов публичного метода замеряется как span
+    store.<метод>. Обёртки строятся один раз на класс репозитория (см.
+    _proxy_type), остальные атрибуты берутся у самого репозитория.
+    """
+
+    __slots__ = ("_target",)
+
+    def __init__(self, target: Any) -> None:
+        self._target = target
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self._target, name)
+
+
+@functools.lru_cache(maxsize=None)
+def _proxy_type(cls: type) -> type:
+    methods = {
+        name: _timed(name, fn)
+        for name, fn in inspect.getmembers(cls, inspect.isfunction)
+        if not name.startswith("_")
+    }
+    return type(
+        f"Instrumented{cls.__name__}",
+        (_InstrumentedRepository,),
+        {"__slots__": (), **methods},
+    )
+
+
+def instrument(repo: Any) -> Any:
+    return _proxy_type(type(repo))(repo)
+
+
+class MetricsMiddleware:
+    """
+    ASGI-middleware: латентность и размер ответа по шаблону маршрута
+    (а не по сырому пути — иначе id в URL раздувают число серий), in-flight.
+    """
+
+    def __init__(self, app: ASGIApp) -> None:
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        status = 500
+        size = 0
+
+        async def send_wrapper(message: Message) -> None:
+            nonlocal status, size
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            elif message["type"] == "http.response.body":
+                size += len(message.get("body", b""))
+            await send(message)
+
+        IN_FLIGHT.add(1)
+        t0 = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            elapsed = time.perf_counter() - t0
+            IN_FLIGHT.add(-1)
+            route = scope.get("route")
+            template = getattr(route, "path", None) or "unmatched"
+            method = scope["method"]
+            REQUEST_LATENCY.observe((method, template, str(status)), elapsed)
+            RESPONSE_SIZE.observe((method, template), size)
+
+
+def families() -> list[MetricFamily]:
+    return [
+        REQUEST_LATENCY.family(),
+        RESPONSE_SIZE.family(),
+        SPAN_LATENCY.family(),
+        IN_FLIGHT.family(),
+    ]
+
+
+def summary() -> dict[str, Any]:
+    return {
+        "in_flight": IN_FLIGHT.value,
+        "latency_ms": REQUEST_LATENCY.summary(scale=1000.0),
+        "response_bytes": RESPONSE_SIZE.summary(),
+        "spans_ms": SPAN_LATENCY.summary(scale=1000.0),
+    }
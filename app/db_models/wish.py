@@ -1,6 +1,6 @@
 from __future__ import annotations
 
-from sqlalchemy import CheckConstraint, Integer, Numeric, String
+from sqlalchemy import BigInteger, CheckConstraint, Index, Numeric, String, Text
 from sqlalchemy.orm import Mapped, mapped_column
 
 from app.core.db_base import Base
@@ -10,14 +10,26 @@ class WishORM(Base):
     __tablename__ = "wishes"
 
     owner: Mapped[str] = mapped_column(String(64), primary_key=True)
-    id: Mapped[int] = mapped_column(Integer, primary_key=True)
+    id: Mapped[int] = mapped_column(BigInteger, primary_key=True)
 
     title: Mapped[str] = mapped_column(String(50), nullable=False)
     link: Mapped[str | None] = mapped_column(String(200), nullable=True)
     price_estimate: Mapped[float | None] = mapped_column(Numeric(10, 2), nullable=True)
     notes: Mapped[str | None] = mapped_column(String(500), nullable=True)
     category: Mapped[str | None] = mapped_column(String(30), nullable=True)
+    # Для поиска: слова записи и категория после casefold (см. search.search_text);
+    # заполняются вместе с остальными колонками в sql_store._columns
+    search_text: Mapped[str] = mapped_column(Text, nullable=False, server_default="")
+    category_folded: Mapped[str | None] = mapped_column(String(90), nullable=True)
 
     __table_args__ = (
         CheckConstraint("price_estimate >= 0", name="ck_wishes_price_non_negative"),
+        # id замыкает каждый индекс: порядок (значение, id) и keyset-курсор
+        # по нему обслуживаются индексом без дополнительной сортировки
+        Index("ix_wishes_owner_category", "owner", "category", "id"),
+        Index("ix_wishes_owner_price", "owner", "price_estimate", "id"),
+        Index("ix_wishes_owner_title", "owner", "title", "id"),
+        # Покрывающий индекс для /wishes/stats: GROUP BY category и медиана по
+        # цене внутри категории читаются из индекса без обращения к таблице
+        Index("ix_wishes_owner_category_price", "owner", "category", "price_estimate"),
     )
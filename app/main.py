@@ -1,9 +1,12 @@
 from fastapi import FastAPI
 
-from app.core import errors
+from app.core import errors, persistence
+from app.core.telemetry import MetricsMiddleware
 from app.routers import health, wishes
 
-app = FastAPI(title="SecDev Course App", version="0.1.0")
+app = FastAPI(title="SecDev Course App", version="0.1.0", lifespan=persistence.lifespan)
+
+app.add_middleware(MetricsMiddleware)
 
 app.include_router(health.router)
 app.include_router(wishes.router)
@@ -0,0 +1,52 @@
+from __future__ import annotations
+
+from typing import Annotated, Literal
+
+from pydantic import BaseModel, Field
+
+from app.models.wish import Wish, WishId
+
+MAX_BATCH = 1000
+
+
+class CreateOp(BaseModel):
+    model_config = dict(extra="forbid")
+
+    op: Literal["create"]
+    wish: Wish
+
+
+class UpdateOp(BaseModel):
+    model_config = dict(extra="forbid")
+
+    op: Literal["update"]
+    id: WishId
+    wish: Wish
+
+
+class DeleteOp(BaseModel):
+    model_config = dict(extra="forbid")
+
+    op: Literal["delete"]
+    id: WishId
+
+
+BatchOp = Annotated[CreateOp | UpdateOp | DeleteOp, Field(discriminator="op")]
+
+
+class WishBatch(BaseModel):
+    model_config = dict(extra="forbid")
+
+    operations: Annotated[list[BatchOp], Field(min_length=1, max_length=MAX_BATCH)]
+
+
+class BatchOpResult(BaseModel):
+    op: Literal["create", "update", "delete"]
+    # id записи после операции (для update может отличаться от исходного)
+    id: int
+    status: Literal["created", "updated", "deleted"]
+
+
+class BatchResult(BaseModel):
+    status: Literal["applied"]
+    results: list[BatchOpResult]
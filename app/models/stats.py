@@ -0,0 +1,22 @@
+from __future__ import annotations
+
+from decimal import Decimal
+
+from pydantic import BaseModel
+
+
+class CategoryStats(BaseModel):
+    # None — желания без категории
+    category: str | None
+    count: int
+    # Сколько желаний с ценой; min/max/медиана считаются только по ним
+    priced: int
+    price_sum: Decimal
+    price_min: Decimal | None
+    price_max: Decimal | None
+    price_median: Decimal | None
+
+
+class WishStats(BaseModel):
+    total: int
+    categories: list[CategoryStats]
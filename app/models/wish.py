@@ -5,11 +5,14 @@ from typing import Annotated
 
 from pydantic import BaseModel, Field
 
+# id — 64-битное целое со знаком: колонка BigInteger и запись снимка хранилища
+WishId = Annotated[int, Field(ge=-(2**63), le=2**63 - 1)]
+
 
 class Wish(BaseModel):
     model_config = dict(extra="forbid")
 
-    id: int
+    id: WishId
     title: Annotated[str, Field(min_length=1, max_length=50)]
     link: str | None = Field(default=None, max_length=200)
     price_estimate: (
@@ -1,8 +1,14 @@
 import time
 
-from fastapi import APIRouter
+from fastapi import APIRouter, Query, Request
+from fastapi.responses import PlainTextResponse
 
-from app.core.db import _DB
+from app.core import ratelimit, telemetry
+from app.core.db import store
+from app.core.db_config import USE_SQL
+from app.core.db_session import pool_stats
+from app.core.metrics import PROM_CONTENT_TYPE, MetricFamily, gauge, render_prometheus
+from app.core.response_cache import response_cache
 
 router = APIRouter()
 
@@ -14,13 +20,105 @@ def health():
     return {"status": "ok"}
 
 
+def _wants_prometheus(request: Request, fmt: str | None) -> bool:
+    if fmt is not None:
+        return fmt == "prometheus"
+    accept = request.headers.get("accept", "").lower()
+    return "text/plain" in accept or "openmetrics" in accept
+
+
+def _prometheus_families(uptime: float) -> list[MetricFamily]:
+    families = [gauge("app_uptime_seconds", "Seconds since process start.", uptime)]
+    if not USE_SQL:
+        stats = store.stats
+        families += [
+            gauge("wishes_total", "Wishes held by the in-memory store.", stats.total),
+            gauge("wishes_priced_total", "Wishes with a price estimate.", stats.priced),
+            gauge(
+                "wishes_price_sum", "Sum of price estimates.", float(stats.price_sum)
+            ),
+            gauge("wish_owners", "Owners with at least one wish.", store.owners()),
+            # Названия категорий — пользовательские данные: наружу без
+            # авторизации идёт только их число, а не метки с ними
+            gauge(
+                "wish_categories",
+                "Distinct categories across all owners.",
+                len(stats.by_category),
+            ),
+        ]
+    cache = response_cache.stats()
+    families += [
+        gauge("response_cache_entries", "Cached response bodies.", cache["entries"]),
+        gauge("response_cache_bytes", "Size of cached bodies.", cache["bytes"]),
+        MetricFamily(
+            "response_cache_hits_total",
+            "counter",
+            "Responses served from the cache.",
+            [("", {}, cache["hits"])],
+        ),
+        MetricFamily(
+            "response_cache_misses_total",
+            "counter",
+            "Responses rendered because the cache had no current body.",
+            [("", {}, cache["misses"])],
+        ),
+    ]
+    families.append(
+        MetricFamily(
+            "rate_limited_total",
+            "counter",
+            "Requests rejected with 429, by budget.",
+            [("", {"budget": b}, n) for b, n in ratelimit.limiter.stats().items()],
+        )
+    )
+    pool = pool_stats()
+    if pool is not None:
+        families += [
+            gauge("db_pool_size", "Configured connection pool size.", pool["size"]),
+            gauge(
+                "db_pool_checked_out",
+                "Connections currently in use.",
+                pool["checked_out"],
+            ),
+            gauge(
+                "db_pool_checked_in",
+                "Idle connections in the pool.",
+                pool["checked_in"],
+            ),
+            gauge(
+                "db_pool_overflow",
+                "Connections opened above pool_size.",
+                pool["overflow"],
+            ),
+        ]
+    return families + telemetry.families()
+
+
 @router.get("/metrics")
-def metrics():
+def metrics(request: Request, fmt: str | None = Query(None, alias="format")):
+    # Все значения берутся из счётчиков хранилища и пула: стоимость не зависит
+    # от объёма, соединение с БД не берётся
     uptime = round(time.time() - STARTUP_TS, 2)
-    total = len(_DB["wishes"])
-    avg_price = (
-        sum(w.get("price_estimate", 0) for w in _DB["wishes"]) / total
-        if total > 0
-        else 0
-    )
-    return {"uptime_s": uptime, "total_wishes": total, "avg_price": round(avg_price, 2)}
+    if _wants_prometheus(request, fmt):
+        return PlainTextResponse(
+            render_prometheus(_prometheus_families(uptime)),
+            media_type=PROM_CONTENT_TYPE,
+        )
+
+    payload: dict = {"uptime_s": uptime}
+    if not USE_SQL:
+        stats = store.stats
+        payload.update(
+            total_wishes=stats.total,
+            avg_price=round(stats.avg_price(), 2),
+            priced_wishes=stats.priced,
+            owners=store.owners(),
+            categories=len(stats.by_category),
+        )
+    pool = pool_stats()
+    if pool is not None:
+        payload["db_pool"] = pool
+    payload["response_cache"] = response_cache.stats()
+    payload["rate_limited"] = ratelimit.limiter.stats()
+    payload["http"] = telemetry.summary()
+    return payload
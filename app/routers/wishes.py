@@ -1,154 +1,521 @@
 from __future__ import annotations
 
 from decimal import Decimal
-from typing import Any
+from typing import Any, AsyncIterator, Awaitable, Callable, Literal
 
-from fastapi import APIRouter, Depends, Query, Request
+from fastapi import APIRouter, Depends, Query, Request, Response
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+from pydantic import TypeAdapter, ValidationError
 
+from app.core import jsonsec, search
 from app.core.auth import get_current_user
-from app.core.db import _DB
+from app.core.batch import Change
 from app.core.errors import AppValidationError, NotFoundError
-from app.core.jsonsec import JsonTooLargeError, safe_json_loads
+from app.core.pagination import NEXT_CURSOR_HEADER, PageParams, encode_cursor, paging
+from app.core.query import WishQuery
+from app.core.ratelimit import Slot, SlotStreamingResponse, bulk_admission, rate_limited
+from app.core.repository import ImportBatch, WishRepository, get_repository
+from app.core.response_cache import etag_matches, make_etag, response_cache
+from app.core.serialization import PreEncodedJSONResponse, encode_record
+from app.core.store import Page
+from app.core.telemetry import span
+from app.models.batch import BatchOp, BatchResult, DeleteOp, UpdateOp, WishBatch
+from app.models.stats import WishStats
 from app.models.wish import Wish
 
 MAX_IMPORT = 5000
+# Сколько записей потокового импорта валидируется и пишется за раз
+IMPORT_CHUNK = 500
+# Размер страницы, которой потоковый экспорт обходит хранилище
+EXPORT_PAGE = 500
 
-router = APIRouter(prefix="/wishes", tags=["wishes"])
+NDJSON = "application/x-ndjson"
+
+MAX_SEARCH_QUERY = 200
+MAX_QUERY_CATEGORIES = 20
+
+_SORT_KEYS = {
+    "price": "price_estimate",
+    "price_estimate": "price_estimate",
+    "title": "title",
+}
+
+ExportFormat = Literal["json", "ndjson", "json-stream"]
+
+_WISH_BATCH = TypeAdapter(list[Wish])
+
+# Запас на ключи, числа, пробелы и owner (импорт его перезаписывает)
+IMPORT_ENTRY_SLACK = 4096
+
+
+def _max_entry_chars() -> int:
+    """
+    Предел одной записи в потоке импорта, выведенный из схемы Wish: строковые
+    поля до max_length символов, каждый в худшем случае — суррогатная пара
+    \\uXXXX\\uXXXX (12 знаков JSON). Больше запись в Wish не пройдёт.
+    """
+    chars = sum(
+        getattr(m, "max_length", None) or 0
+        for field in Wish.model_fields.values()
+        for m in field.metadata
+    )
+    return chars * 12 + IMPORT_ENTRY_SLACK
+
+
+MAX_IMPORT_ENTRY_CHARS = _max_entry_chars()
+
+# Каждый запрос списывает токен из бюджета пользователя; тяжёлые операции
+# (импорт, экспорт, пакеты) — ещё и из BULK, с пределом одновременных
+router = APIRouter(
+    prefix="/wishes", tags=["wishes"], dependencies=[Depends(rate_limited)]
+)
+
+
+def _validators(version: int | None) -> dict[str, str]:
+    if version is None:
+        return {}
+    # no-cache: клиент может хранить ответ, но обязан перепроверять его по ETag
+    return {"ETag": make_etag(version), "Cache-Control": "private, no-cache"}
+
+
+async def _conditional(
+    request: Request,
+    repo: WishRepository,
+    user: str,
+    render: Callable[[], Awaitable[tuple[bytes, dict[str, str]]]],
+) -> Response:
+    """
+    Ответ с ETag по версии данных владельца: совпал If-None-Match — 304 без
+    обращения к хранилищу, иначе тело берётся из LRU или строится render().
+    """
+    version = await repo.version(user)
+    validators = _validators(version)
+    if version is None:
+        body, headers = await render()
+        return PreEncodedJSONResponse(body, headers=headers)
+    if etag_matches(request.headers.get("if-none-match"), validators["ETag"]):
+        return Response(status_code=304, headers=validators)
+    key = (user, request.url.path, request.url.query)
+    cached = response_cache.get(key, version)
+    if cached is None:
+        body, headers = await render()
+        cached = response_cache.put(key, version, body, headers)
+    return PreEncodedJSONResponse(cached.body, headers={**cached.headers, **validators})
+
+
+async def _paged(
+    request: Request,
+    repo: WishRepository,
+    page: PageParams,
+    user: str,
+    index: str = "id",
+    **filters,
+) -> Response:
+    return await _respond_page(
+        request, repo, page, user, index, repo.page, index, **filters
+    )
+
+
+async def _respond_page(
+    request: Request,
+    repo: WishRepository,
+    page: PageParams,
+    user: str,
+    index: str,
+    fetch: Callable[..., Awaitable[Page]],
+    *args: Any,
+    **filters: Any,
+) -> Response:
+    # Курсор разбирается сразу: битый курсор — 422 даже при совпавшем ETag
+    after = page.after(index)
+
+    async def render() -> tuple[bytes, dict[str, str]]:
+        result = await fetch(
+            user,
+            *args,
+            after=after,
+            offset=page.offset,
+            limit=page.limit,
+            **filters,
+        )
+        headers = {}
+        if result.next_key is not None:
+            headers[NEXT_CURSOR_HEADER] = encode_cursor(index, result.next_key)
+        # Записи уже валидны: JSON берётся из хранилища, а не через response_model
+        return await repo.encode(user, result.items), headers
+
+    return await _conditional(request, repo, user, render)
 
 
 @router.get("", response_model=list[Wish])
-def list_wishes(user: str = Depends(get_current_user)):
-    return [w for w in _DB["wishes"] if w["owner"] == user]
+async def list_wishes(
+    request: Request,
+    page: PageParams = Depends(paging),
+    user: str = Depends(get_current_user),
+    repo: WishRepository = Depends(get_repository),
+):
+    return await _paged(request, repo, page, user)
 
 
 @router.get("/price/less", response_model=list[Wish])
-def wishes_price_less(price: Decimal, user: str = Depends(get_current_user)):
-    return [
-        w
-        for w in _DB["wishes"]
-        if w["owner"] == user
-        and w.get("price_estimate") is not None
-        and w["price_estimate"] < price
-    ]
+async def wishes_price_less(
+    price: Decimal,
+    request: Request,
+    page: PageParams = Depends(paging),
+    user: str = Depends(get_current_user),
+    repo: WishRepository = Depends(get_repository),
+):
+    return await _paged(request, repo, page, user, "price_estimate", below=price)
 
 
 @router.get("/price/greater", response_model=list[Wish])
-def wishes_price_greater(price: Decimal, user: str = Depends(get_current_user)):
-    return [
-        w
-        for w in _DB["wishes"]
-        if w["owner"] == user
-        and w.get("price_estimate") is not None
-        and w["price_estimate"] > price
-    ]
+async def wishes_price_greater(
+    price: Decimal,
+    request: Request,
+    page: PageParams = Depends(paging),
+    user: str = Depends(get_current_user),
+    repo: WishRepository = Depends(get_repository),
+):
+    return await _paged(request, repo, page, user, "price_estimate", above=price)
 
 
 @router.get("/category/{name}", response_model=list[Wish])
-def get_wishes_by_category(name: str, user: str = Depends(get_current_user)):
-    return [
-        w for w in _DB["wishes"] if w["owner"] == user and w.get("category") == name
-    ]
+async def get_wishes_by_category(
+    name: str,
+    request: Request,
+    page: PageParams = Depends(paging),
+    user: str = Depends(get_current_user),
+    repo: WishRepository = Depends(get_repository),
+):
+    return await _paged(request, repo, page, user, category=name)
 
 
 @router.get("/sorted", response_model=list[Wish])
-def get_sorted_wishes(
+async def get_sorted_wishes(
+    request: Request,
     order_by: str = Query("price_estimate"),
     ascending: bool = True,
+    page: PageParams = Depends(paging),
     user: str = Depends(get_current_user),
+    repo: WishRepository = Depends(get_repository),
 ):
-    raw = (order_by or "").strip().lower()
-    aliases = {
-        "price": "price_estimate",
-        "price_estimate": "price_estimate",
-        "title": "title",
-    }
-    key = aliases.get(raw)
+    key = _SORT_KEYS.get((order_by or "").strip().lower())
     if key is None:
         raise AppValidationError("invalid sort key")
 
-    items = [w for w in _DB["wishes"] if w["owner"] == user]
-    return sorted(
-        items,
-        key=lambda w: (
-            w[key]
-            if (key in w and w[key] is not None)
-            else (Decimal("0") if key == "price_estimate" else "")
-        ),
-        reverse=not ascending,
+    return await _paged(request, repo, page, user, key, ascending=ascending)
+
+
+@router.get("/query", response_model=list[Wish])
+async def query_wishes(
+    request: Request,
+    category: list[str] = Query([], max_length=MAX_QUERY_CATEGORIES),
+    price_gt: Decimal | None = None,
+    price_lt: Decimal | None = None,
+    title_prefix: str | None = Query(None, min_length=1, max_length=50),
+    has_link: bool | None = None,
+    order_by: str = Query("id"),
+    ascending: bool = True,
+    page: PageParams = Depends(paging),
+    user: str = Depends(get_current_user),
+    repo: WishRepository = Depends(get_repository),
+):
+    # Все условия сразу (И); category можно повторять — любая из категорий
+    key = {"id": "id", **_SORT_KEYS}.get((order_by or "").strip().lower())
+    if key is None:
+        raise AppValidationError("invalid sort key")
+    if any(len(name) > 30 for name in category):
+        raise AppValidationError("category is too long")
+    q = WishQuery(
+        categories=tuple(category),
+        above=price_gt,
+        below=price_lt,
+        title_prefix=title_prefix,
+        has_link=has_link,
+        order_by=key,
+        ascending=ascending,
     )
+    return await _respond_page(request, repo, page, user, key, repo.query, q)
+
+
+@router.get("/stats", response_model=WishStats)
+async def wishes_stats(
+    request: Request,
+    user: str = Depends(get_current_user),
+    repo: WishRepository = Depends(get_repository),
+):
+    # Число, сумма, min/max и медиана цены по каждой категории владельца —
+    # из агрегатов хранилища, без выгрузки списка
+    async def render() -> tuple[bytes, dict[str, str]]:
+        rows = await repo.category_stats(user)
+        stats = WishStats(total=sum(r["count"] for r in rows), categories=rows)
+        return stats.model_dump_json().encode("utf-8"), {}
+
+    return await _conditional(request, repo, user, render)
+
+
+@router.get("/search", response_model=list[Wish])
+async def search_wishes(
+    request: Request,
+    q: str = Query(..., min_length=1, max_length=MAX_SEARCH_QUERY),
+    category: str | None = Query(None, max_length=30),
+    page: PageParams = Depends(paging),
+    user: str = Depends(get_current_user),
+    repo: WishRepository = Depends(get_repository),
+):
+    # Все слова запроса обязательны, последнее — префикс; лучшие совпадения
+    # (название > категория > заметки) первыми
+    terms = search.parse_query(q)
+    if not terms:
+        raise AppValidationError("empty search query")
+    return await _respond_page(
+        request, repo, page, user, "search", repo.search, terms, category=category
+    )
+
+
+async def _ndjson_export(
+    pages: AsyncIterator[list[dict[str, Any]]],
+) -> AsyncIterator[bytes]:
+    async for records in pages:
+        yield b"".join(encode_record(r) + b"\n" for r in records)
+
+
+async def _json_stream_export(
+    pages: AsyncIterator[list[dict[str, Any]]],
+) -> AsyncIterator[bytes]:
+    # Та же форма, что и у обычного экспорта: {"backup": [...], "count": N}
+    yield b'{"backup":['
+    count = 0
+    async for records in pages:
+        body = b",".join(encode_record(r) for r in records)
+        yield (b"," if count else b"") + body
+        count += len(records)
+    yield f'],"count":{count}}}'.encode("ascii")
 
 
 @router.get("/export")
-def export_wishes(user: str = Depends(get_current_user)):
-    data = [w for w in _DB["wishes"] if w["owner"] == user]
-    return {"backup": data, "count": len(data)}
+async def export_wishes(
+    request: Request,
+    page: PageParams = Depends(paging),
+    fmt: ExportFormat = Query("json", alias="format"),
+    user: str = Depends(get_current_user),
+    slot: Slot = Depends(bulk_admission),
+    repo: WishRepository = Depends(get_repository),
+):
+    # Потоковые форматы отдают весь экспорт, обходя хранилище страницами;
+    # тело не кэшируется, но неизменившийся экспорт отдаётся как 304
+    if fmt in ("ndjson", "json-stream"):
+        validators = _validators(await repo.version(user))
+        if validators and etag_matches(
+            request.headers.get("if-none-match"), validators["ETag"]
+        ):
+            return Response(status_code=304, headers=validators)
+        pages = repo.iter_pages(user, EXPORT_PAGE)
+        if fmt == "ndjson":
+            return SlotStreamingResponse(
+                _ndjson_export(pages), slot=slot, media_type=NDJSON, headers=validators
+            )
+        return SlotStreamingResponse(
+            _json_stream_export(pages),
+            slot=slot,
+            media_type="application/json",
+            headers=validators,
+        )
+
+    after = page.after("id")
+
+    async def render() -> tuple[bytes, dict[str, str]]:
+        result = await repo.page(
+            user, after=after, offset=page.offset, limit=page.limit
+        )
+        next_cursor = (
+            None if result.next_key is None else encode_cursor("id", result.next_key)
+        )
+        payload = {
+            "backup": result.items,
+            "count": len(result.items),
+            "next_cursor": next_cursor,
+        }
+        return JSONResponse(jsonable_encoder(payload)).body, {}
+
+    return await _conditional(request, repo, user, render)
+
+
+def _validate_import_chunk(
+    items: list[Any], user: str, seen_ids: set[int]
+) -> list[dict[str, Any]]:
+    if not all(isinstance(item, dict) for item in items):
+        raise AppValidationError("invalid record schema")
+    # Вся пачка валидируется одним вызовом pydantic-core, а не по записи
+    try:
+        wishes = _WISH_BATCH.validate_python(
+            [{**item, "owner": user} for item in items]
+        )
+    except ValidationError:
+        raise AppValidationError("invalid record schema")
+    validated: list[dict[str, Any]] = _WISH_BATCH.dump_python(wishes)
+
+    before = len(seen_ids)
+    seen_ids.update(w["id"] for w in validated)
+    if len(seen_ids) - before != len(validated):
+        raise AppValidationError("duplicate id in import")
+    return validated
+
+
+async def _write_import_chunk(
+    batch: ImportBatch, items: list[Any], user: str, seen_ids: set[int]
+) -> None:
+    with span("validation.import"):
+        validated = _validate_import_chunk(items, user, seen_ids)
+    if await batch.write(validated):
+        raise AppValidationError("id already exists for this user")
 
 
 @router.post("/import")
-async def import_wishes(request: Request, user: str = Depends(get_current_user)):
-    raw = await request.body()
+async def import_wishes(
+    request: Request,
+    user: str = Depends(get_current_user),
+    _slot: Slot = Depends(bulk_admission),
+    repo: WishRepository = Depends(get_repository),
+):
+    # Тело не буферизуется целиком: записи разбираются из потока по одной,
+    # лимиты проверяются по ходу чтения, запись идёт пачками в одной транзакции
+    declared = request.headers.get("content-length", "")
+    if declared.isdigit() and int(declared) > jsonsec.MAX_JSON_BYTES:
+        raise AppValidationError("import body too large", status=413)
+
+    content_type = request.headers.get("content-type", "")
+    if content_type.split(";")[0].strip().lower() == NDJSON:
+        items = jsonsec.iter_ndjson(request.stream(), max_item=MAX_IMPORT_ENTRY_CHARS)
+    else:
+        items = jsonsec.iter_json_array(
+            request.stream(), "backup", max_item=MAX_IMPORT_ENTRY_CHARS
+        )
+
+    batch = repo.begin_import(user)
+    seen_ids: set[int] = set()
+    chunk: list[Any] = []
+    count = 0
     try:
-        payload = safe_json_loads(raw)
-    except JsonTooLargeError:
+        async for item in items:
+            count += 1
+            if count > MAX_IMPORT:
+                raise AppValidationError(
+                    f"import too large (>{MAX_IMPORT})", status=413
+                )
+            chunk.append(item)
+            if len(chunk) >= IMPORT_CHUNK:
+                await _write_import_chunk(batch, chunk, user, seen_ids)
+                chunk = []
+        await _write_import_chunk(batch, chunk, user, seen_ids)
+        if await batch.commit():
+            raise AppValidationError("id already exists for this user")
+    except jsonsec.JsonTooLargeError:
+        await batch.rollback()
         raise AppValidationError("import body too large", status=413)
     except ValueError:
+        await batch.rollback()
         raise AppValidationError("invalid import format")
+    except BaseException:
+        await batch.rollback()
+        raise
+    return {"status": "restored", "count": count}
 
-    imported = payload.get("backup", [])
-    if not isinstance(imported, list):
-        raise AppValidationError("invalid import format")
-    if len(imported) > MAX_IMPORT:
-        raise AppValidationError(f"import too large (>{MAX_IMPORT})", status=413)
 
-    validated: list[dict[str, Any]] = []
-    for raw_item in imported:
-        if not isinstance(raw_item, dict):
-            raise AppValidationError("invalid record schema")
-        obj = dict(raw_item)
-        obj["owner"] = user
-        try:
-            w = Wish.model_validate(obj)
-        except Exception:
-            raise AppValidationError("invalid record schema")
-        validated.append(w.model_dump())
+def _to_change(operation: BatchOp, user: str) -> Change:
+    if isinstance(operation, DeleteOp):
+        return Change("delete", operation.id)
+    record = operation.wish.model_dump()
+    record["owner"] = user
+    wish_id = operation.id if isinstance(operation, UpdateOp) else record["id"]
+    return Change(operation.op, wish_id, record)
+
 
-    _DB["wishes"].extend(validated)
-    return {"status": "restored", "count": len(validated)}
+_BATCH_STATUS = {"create": "created", "update": "updated", "delete": "deleted"}
+
+
+@router.post("/batch", response_model=BatchResult)
+async def batch_wishes(
+    batch: WishBatch,
+    user: str = Depends(get_current_user),
+    _slot: Slot = Depends(bulk_admission),
+    repo: WishRepository = Depends(get_repository),
+):
+    # Пакет валидируется целиком моделью WishBatch и применяется атомарно:
+    # первая невыполнимая операция отклоняет все, ответ называет её номер
+    changes = [_to_change(operation, user) for operation in batch.operations]
+    conflict = await repo.apply(user, changes)
+    if conflict is not None:
+        if conflict.reason == "missing":
+            raise NotFoundError(
+                f"operation {conflict.index}: wish not found or not owned by user"
+            )
+        raise AppValidationError(
+            f"operation {conflict.index}: id already exists for this user"
+        )
+    return {
+        "status": "applied",
+        "results": [
+            {
+                "op": c.op,
+                "id": c.wish_id if c.record is None else c.record["id"],
+                "status": _BATCH_STATUS[c.op],
+            }
+            for c in changes
+        ],
+    }
 
 
 @router.post("", response_model=Wish)
-def create_wish(wish: Wish, user: str = Depends(get_current_user)):
-    if any(w["id"] == wish.id and w["owner"] == user for w in _DB["wishes"]):
-        raise AppValidationError("id already exists for this user")
+async def create_wish(
+    wish: Wish,
+    user: str = Depends(get_current_user),
+    repo: WishRepository = Depends(get_repository),
+):
     wish_data = wish.model_dump()
     wish_data["owner"] = user
-    _DB["wishes"].append(wish_data)
+    if not await repo.add(user, wish_data):
+        raise AppValidationError("id already exists for this user")
     return wish_data
 
 
 @router.get("/{wish_id}", response_model=Wish)
-def get_wish(wish_id: int, user: str = Depends(get_current_user)):
-    for w in _DB["wishes"]:
-        if w["id"] == wish_id and w["owner"] == user:
-            return w
-    raise NotFoundError("wish not found or not owned by user")
+async def get_wish(
+    wish_id: int,
+    user: str = Depends(get_current_user),
+    repo: WishRepository = Depends(get_repository),
+):
+    w = await repo.get(user, wish_id)
+    if w is None:
+        raise NotFoundError("wish not found or not owned by user")
+    return w
 
 
 @router.put("/{wish_id}", response_model=Wish)
-def update_wish(wish_id: int, wish: Wish, user: str = Depends(get_current_user)):
-    for idx, w in enumerate(_DB["wishes"]):
-        if w["id"] == wish_id and w["owner"] == user:
-            new_wish = wish.model_dump()
-            new_wish["owner"] = user
-            _DB["wishes"][idx] = new_wish
-            return new_wish
-    raise NotFoundError("wish not found or not owned by user")
+async def update_wish(
+    wish_id: int,
+    wish: Wish,
+    user: str = Depends(get_current_user),
+    repo: WishRepository = Depends(get_repository),
+):
+    new_wish = wish.model_dump()
+    new_wish["owner"] = user
+    # Проверка и замена — одна операция хранилища: причина отказа приходит из неё
+    conflict = await repo.replace(user, wish_id, new_wish)
+    if conflict == "missing":
+        raise NotFoundError("wish not found or not owned by user")
+    if conflict is not None:
+        raise AppValidationError("id already exists for this user")
+    return new_wish
 
 
 @router.delete("/{wish_id}")
-def delete_wish(wish_id: int, user: str = Depends(get_current_user)):
-    for idx, w in enumerate(_DB["wishes"]):
-        if w["id"] == wish_id and w["owner"] == user:
-            del _DB["wishes"][idx]
-            return {"status": "deleted"}
-    raise NotFoundError("wish not found or not owned by user")
+async def delete_wish(
+    wish_id: int,
+    user: str = Depends(get_current_user),
+    repo: WishRepository = Depends(get_repository),
+):
+    if not await repo.remove(user, wish_id):
+        raise NotFoundError("wish not found or not owned by user")
+    return {"status": "deleted"}
@@ -0,0 +1,154 @@
+"""
+Бенчмарк пути ошибок: сколько ответов 401/404/422 в секунду выдаёт обработчик.
+
+«before» — прежние обработчики (JSONResponse и uuid4() на каждый ответ),
+«after» — готовые тела из app.core.errors и счётчик вместо uuid4(); оба — для
+обычной обёртки и RFC 7807. «app» — те же ошибки через всё приложение
+(TestClient, лимит запросов снят, чтобы мерить сам путь ошибки):
+
+    python -m bench.errors --rounds 20000
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import time
+from typing import Awaitable, Callable
+from uuid import uuid4
+
+from fastapi import HTTPException
+from fastapi.exceptions import RequestValidationError
+from fastapi.responses import JSONResponse
+from fastapi.testclient import TestClient
+from starlette.requests import Request
+
+from app.core import errors, ratelimit
+from app.main import app
+
+PROBLEM = "application/problem+json"
+
+
+def _request(accept: str) -> Request:
+    headers = [(b"accept", accept.encode("latin-1"))]
+    return Request(
+        {"type": "http", "method": "GET", "path": "/wishes", "headers": headers}
+    )
+
+
+def _legacy_problem(status: int, title: str, detail: str, type_: str = "about:blank"):
+    payload = {
+        "type": type_,
+        "title": title,
+        "status": status,
+        "detail": detail,
+        "correlation_id": str(uuid4()),
+    }
+    return JSONResponse(payload, status_code=status)
+
+
+async def legacy_http_error(request: Request, exc: HTTPException):
+    if PROBLEM in request.headers.get("accept", "").lower():
+        return _legacy_problem(exc.status_code, "HTTP Error", exc.detail)
+    return JSONResponse(
+        status_code=exc.status_code,
+        content={"error": {"code": "http_error", "message": exc.detail}},
+    )
+
+
+async def legacy_api_error(request: Request, exc: errors.ApiError):
+    if PROBLEM in request.headers.get("accept", "").lower():
+        return _legacy_problem(
+            exc.status, exc.code, exc.message, f"urn:secdev:error:{exc.code}"
+        )
+    return JSONResponse(
+        status_code=exc.status,
+        content={"error": {"code": exc.code, "message": exc.message}},
+    )
+
+
+async def legacy_validation_error(request: Request, exc: RequestValidationError):
+    if PROBLEM in request.headers.get("accept", "").lower():
+        return _legacy_problem(
+            422,
+            "Validation Error",
+            "validation error",
+            "urn:secdev:error:validation_error",
+        )
+    return JSONResponse(
+        status_code=422,
+        content={"error": {"code": "validation_error", "message": "validation error"}},
+    )
+
+
+CASES = {
+    "401": (
+        HTTPException(status_code=401, detail="unauthorized"),
+        legacy_http_error,
+        errors.http_exception_handler,
+    ),
+    "404": (
+        errors.NotFoundError("wish not found or not owned by user"),
+        legacy_api_error,
+        errors.api_error_handler,
+    ),
+    "422": (
+        RequestValidationError([]),
+        legacy_validation_error,
+        errors.request_validation_error_handler,
+    ),
+}
+
+
+async def _per_second(
+    handler: Callable[..., Awaitable[object]], request: Request, exc: Exception, n: int
+) -> float:
+    t0 = time.perf_counter()
+    for _ in range(n):
+        await handler(request, exc)
+    return n / (time.perf_counter() - t0)
+
+
+def run_handlers(rounds: int) -> dict[str, float]:
+    result = {}
+    for accept in ("application/json", PROBLEM):
+        request = _request(accept)
+        fmt = "problem" if accept == PROBLEM else "envelope"
+        for status, (exc, before, after) in CASES.items():
+            for name, handler in (("before", before), ("after", after)):
+                rate = asyncio.run(_per_second(handler, request, exc, rounds))
+                result[f"{status} {fmt} {name}"] = rate
+    return result
+
+
+def run_app(rounds: int) -> dict[str, float]:
+    ratelimit.DEFAULT = ratelimit.Budget("default", rate=1e9, burst=1e9)
+    client = TestClient(app)
+    user = {"X-Auth-Token": "token123"}
+    calls = {
+        "401": lambda: client.get("/wishes"),
+        "404": lambda: client.get("/wishes/999999", headers=user),
+        "422": lambda: client.get("/wishes/sorted?order_by=x", headers=user),
+    }
+    result = {}
+    for status, call in calls.items():
+        assert call().status_code == int(status)
+        t0 = time.perf_counter()
+        for _ in range(rounds):
+            call()
+        result[f"{status} app"] = rounds / (time.perf_counter() - t0)
+    return result
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    ap.add_argument("--rounds", type=int, default=20_000)
+    ap.add_argument("--app-rounds", type=int, default=2000)
+    args = ap.parse_args()
+    results = {**run_handlers(args.rounds), **run_app(args.app_rounds)}
+    for name, rate in results.items():
+        print(f"{name:>22}: {rate:10.0f} errors/s")
+
+
+if __name__ == "__main__":
+    main()
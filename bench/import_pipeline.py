@@ -0,0 +1,131 @@
+"""
+Бенчмарк импорта: записей в секунду для пачек по 5000 записей.
+
+«before» — прежний путь (model_validate/model_dump на запись, ORM merge на
+запись), «after» — TypeAdapter(list[Wish]) плюс add_many (один executemany):
+
+    python -m bench.import_pipeline --records 5000 --rounds 5
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import time
+from typing import Any, Callable
+
+from sqlalchemy import delete
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+from sqlalchemy.pool import StaticPool
+
+from app.core.db_base import Base
+from app.core.sql_store import AsyncSqlWishRepository, _columns
+from app.core.store import WishStore
+from app.db_models.wish import WishORM
+from app.models.wish import Wish
+from app.routers.wishes import _WISH_BATCH
+
+OWNER = "bench"
+
+
+def _payload(n: int) -> list[dict[str, Any]]:
+    return [
+        {
+            "id": i,
+            "title": f"Wish {i}",
+            "price_estimate": f"{i % 1000}.{i % 100:02d}",
+            "category": f"cat{i % 20}",
+            "notes": "imported",
+        }
+        for i in range(n)
+    ]
+
+
+def validate_legacy(items: list[dict[str, Any]]) -> list[dict[str, Any]]:
+    out = []
+    for raw_item in items:
+        obj = dict(raw_item)
+        obj["owner"] = OWNER
+        out.append(Wish.model_validate(obj).model_dump())
+    return out
+
+
+def validate_batch(items: list[dict[str, Any]]) -> list[dict[str, Any]]:
+    return _WISH_BATCH.dump_python(
+        _WISH_BATCH.validate_python([{**item, "owner": OWNER} for item in items])
+    )
+
+
+def _rate(records: int, rounds: int, fn: Callable[[], None], reset: Callable[[], None]):
+    best = float("inf")
+    for _ in range(rounds):
+        reset()
+        t0 = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - t0)
+    return records / best
+
+
+def run(records: int, rounds: int) -> dict[str, float]:
+    items = _payload(records)
+    validated = validate_batch(items)
+
+    mem = WishStore()
+    # SQL-часть — в одном цикле событий: каждый замер — runner.run()
+    runner = asyncio.Runner()
+    engine = create_async_engine("sqlite+aiosqlite://", poolclass=StaticPool)
+    db = AsyncSession(engine)
+
+    async def create_schema() -> None:
+        async with engine.begin() as conn:
+            await conn.run_sync(Base.metadata.create_all)
+
+    async def reset_sql() -> None:
+        await db.execute(delete(WishORM))
+        await db.commit()
+
+    async def sql_legacy() -> None:
+        for record in validated:
+            await db.merge(WishORM(**_columns(OWNER, record)))
+        await db.commit()
+
+    async def sql_bulk() -> None:
+        await AsyncSqlWishRepository(db).add_many(OWNER, validated)
+
+    def sync(fn: Callable[[], Any]) -> Callable[[], None]:
+        return lambda: runner.run(fn())
+
+    runner.run(create_schema())
+    results = {
+        "validate_before_rps": _rate(
+            records, rounds, lambda: validate_legacy(items), lambda: None
+        ),
+        "validate_after_rps": _rate(
+            records, rounds, lambda: validate_batch(items), lambda: None
+        ),
+        "memory_after_rps": _rate(
+            records,
+            rounds,
+            lambda: mem.add_many(OWNER, validate_batch(items)),
+            mem.clear,
+        ),
+        "sqlite_before_rps": _rate(records, rounds, sync(sql_legacy), sync(reset_sql)),
+        "sqlite_after_rps": _rate(records, rounds, sync(sql_bulk), sync(reset_sql)),
+    }
+    runner.run(db.close())
+    runner.run(engine.dispose())
+    runner.close()
+    return results
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    ap.add_argument("--records", type=int, default=5000)
+    ap.add_argument("--rounds", type=int, default=5)
+    args = ap.parse_args()
+    for name, value in run(args.records, args.rounds).items():
+        print(f"{name:>22}: {value:12,.0f} records/s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,358 @@
+"""
+Нагрузочный прогон всех эндпойнтов /wishes против локального uvicorn.
+
+Поднимает сервер (или использует --url), засевает данные через импорт с заданным
+распределением по владельцам, гоняет взвешенный сценарий конкурентными клиентами
+и пишет JSON-отчёт с RPS и p50/p95/p99 по эндпойнтам. С --check код возврата
+ненулевой, если нарушены пороги NFR-04 (/wishes/sorted p95 ≤ 200 мс) и NFR-08
+(/health p95 ≤ 100 мс):
+
+    python -m bench.load --owners 200 --wishes 100000 --distribution zipf \\
+        --concurrency 16 --duration 30 --out reports/load.json --check
+
+Локальному серверу лимиты запросов снимаются (LOAD_TEST_LIMITS): сценарий меряет
+задержки, а не 429. Серверу из --url нужны те же переменные окружения.
+"""
+
+from __future__ import annotations
+
+import argparse
+import itertools
+import json
+import os
+import random
+import socket
+import subprocess
+import sys
+import threading
+import time
+from dataclasses import dataclass, field
+from typing import Callable
+
+import httpx
+
+IMPORT_BATCH = 5000
+
+# Пороги NFR для /wishes/sorted (NFR-04) и /health (NFR-08), мс
+THRESHOLDS_MS = {"sorted_full": 200.0, "health": 100.0}
+
+# Лимиты запросов (app.core.ratelimit) для сервера под нагрузкой: засев и
+# сценарий шлют импорты и экспорты чаще бюджета RATE_LIMIT_BULK_*
+LOAD_TEST_LIMITS = {
+    "RATE_LIMIT_RPS": "1000000",
+    "RATE_LIMIT_BURST": "1000000",
+    "RATE_LIMIT_BULK_PER_MIN": "1000000",
+    "RATE_LIMIT_BULK_BURST": "1000000",
+    "RATE_LIMIT_BULK_CONCURRENCY": "1000000",
+}
+
+Op = Callable[[httpx.Client, int], httpx.Response]
+
+
+def token_map(owners: int) -> dict[str, str]:
+    return {f"bench-token-{i}": f"bench-user-{i}" for i in range(owners)}
+
+
+def owner_sizes(total: int, owners: int, distribution: str) -> list[int]:
+    """Число желаний на владельца: uniform — поровну, zipf — «длинный хвост»."""
+    if distribution == "uniform":
+        weights = [1.0] * owners
+    else:
+        weights = [1.0 / (rank + 1) for rank in range(owners)]
+    scale = total / sum(weights)
+    sizes = [max(1, int(w * scale)) for w in weights]
+    sizes[0] += total - sum(sizes)
+    return sizes
+
+
+def _record(i: int, rnd: random.Random) -> dict:
+    return {
+        "id": i,
+        "title": f"Wish {rnd.randrange(10**6):06d}",
+        "price_estimate": f"{rnd.randrange(100_000) / 100:.2f}",
+        "category": f"cat{rnd.randrange(20)}",
+        "notes": "bench",
+    }
+
+
+@dataclass
+class Stats:
+    samples: dict[str, list[float]] = field(default_factory=dict)
+    errors: dict[str, int] = field(default_factory=dict)
+    lock: threading.Lock = field(default_factory=threading.Lock)
+
+    def record(self, name: str, ms: float, ok: bool) -> None:
+        with self.lock:
+            self.samples.setdefault(name, []).append(ms)
+            if not ok:
+                self.errors[name] = self.errors.get(name, 0) + 1
+
+
+def _pct(sorted_ms: list[float], q: float) -> float:
+    return sorted_ms[min(len(sorted_ms) - 1, int(len(sorted_ms) * q))]
+
+
+class Scenario:
+    """Взвешенный набор операций; у каждого воркера свой диапазон id для CRUD."""
+
+    def __init__(self, sizes: list[int], seed: int) -> None:
+        self.sizes = sizes
+        self.rnd = random.Random(seed)
+        self.headers = [{"X-Auth-Token": t} for t in token_map(len(sizes))]
+        self._ids = itertools.count(10_000_000 + seed * 1_000_000)
+        self.ops: list[tuple[str, int, Op]] = [
+            ("health", 5, lambda c, o: c.get("/health")),
+            ("list", 10, self._list),
+            ("sorted_full", 10, self._sorted_full),
+            ("sorted_page", 10, self._sorted_page),
+            ("price_less", 5, self._price("less")),
+            ("price_greater", 5, self._price("greater")),
+            ("category", 5, self._category),
+            ("get", 15, self._get),
+            ("create_update_delete", 10, self._crud),
+            ("import", 1, self._import),
+            ("export", 1, self._export),
+        ]
+        self._weights = [w for _, w, _ in self.ops]
+
+    def pick(self) -> tuple[str, Op, int]:
+        name, _, op = self.rnd.choices(self.ops, weights=self._weights)[0]
+        return name, op, self.rnd.randrange(len(self.sizes))
+
+    def _list(self, c: httpx.Client, owner: int) -> httpx.Response:
+        return c.get("/wishes", params={"limit": 100}, headers=self.headers[owner])
+
+    def _sorted_full(self, c: httpx.Client, owner: int) -> httpx.Response:
+        params = {"order_by": "price"}
+        return c.get("/wishes/sorted", params=params, headers=self.headers[owner])
+
+    def _sorted_page(self, c: httpx.Client, owner: int) -> httpx.Response:
+        params = {"order_by": "title", "ascending": False, "limit": 50}
+        return c.get("/wishes/sorted", params=params, headers=self.headers[owner])
+
+    def _price(self, op: str) -> Op:
+        def call(c: httpx.Client, owner: int) -> httpx.Response:
+            params = {"price": f"{self.rnd.randrange(1000)}.00", "limit": 100}
+            return c.get(
+                f"/wishes/price/{op}", params=params, headers=self.headers[owner]
+            )
+
+        return call
+
+    def _category(self, c: httpx.Client, owner: int) -> httpx.Response:
+        url = f"/wishes/category/cat{self.rnd.randrange(20)}"
+        return c.get(url, params={"limit": 100}, headers=self.headers[owner])
+
+    def _get(self, c: httpx.Client, owner: int) -> httpx.Response:
+        url = f"/wishes/{self.rnd.randrange(self.sizes[owner])}"
+        return c.get(url, headers=self.headers[owner])
+
+    def _crud(self, c: httpx.Client, owner: int) -> httpx.Response:
+        headers = self.headers[owner]
+        wish_id = next(self._ids)
+        body = _record(wish_id, self.rnd)
+        r = c.post("/wishes", json=body, headers=headers)
+        if r.status_code != 200:
+            return r
+        body["notes"] = "updated"
+        r = c.put(f"/wishes/{wish_id}", json=body, headers=headers)
+        if r.status_code != 200:
+            return r
+        return c.delete(f"/wishes/{wish_id}", headers=headers)
+
+    def _import(self, c: httpx.Client, owner: int) -> httpx.Response:
+        backup = [_record(next(self._ids), self.rnd) for _ in range(500)]
+        return c.post(
+            "/wishes/import", json={"backup": backup}, headers=self.headers[owner]
+        )
+
+    def _export(self, c: httpx.Client, owner: int) -> httpx.Response:
+        params = {"format": "ndjson"}
+        return c.get("/wishes/export", params=params, headers=self.headers[owner])
+
+
+def seed(base_url: str, sizes: list[int]) -> float:
+    rnd = random.Random(1)
+    t0 = time.perf_counter()
+    tokens = list(token_map(len(sizes)))
+    with httpx.Client(base_url=base_url, timeout=60) as c:
+        for token, size in zip(tokens, sizes):
+            for start in range(0, size, IMPORT_BATCH):
+                stop = min(size, start + IMPORT_BATCH)
+                backup = [_record(i, rnd) for i in range(start, stop)]
+                r = c.post(
+                    "/wishes/import",
+                    json={"backup": backup},
+                    headers={"X-Auth-Token": token},
+                )
+                r.raise_for_status()
+    return time.perf_counter() - t0
+
+
+def drive(base_url: str, sizes: list[int], concurrency: int, duration: float) -> Stats:
+    stats = Stats()
+    deadline = time.perf_counter() + duration
+
+    def worker(n: int) -> None:
+        scenario = Scenario(sizes, seed=n + 1)
+        with httpx.Client(base_url=base_url, timeout=30) as c:
+            while time.perf_counter() < deadline:
+                name, op, owner = scenario.pick()
+                t0 = time.perf_counter()
+                try:
+                    ok = op(c, owner).status_code < 400
+                except httpx.HTTPError:
+                    ok = False
+                stats.record(name, (time.perf_counter() - t0) * 1000.0, ok)
+
+    threads = [threading.Thread(target=worker, args=(n,)) for n in range(concurrency)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    return stats
+
+
+def report(stats: Stats, duration: float) -> dict:
+    endpoints = {}
+    for name, samples in sorted(stats.samples.items()):
+        samples.sort()
+        endpoints[name] = {
+            "count": len(samples),
+            "errors": stats.errors.get(name, 0),
+            "rps": round(len(samples) / duration, 2),
+            "p50_ms": round(_pct(samples, 0.50), 2),
+            "p95_ms": round(_pct(samples, 0.95), 2),
+            "p99_ms": round(_pct(samples, 0.99), 2),
+        }
+    checks = {
+        name: {
+            "p95_ms": endpoints[name]["p95_ms"],
+            "threshold_ms": limit,
+            "ok": endpoints[name]["p95_ms"] <= limit,
+        }
+        for name, limit in THRESHOLDS_MS.items()
+        if name in endpoints
+    }
+    total = sum(e["count"] for e in endpoints.values())
+    return {
+        "throughput_rps": round(total / duration, 2),
+        "endpoints": endpoints,
+        "thresholds": checks,
+    }
+
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def start_server(owners: int, workers: int) -> tuple[subprocess.Popen, str]:
+    port = _free_port()
+    env = dict(
+        os.environ,
+        **LOAD_TEST_LIMITS,
+        VAULT_TOKEN_MAP_JSON=json.dumps(token_map(owners)),
+    )
+    proc = subprocess.Popen(
+        [
+            sys.executable,
+            "-m",
+            "uvicorn",
+            "app.main:app",
+            "--port",
+            str(port),
+            "--workers",
+            str(workers),
+            "--log-level",
+            "warning",
+        ],
+        env=env,
+    )
+    base_url = f"http://127.0.0.1:{port}"
+    for _ in range(100):
+        try:
+            if httpx.get(f"{base_url}/health", timeout=1).status_code == 200:
+                return proc, base_url
+        except httpx.HTTPError:
+            pass
+        time.sleep(0.1)
+    proc.terminate()
+    raise RuntimeError("uvicorn did not start")
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    ap.add_argument("--url", help="уже запущенный сервер (иначе поднимается локально)")
+    ap.add_argument("--owners", type=int, default=100)
+    ap.add_argument("--wishes", type=int, default=50_000, help="всего желаний")
+    ap.add_argument("--distribution", choices=("uniform", "zipf"), default="zipf")
+    ap.add_argument("--concurrency", type=int, default=8)
+    ap.add_argument("--duration", type=float, default=20.0)
+    ap.add_argument("--workers", type=int, default=1, help="воркеры uvicorn")
+    ap.add_argument("--out", default="bench-report.json")
+    ap.add_argument(
+        "--check", action="store_true", help="ненулевой код при нарушении NFR"
+    )
+    ap.add_argument(
+        "--print-token-map",
+        action="store_true",
+        help="вывести VAULT_TOKEN_MAP_JSON для внешнего сервера и выйти",
+    )
+    args = ap.parse_args()
+
+    if args.print_token_map:
+        print(json.dumps(token_map(args.owners)))
+        return
+    backend = os.getenv("DATABASE_URL", "memory://").split(":")[0]
+    if args.workers > 1 and backend == "memory" and args.url is None:
+        # У каждого воркера было бы своё in-memory хранилище
+        ap.error("--workers > 1 needs a shared DATABASE_URL backend")
+
+    proc = None
+    base_url = args.url
+    if base_url is None:
+        proc, base_url = start_server(args.owners, args.workers)
+    try:
+        sizes = owner_sizes(args.wishes, args.owners, args.distribution)
+        seed_s = seed(base_url, sizes)
+        stats = drive(base_url, sizes, args.concurrency, args.duration)
+    finally:
+        if proc is not None:
+            proc.terminate()
+            proc.wait()
+
+    result = report(stats, args.duration)
+    result["config"] = {
+        "owners": args.owners,
+        "wishes": args.wishes,
+        "distribution": args.distribution,
+        "max_wishes_per_owner": max(sizes),
+        "concurrency": args.concurrency,
+        "duration_s": args.duration,
+        "workers": args.workers,
+        "database_url": os.getenv("DATABASE_URL", "memory://").split("://")[0],
+        "seed_s": round(seed_s, 2),
+    }
+    out_dir = os.path.dirname(args.out)
+    if out_dir:
+        os.makedirs(out_dir, exist_ok=True)
+    with open(args.out, "w", encoding="utf-8") as f:
+        json.dump(result, f, indent=2)
+
+    print(f"{'endpoint':>22} {'rps':>8} {'p50':>8} {'p95':>8} {'p99':>8} {'err':>5}")
+    for name, e in result["endpoints"].items():
+        print(
+            f"{name:>22} {e['rps']:>8} {e['p50_ms']:>8} {e['p95_ms']:>8} "
+            f"{e['p99_ms']:>8} {e['errors']:>5}"
+        )
+    failed = [name for name, c in result["thresholds"].items() if not c["ok"]]
+    if failed:
+        print(f"NFR thresholds violated: {', '.join(failed)}")
+    if args.check and failed:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
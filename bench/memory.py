@@ -0,0 +1,99 @@
+"""
+Бенчмарк памяти на одно желание в in-memory хранилище.
+
+«dict» — прежнее представление записи (dict с Decimal и owner в каждой записи),
+«compact» — CompactWish, «store» — WishStore целиком, вместе с индексами.
+Записи строятся из JSON, как при импорте, чтобы строки не были общими:
+
+    python -m bench.memory --wishes 200000 --owners 1000
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import tracemalloc
+from decimal import Decimal
+from typing import Any, Callable
+
+from app.core.records import CompactWish
+from app.core.store import WishStore
+
+
+def _payload(wishes: int, owners: int) -> bytes:
+    return json.dumps(
+        [
+            {
+                "id": i // owners,
+                "title": f"Wish {i}",
+                "link": None,
+                "price_estimate": f"{i % 100000 / 100:.2f}" if i % 10 else None,
+                "notes": None,
+                "category": f"cat{i % 20}",
+                "owner": f"user{i % owners}",
+            }
+            for i in range(wishes)
+        ]
+    ).encode()
+
+
+def _records(payload: bytes) -> list[dict[str, Any]]:
+    records = json.loads(payload)
+    for r in records:
+        if r["price_estimate"] is not None:
+            r["price_estimate"] = Decimal(r["price_estimate"])
+    return records
+
+
+def as_dicts(records: list[dict[str, Any]]) -> object:
+    by_owner: dict[str, dict[int, dict]] = {}
+    for r in records:
+        by_owner.setdefault(r["owner"], {})[r["id"]] = r
+    return by_owner
+
+
+def as_compact(records: list[dict[str, Any]]) -> object:
+    by_owner: dict[str, dict[int, CompactWish]] = {}
+    for r in records:
+        by_owner.setdefault(r["owner"], {})[r["id"]] = CompactWish.pack(r)
+    return by_owner
+
+
+def as_store(records: list[dict[str, Any]]) -> object:
+    store = WishStore()
+    for r in records:
+        store.add(r["owner"], r)
+    return store
+
+
+def _bytes_per_wish(
+    build: Callable[[list[dict[str, Any]]], object], payload: bytes, wishes: int
+) -> float:
+    tracemalloc.start()
+    records = _records(payload)
+    held = build(records)
+    # Разобранные dict остаются в памяти, только если их держит само представление
+    del records
+    used = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    del held
+    return used / wishes
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    ap.add_argument("--wishes", type=int, default=200_000)
+    ap.add_argument("--owners", type=int, default=1000)
+    args = ap.parse_args()
+    payload = _payload(args.wishes, args.owners)
+    for name, build in (
+        ("dict", as_dicts),
+        ("compact", as_compact),
+        ("store", as_store),
+    ):
+        per_wish = _bytes_per_wish(build, payload, args.wishes)
+        print(f"{name:>8}: {per_wish:8.1f} bytes per wish")
+
+
+if __name__ == "__main__":
+    main()
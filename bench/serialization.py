@@ -0,0 +1,80 @@
+"""
+Бенчмарк сериализации списка желаний одного владельца.
+
+«response_model» — путь FastAPI для response_model=list[Wish]: повторная
+валидация, dump в JSON-совместимые объекты и json.dumps в JSONResponse;
+«encode» — прямое кодирование записей хранилища, «encode cached» — то же
+с JSON записей, закэшированным в бакете владельца:
+
+    python -m bench.serialization --wishes 10000 --rounds 20
+"""
+
+from __future__ import annotations
+
+import argparse
+import time
+from decimal import Decimal
+from typing import Callable
+
+from pydantic import TypeAdapter
+from starlette.responses import JSONResponse
+
+from app.core.serialization import encode_records
+from app.core.store import WishStore
+from app.models.wish import Wish
+
+OWNER = "bench"
+
+_ADAPTER = TypeAdapter(list[Wish])
+
+
+def response_model_path(records: list[dict]) -> bytes:
+    content = _ADAPTER.dump_python(_ADAPTER.validate_python(records), mode="json")
+    return JSONResponse(content).body
+
+
+def _best_ms(fn: Callable[[], bytes], rounds: int) -> float:
+    best = float("inf")
+    for _ in range(rounds):
+        t0 = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - t0)
+    return best * 1000.0
+
+
+def run(wishes: int, rounds: int) -> dict[str, float]:
+    store = WishStore()
+    store.extend(
+        OWNER,
+        (
+            Wish(
+                id=i,
+                title=f"Wish {i}",
+                price_estimate=Decimal(i % 1000) / 4,
+                category=f"cat{i % 20}",
+                notes="benchmark",
+                owner=OWNER,
+            ).model_dump()
+            for i in range(wishes)
+        ),
+    )
+    records = store.page(OWNER).items
+    assert response_model_path(records) == store.encode(OWNER, records)
+    return {
+        "response_model": _best_ms(lambda: response_model_path(records), rounds),
+        "encode": _best_ms(lambda: encode_records(records), rounds),
+        "encode cached": _best_ms(lambda: store.encode(OWNER, records), rounds),
+    }
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    ap.add_argument("--wishes", type=int, default=10_000)
+    ap.add_argument("--rounds", type=int, default=20)
+    args = ap.parse_args()
+    for name, ms in run(args.wishes, args.rounds).items():
+        print(f"{name:>16}: {ms:8.2f} ms per {args.wishes} wishes")
+
+
+if __name__ == "__main__":
+    main()
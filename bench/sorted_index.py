@@ -0,0 +1,77 @@
+"""
+Бенчмарк сортированной выдачи и ценовых порогов для одного «тяжёлого» владельца.
+
+Сравнивает обход per-owner индексов с прежней пересортировкой на каждый запрос:
+
+    python -m bench.sorted_index --per-owner 50000
+"""
+
+from __future__ import annotations
+
+import argparse
+import random
+import time
+from decimal import Decimal
+
+from app.core.store import WishStore
+
+
+def _p95_ms(fn, repeats: int) -> float:
+    samples = []
+    for _ in range(repeats):
+        t0 = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - t0) * 1000.0)
+    samples.sort()
+    return samples[max(0, int(len(samples) * 0.95) - 1)]
+
+
+def run(per_owner: int, repeats: int) -> dict[str, float]:
+    rnd = random.Random(7)
+    s = WishStore()
+    s.extend(
+        "heavy",
+        (
+            {
+                "id": i,
+                "title": f"W{rnd.randrange(10**6):06d}",
+                "price_estimate": Decimal(rnd.randrange(100_000)) / 100,
+                "owner": "heavy",
+            }
+            for i in range(per_owner)
+        ),
+    )
+    threshold = Decimal("10.00")
+
+    def legacy_sorted():
+        return sorted(s.items("heavy"), key=lambda w: w["price_estimate"])
+
+    def legacy_less():
+        return [w for w in s.items("heavy") if w["price_estimate"] < threshold]
+
+    mid = s.page("heavy", "price_estimate", offset=per_owner // 2, limit=1).next_key
+
+    return {
+        "sorted_p95_ms": _p95_ms(lambda: s.page("heavy", "price_estimate"), repeats),
+        "legacy_sorted_p95_ms": _p95_ms(legacy_sorted, repeats),
+        "sorted_page_p95_ms": _p95_ms(
+            lambda: s.page("heavy", "price_estimate", after=mid, limit=100), repeats
+        ),
+        "price_less_p95_ms": _p95_ms(
+            lambda: s.page("heavy", "price_estimate", below=threshold), repeats
+        ),
+        "legacy_price_less_p95_ms": _p95_ms(legacy_less, repeats),
+    }
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    ap.add_argument("--per-owner", type=int, default=50_000)
+    ap.add_argument("--repeats", type=int, default=50)
+    args = ap.parse_args()
+    for name, value in run(args.per_owner, args.repeats).items():
+        print(f"{name:>26}: {value:8.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,108 @@
+"""
+Бенчмарк точечных и пользовательских выборок в хранилище желаний.
+
+Сравнивает WishStore (индекс owner -> {id -> record}) с прежним плоским
+списком при росте общего числа желаний. Запуск:
+
+    python -m bench.store_lookup --sizes 1000 10000 100000 1000000 --owners 10000
+"""
+
+from __future__ import annotations
+
+import argparse
+import random
+import time
+from decimal import Decimal
+from typing import Callable
+
+from app.core.store import WishStore
+
+
+def _p95(samples: list[float]) -> float:
+    samples.sort()
+    return samples[max(0, int(len(samples) * 0.95) - 1)]
+
+
+def _measure(fn: Callable[[str, int], object], queries: list[tuple[str, int]]) -> float:
+    samples = []
+    for owner, wish_id in queries:
+        t0 = time.perf_counter()
+        fn(owner, wish_id)
+        samples.append((time.perf_counter() - t0) * 1e6)
+    return _p95(samples)
+
+
+def _build(total: int, owners: int) -> tuple[WishStore, list[dict]]:
+    s = WishStore()
+    flat = []
+    for n in range(total):
+        owner = f"user{n % owners}"
+        rec = {
+            "id": n // owners,
+            "title": f"W{n}",
+            "price_estimate": Decimal(n % 1000),
+            "owner": owner,
+        }
+        s.add(owner, rec)
+        flat.append(rec)
+    return s, flat
+
+
+def run(sizes: list[int], owners: int, queries: int, legacy_limit: int) -> list[dict]:
+    rnd = random.Random(42)
+    rows = []
+    for total in sizes:
+        s, flat = _build(total, owners)
+        per_owner = max(1, total // owners)
+        qs = [
+            (f"user{rnd.randrange(min(owners, total))}", rnd.randrange(per_owner))
+            for _ in range(queries)
+        ]
+        row = {
+            "total": total,
+            "get_p95_us": _measure(s.get, qs),
+            "list_p95_us": _measure(lambda o, _: s.items(o), qs),
+        }
+        if total <= legacy_limit:
+            legacy_qs = qs[: max(10, queries // 100)]
+            row["legacy_get_p95_us"] = _measure(
+                lambda o, i: next(
+                    (w for w in flat if w["owner"] == o and w["id"] == i), None
+                ),
+                legacy_qs,
+            )
+            row["legacy_list_p95_us"] = _measure(
+                lambda o, _: [w for w in flat if w["owner"] == o], legacy_qs
+            )
+        rows.append(row)
+    return rows
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    ap.add_argument(
+        "--sizes", type=int, nargs="+", default=[1_000, 10_000, 100_000, 1_000_000]
+    )
+    ap.add_argument("--owners", type=int, default=10_000)
+    ap.add_argument("--queries", type=int, default=10_000)
+    ap.add_argument("--legacy-limit", type=int, default=100_000)
+    args = ap.parse_args()
+
+    print(
+        f"{'total':>9} {'get p95':>10} {'list p95':>10} {'legacy get':>11} {'legacy list':>12}"
+    )
+    for row in run(args.sizes, args.owners, args.queries, args.legacy_limit):
+        legacy_get = row.get("legacy_get_p95_us")
+        legacy_list = row.get("legacy_list_p95_us")
+        print(
+            f"{row['total']:>9} {row['get_p95_us']:>8.1f}us {row['list_p95_us']:>8.1f}us "
+            + (
+                f"{legacy_get:>9.1f}us {legacy_list:>10.1f}us"
+                if legacy_get
+                else f"{'-':>11} {'-':>12}"
+            )
+        )
+
+
+if __name__ == "__main__":
+    main()
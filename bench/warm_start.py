@@ -0,0 +1,83 @@
+"""
+Бенчмарк сохранения и тёплого старта in-memory хранилища.
+
+Заполняет WishStore, снимает снимок, дописывает журнал и измеряет, за сколько
+новый процесс поднимет те же данные (загрузка снимка через mmap + повтор журнала):
+
+    python -m bench.warm_start --wishes 1000000 --owners 10000 --journal 50000
+"""
+
+from __future__ import annotations
+
+import argparse
+import tempfile
+import time
+from decimal import Decimal
+from pathlib import Path
+
+from app.core.persistence import SNAPSHOT_NAME, StorePersistence
+from app.core.store import WishStore
+
+
+def _record(i: int, owners: int) -> dict:
+    return {
+        "id": i // owners,
+        "title": f"Wish {i}",
+        "price_estimate": Decimal(i % 100000) / 100 if i % 10 else None,
+        "category": f"cat{i % 20}",
+        "owner": f"user{i % owners}",
+    }
+
+
+def run(wishes: int, owners: int, journal: int, data_dir: Path) -> dict[str, float]:
+    store = WishStore()
+    persistence = StorePersistence(store, data_dir)
+    persistence.open()
+    by_owner: dict[str, list[dict]] = {}
+    for i in range(wishes):
+        record = _record(i, owners)
+        by_owner.setdefault(record["owner"], []).append(record)
+    for owner, records in by_owner.items():
+        store.extend(owner, records)
+
+    t0 = time.perf_counter()
+    persistence.checkpoint()
+    snapshot_s = time.perf_counter() - t0
+
+    t0 = time.perf_counter()
+    for i in range(wishes, wishes + journal):
+        record = _record(i, owners)
+        store.add(record["owner"], record)
+    journal_s = time.perf_counter() - t0
+    persistence.close()
+
+    restored = WishStore()
+    t0 = time.perf_counter()
+    warm = StorePersistence(restored, data_dir)
+    warm.open()
+    warm_s = time.perf_counter() - t0
+    warm.close()
+    assert len(restored) == wishes + journal
+
+    return {
+        "snapshot_s": snapshot_s,
+        "snapshot_mb": (data_dir / SNAPSHOT_NAME).stat().st_size / 1e6,
+        "journal_ops_per_s": journal / journal_s if journal else 0.0,
+        "warm_start_s": warm_s,
+    }
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    ap.add_argument("--wishes", type=int, default=1_000_000)
+    ap.add_argument("--owners", type=int, default=10_000)
+    ap.add_argument("--journal", type=int, default=50_000)
+    args = ap.parse_args()
+    with tempfile.TemporaryDirectory() as tmp:
+        result = run(args.wishes, args.owners, args.journal, Path(tmp))
+    for name, value in result.items():
+        print(f"{name:>18}: {value:10.2f}")
+
+
+if __name__ == "__main__":
+    main()
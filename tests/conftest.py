@@ -2,6 +2,18 @@
 import sys
 from pathlib import Path
 
+import pytest
+
 ROOT = Path(__file__).resolve().parents[1]  # корень репозитория
 if str(ROOT) not in sys.path:
     sys.path.insert(0, str(ROOT))
+
+from app.core import ratelimit  # noqa: E402
+
+
+@pytest.fixture(autouse=True)
+def fresh_rate_limits(monkeypatch):
+    # Лимиты не переносятся между тестами: у каждого свой полный бюджет
+    monkeypatch.setattr(
+        ratelimit, "limiter", ratelimit.RateLimiter(ratelimit.MemoryBuckets())
+    )
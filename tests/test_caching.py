@@ -0,0 +1,111 @@
+import pytest
+from fastapi.testclient import TestClient
+
+from app.core.db import store
+from app.core.response_cache import ResponseCache, response_cache
+from app.main import app
+
+client = TestClient(app)
+
+USER = {"X-Auth-Token": "token123"}
+OTHER = {"X-Auth-Token": "token456"}
+
+
+@pytest.fixture(autouse=True)
+def clear_db():
+    store.clear()
+    response_cache.clear()
+
+
+def _seed(n=3):
+    for i in range(1, n + 1):
+        r = client.post(
+            "/wishes",
+            json={"id": i, "title": f"W{i}", "price_estimate": f"{i}.50"},
+            headers=USER,
+        )
+        assert r.status_code == 200
+
+
+@pytest.mark.parametrize(
+    "url",
+    [
+        "/wishes",
+        "/wishes/sorted?order_by=title",
+        "/wishes/price/less?price=10",
+        "/wishes/export",
+        "/wishes/export?format=ndjson",
+        "/wishes/export?format=json-stream",
+    ],
+)
+def test_unchanged_data_is_revalidated_with_304(url):
+    _seed()
+    first = client.get(url, headers=USER)
+    assert first.status_code == 200
+    etag = first.headers["ETag"]
+
+    again = client.get(url, headers={**USER, "If-None-Match": etag})
+    assert again.status_code == 304
+    assert again.content == b""
+    assert again.headers["ETag"] == etag
+
+    client.delete("/wishes/2", headers=USER)
+    changed = client.get(url, headers={**USER, "If-None-Match": etag})
+    assert changed.status_code == 200
+    assert changed.headers["ETag"] != etag
+
+
+def test_cached_body_matches_rendered_body_and_keeps_cursor():
+    _seed(5)
+    hits = response_cache.hits
+    first = client.get("/wishes/sorted", params={"limit": 2}, headers=USER)
+    second = client.get("/wishes/sorted", params={"limit": 2}, headers=USER)
+    assert response_cache.hits == hits + 1
+    assert second.content == first.content
+    assert second.headers["X-Next-Cursor"] == first.headers["X-Next-Cursor"]
+    assert first.json()[0] == {
+        "id": 1,
+        "title": "W1",
+        "link": None,
+        "price_estimate": "1.50",
+        "notes": None,
+        "category": None,
+        "owner": "alice",
+    }
+
+
+def test_etag_is_per_owner_version():
+    _seed()
+    mine = client.get("/wishes", headers=USER).headers["ETag"]
+    theirs = client.get("/wishes", headers=OTHER)
+    assert theirs.json() == []
+    assert (
+        client.get("/wishes", headers={**OTHER, "If-None-Match": mine}).status_code
+        == 200
+    )
+
+    # Изменения другого владельца не сбрасывают кэш и ETag
+    client.post("/wishes", json={"id": 1, "title": "x"}, headers=OTHER)
+    assert (
+        client.get("/wishes", headers={**USER, "If-None-Match": mine}).status_code
+        == 304
+    )
+
+
+def test_invalid_cursor_is_rejected_even_with_matching_etag():
+    _seed()
+    etag = client.get("/wishes", headers=USER).headers["ETag"]
+    r = client.get("/wishes?cursor=bogus", headers={**USER, "If-None-Match": etag})
+    assert r.status_code == 422
+
+
+def test_lru_evicts_by_entries_and_bytes():
+    cache = ResponseCache(max_entries=2, max_bytes=10)
+    cache.put(("a", "/", ""), 1, b"1234", {})
+    cache.put(("b", "/", ""), 1, b"1234", {})
+    assert cache.get(("a", "/", ""), 1) is not None
+    cache.put(("c", "/", ""), 1, b"1234", {})
+    assert cache.get(("b", "/", ""), 1) is None
+    assert cache.get(("a", "/", ""), 2) is None  # версия сменилась
+    cache.put(("d", "/", ""), 1, b"12345678", {})
+    assert cache.stats()["bytes"] <= 10
@@ -1,18 +1,23 @@
+import logging
+import re
+
 import pytest
+from fastapi.responses import JSONResponse
 from fastapi.testclient import TestClient
 
-from app.core.db import _DB
+from app.core.db import store
 from app.main import app
 
 client = TestClient(app)
 
 USER_TOKEN = {"X-Auth-Token": "token123"}
 OTHER_TOKEN = {"X-Auth-Token": "token456"}
+PROBLEM = {"Accept": "application/problem+json"}
 
 
 @pytest.fixture(autouse=True)
 def clear_db():
-    _DB["wishes"].clear()
+    store.clear()
 
 
 def test_unauthorized_access_returns_401():
@@ -95,3 +100,50 @@ def test_invalid_sort_key_returns_validation_error():
     assert r.status_code == 422
     body = r.json()
     assert body["error"]["code"] == "validation_error"
+
+
+def test_invalid_cursor_returns_validation_error():
+    r = client.get("/wishes", params={"cursor": "not-a-cursor"}, headers=USER_TOKEN)
+    assert r.status_code == 422
+    assert r.json()["error"]["code"] == "validation_error"
+
+
+def test_error_bodies_match_json_response_bytes():
+    r = client.get("/wishes/999", headers=USER_TOKEN)
+    assert (
+        r.content
+        == JSONResponse(
+            {
+                "error": {
+                    "code": "not_found",
+                    "message": "wish not found or not owned by user",
+                }
+            }
+        ).body
+    )
+    r = client.get("/wishes/sorted?order_by=x", headers={**USER_TOKEN, **PROBLEM})
+    body = r.json()
+    cid = r.headers["X-Correlation-ID"]
+    assert r.content == JSONResponse({**body, "correlation_id": cid}).body
+
+
+def test_correlation_id_is_propagated_from_header_into_logs(caplog):
+    caplog.set_level(logging.INFO, logger="app.errors")
+    headers = {"X-Correlation-ID": "req-42.a:b", **PROBLEM}
+    r = client.get("/wishes", headers=headers)
+    assert r.status_code == 401
+    assert r.headers["X-Correlation-ID"] == "req-42.a:b"
+    assert r.json()["correlation_id"] == "req-42.a:b"
+    assert "GET /wishes -> 401 http_error cid=req-42.a:b" in caplog.text
+
+
+@pytest.mark.parametrize("incoming", [None, "", "x" * 65, "bad id\r\nX-Evil: 1"])
+def test_missing_or_unsafe_correlation_id_is_replaced(incoming):
+    headers = {} if incoming is None else {"X-Correlation-ID": incoming}
+    ids = set()
+    for _ in range(3):
+        r = client.get("/wishes/1", headers={**USER_TOKEN, **headers})
+        cid = r.headers["X-Correlation-ID"]
+        assert cid != incoming and re.fullmatch(r"[0-9a-f]{12}-[0-9a-f]+", cid)
+        ids.add(cid)
+    assert len(ids) == 3
@@ -1,5 +1,9 @@
+import asyncio
+
 from fastapi.testclient import TestClient
 
+from app.core import telemetry
+from app.core.db import store
 from app.main import app
 
 client = TestClient(app)
@@ -9,3 +13,72 @@ def test_health_ok():
     r = client.get("/health")
     assert r.status_code == 200
     assert r.json() == {"status": "ok"}
+
+
+def test_metrics_follow_writes_and_tolerate_unpriced_wishes():
+    store.clear()
+    user = {"X-Auth-Token": "token123"}
+    client.post(
+        "/wishes",
+        json={"id": 1, "title": "A", "price_estimate": "10.00", "category": "books"},
+        headers=user,
+    )
+    client.post(
+        "/wishes", json={"id": 2, "title": "B", "category": "books"}, headers=user
+    )
+    client.post(
+        "/wishes", json={"id": 3, "title": "C", "price_estimate": "5"}, headers=user
+    )
+    client.delete("/wishes/3", headers=user)
+
+    body = client.get("/metrics").json()
+    assert body["total_wishes"] == 2
+    assert body["priced_wishes"] == 1
+    assert body["avg_price"] == 5.0
+    # Только число категорий: их названия — данные пользователей
+    assert body["categories"] == 1
+
+    r = client.get("/metrics", params={"format": "prometheus"})
+    assert r.headers["content-type"].startswith("text/plain")
+    assert "wishes_total 2" in r.text
+    assert "wish_categories 1" in r.text
+    assert "books" not in r.text
+    store.clear()
+
+
+def test_metrics_expose_route_latency_and_spans():
+    user = {"X-Auth-Token": "token123"}
+    client.get("/wishes/123", headers=user)
+    client.get("/wishes/sorted", headers=user)
+
+    http = client.get("/metrics").json()["http"]
+    assert http["latency_ms"]["GET /wishes/{wish_id} 404"]["count"] >= 1
+    assert "GET /wishes/sorted 200" in http["latency_ms"]
+    assert http["spans_ms"]["auth"]["count"] >= 2
+    assert "store.page" in http["spans_ms"]
+
+    text = client.get("/metrics", headers={"Accept": "text/plain"}).text
+    assert (
+        'http_request_duration_seconds_bucket{method="GET",route="/wishes/sorted",'
+        'status="200",le="0.2"}' in text
+    )
+    assert "http_requests_in_flight 1" in text
+
+
+def test_instrumented_async_generators_are_timed_over_iteration():
+    class SlowPages:
+        async def iter_pages(self, owner, size):
+            for page in ([1], [2]):
+                await asyncio.sleep(0.02)
+                yield page
+
+    telemetry.SPAN_LATENCY.clear()
+    repo = telemetry.instrument(SlowPages())
+    assert type(repo) is type(telemetry.instrument(SlowPages()))
+
+    async def run():
+        return [page async for page in repo.iter_pages("alice", 1)]
+
+    assert asyncio.run(run()) == [[1], [2]]
+    (labels, _, total, count), *_ = telemetry.SPAN_LATENCY._snapshot()
+    assert labels == ("store.iter_pages",) and count == 1 and total >= 0.04
@@ -4,7 +4,7 @@ import time
 import pytest
 from fastapi.testclient import TestClient
 
-from app.core.db import _DB
+from app.core.db import store
 from app.main import app
 
 client = TestClient(app)
@@ -15,7 +15,7 @@ OTHER = {"X-Auth-Token": "token456"}
 
 @pytest.fixture(autouse=True)
 def clear_db():
-    _DB["wishes"].clear()
+    store.clear()
 
 
 def test_nfr01_protected_endpoints_require_token():
@@ -84,18 +84,94 @@ def test_nfr05_sca_sla_checked_in_ci():
 def test_nfr06_db_consistency_on_failed_put_and_duplicate_create():
     r1 = client.post("/wishes", json={"id": 1, "title": "A"}, headers=USER)
     assert r1.status_code == 200
-    before = list(_DB["wishes"])
+    before = store.items("alice")
 
     r2 = client.put("/wishes/999", json={"id": 999, "title": "X"}, headers=USER)
     assert r2.status_code == 404
-    assert _DB["wishes"] == before
+    assert store.items("alice") == before
 
     r3 = client.post("/wishes", json={"id": 1, "title": "Dup"}, headers=USER)
     assert r3.status_code == 422
-    records = [w for w in _DB["wishes"] if w["owner"] == "alice" and w["id"] == 1]
+    records = [w for w in store.items("alice") if w["id"] == 1]
     assert len(records) == 1
 
 
+def test_nfr06_batch_applies_mixed_operations_in_order():
+    client.post("/wishes", json={"id": 1, "title": "A"}, headers=USER)
+    client.post("/wishes", json={"id": 2, "title": "B"}, headers=USER)
+    r = client.post(
+        "/wishes/batch",
+        json={
+            "operations": [
+                {"op": "create", "wish": {"id": 3, "title": "C"}},
+                {"op": "update", "id": 1, "wish": {"id": 10, "title": "A2"}},
+                {"op": "delete", "id": 2},
+                {"op": "create", "wish": {"id": 2, "title": "B again"}},
+            ]
+        },
+        headers=USER,
+    )
+    assert r.status_code == 200
+    assert r.json()["results"] == [
+        {"op": "create", "id": 3, "status": "created"},
+        {"op": "update", "id": 10, "status": "updated"},
+        {"op": "delete", "id": 2, "status": "deleted"},
+        {"op": "create", "id": 2, "status": "created"},
+    ]
+    assert {w["id"]: w["title"] for w in store.items("alice")} == {
+        2: "B again",
+        3: "C",
+        10: "A2",
+    }
+    assert store.get("alice", 10)["owner"] == "alice"
+
+
+@pytest.mark.parametrize(
+    "operations, status, index",
+    [
+        ([{"op": "create", "wish": {"id": 1, "title": "Dup"}}], 422, 1),
+        ([{"op": "delete", "id": 2}, {"op": "delete", "id": 2}], 404, 2),
+        ([{"op": "update", "id": 9, "wish": {"id": 9, "title": "X"}}], 404, 1),
+        ([{"op": "update", "id": 2, "wish": {"id": 5, "title": "X"}}], 422, 1),
+    ],
+)
+def test_nfr06_batch_is_all_or_nothing(operations, status, index):
+    client.post("/wishes", json={"id": 1, "title": "A"}, headers=USER)
+    client.post("/wishes", json={"id": 2, "title": "B"}, headers=USER)
+    before = store.items("alice")
+    r = client.post(
+        "/wishes/batch",
+        # Первая операция выполнима, но не должна примениться
+        json={
+            "operations": [{"op": "create", "wish": {"id": 5, "title": "N"}}]
+            + operations
+        },
+        headers=USER,
+    )
+    assert r.status_code == status
+    assert r.json()["error"]["message"].startswith(f"operation {index}:")
+    assert store.items("alice") == before
+
+
+def test_nfr06_batch_rejects_invalid_operations_before_applying():
+    r = client.post(
+        "/wishes/batch",
+        json={
+            "operations": [
+                {"op": "create", "wish": {"id": 1, "title": "ok"}},
+                {"op": "create", "wish": {"id": 2, "title": "X" * 51}},
+            ]
+        },
+        headers=USER,
+    )
+    assert r.status_code == 422
+    assert store.items("alice") == []
+    assert (
+        client.post("/wishes/batch", json={"operations": []}, headers=USER).status_code
+        == 422
+    )
+
+
 def test_nfr07_no_pii_in_logs_on_error(caplog):
     caplog.clear()
     _ = client.get("/wishes/777", headers=USER)
@@ -113,3 +189,33 @@ def test_nfr08_health_latency_under_threshold():
 
     avg_ms = statistics.mean(times)
     assert avg_ms <= 200.0, f"/health too slow on average: {avg_ms:.1f} ms"
+
+
+def test_listing_pages_with_cursor_and_limit():
+    for i in range(1, 8):
+        client.post(
+            "/wishes",
+            json={"id": i, "title": f"W{i}", "price_estimate": 8 - i},
+            headers=USER,
+        )
+
+    seen, cursor = [], None
+    while True:
+        params = {"order_by": "price", "limit": 3}
+        if cursor:
+            params["cursor"] = cursor
+        r = client.get("/wishes/sorted", params=params, headers=USER)
+        assert r.status_code == 200
+        assert len(r.json()) <= 3
+        seen.extend(w["id"] for w in r.json())
+        cursor = r.headers.get("X-Next-Cursor")
+        if cursor is None:
+            break
+    assert seen == [7, 6, 5, 4, 3, 2, 1]
+
+    r = client.get("/wishes", params={"limit": 2, "offset": 5}, headers=USER)
+    assert [w["id"] for w in r.json()] == [6, 7]
+    assert "X-Next-Cursor" not in r.headers
+
+    r = client.get("/wishes/export", params={"limit": 5}, headers=USER)
+    assert r.json()["count"] == 5 and r.json()["next_cursor"]
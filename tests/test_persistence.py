@@ -0,0 +1,205 @@
+import asyncio
+import struct
+import threading
+from decimal import Decimal
+
+import pytest
+from fastapi.testclient import TestClient
+
+from app.core import db_config
+from app.core.batch import Change
+from app.core.db import store
+from app.core.errors import AppValidationError
+from app.core.persistence import StorePersistence
+from app.core.secure_fs import resolve_inside
+from app.core.store import AsyncWishStore, WishStore
+from app.main import app
+
+USER = {"X-Auth-Token": "token123"}
+
+
+def _rec(wish_id, **extra):
+    return {"id": wish_id, "title": f"W{wish_id}", "owner": "alice", **extra}
+
+
+def _reopen(data_dir):
+    restored = WishStore()
+    p = StorePersistence(restored, data_dir)
+    p.open()
+    p.close()
+    return restored
+
+
+def test_snapshot_and_journal_restore_every_write_path(tmp_path):
+    s = WishStore()
+    p = StorePersistence(s, tmp_path)
+    p.open()
+    s.add("alice", _rec(1, price_estimate=Decimal("1.5"), category="книги"))
+    s.add("alice", _rec(2, notes="x"))
+    s.add("bob", {"id": 1, "title": "B", "owner": "bob"})
+    p.checkpoint()
+
+    # После снимка — только журнал
+    s.replace("alice", 2, _rec(3, link="https://example.com"))
+    s.remove("bob", 1)
+    s.add_many("carol", [{"id": i, "title": "C", "owner": "carol"} for i in range(3)])
+    s.apply(
+        "carol",
+        [Change("delete", 0), Change("update", 1, {"id": 5, "title": "moved"})],
+    )
+    p.close()
+
+    restored = _reopen(tmp_path)
+    for owner in ("alice", "bob", "carol"):
+        assert restored.items(owner) == s.items(owner)
+    assert restored.stats.by_category == {"книги": 1}
+    assert sorted(f.name for f in tmp_path.iterdir()) == [
+        "snapshot.bin",
+        "wal-00000001.log",
+        "wal-00000002.log",
+    ]
+
+
+def test_torn_journal_tail_is_ignored(tmp_path):
+    s = WishStore()
+    p = StorePersistence(s, tmp_path)
+    p.open()
+    s.add("alice", _rec(1))
+    p.close()
+    with open(tmp_path / "wal-00000000.log", "ab") as f:
+        f.write(b'["put","alice",[{"id":2')
+
+    assert [w["id"] for w in _reopen(tmp_path).items("alice")] == [1]
+
+
+def test_replace_with_new_id_is_one_journal_entry(tmp_path):
+    s = WishStore()
+    p = StorePersistence(s, tmp_path)
+    p.open()
+    s.add("alice", _rec(1))
+    s.replace("alice", 1, _rec(2))
+    p.close()
+    lines = (tmp_path / "wal-00000000.log").read_bytes().splitlines()
+    assert len(lines) == 2 and lines[1].startswith(b'["apply", "alice", [1],')
+
+    # Обрыв на этой строке не теряет запись: в журнале остаётся исходная
+    with open(tmp_path / "wal-00000000.log", "wb") as f:
+        f.write(lines[0] + b"\n" + lines[1][:-5])
+    assert [w["id"] for w in _reopen(tmp_path).items("alice")] == [1]
+
+
+def test_data_files_stay_inside_data_dir(tmp_path):
+    with pytest.raises(AppValidationError):
+        resolve_inside(tmp_path, "../snapshot.bin")
+    with pytest.raises(AppValidationError):
+        resolve_inside(tmp_path, ".")
+
+
+def test_app_restores_store_on_restart(tmp_path, monkeypatch):
+    monkeypatch.setattr(db_config, "STORE_DATA_DIR", str(tmp_path))
+    store.clear()
+    with TestClient(app) as client:
+        r = client.post("/wishes", json={"id": 7, "title": "Kept"}, headers=USER)
+        assert r.status_code == 200
+    # Остановка снимает снимок и отключает журнал
+    assert (tmp_path / "snapshot.bin").exists()
+    store.clear()
+
+    with TestClient(app) as client:
+        assert client.get("/wishes/7", headers=USER).json()["title"] == "Kept"
+    store.clear()
+
+
+def test_ids_are_bounded_to_the_snapshot_format(tmp_path):
+    store.clear()
+    with TestClient(app) as client:
+        r = client.post("/wishes", json={"id": 2**70, "title": "Huge"}, headers=USER)
+        assert r.status_code == 422
+        r = client.post("/wishes", json={"id": 2**63 - 1, "title": "Max"}, headers=USER)
+        assert r.status_code == 200
+    src = WishStore()
+    p = StorePersistence(src, tmp_path)
+    p.open()
+    src.add("alice", _rec(2**63 - 1))
+    p.checkpoint()
+    p.close()
+    assert _reopen(tmp_path).get("alice", 2**63 - 1)["title"] == f"W{2**63 - 1}"
+    store.clear()
+
+
+def test_background_snapshots_survive_failures(tmp_path, monkeypatch):
+    src = WishStore()
+    p = StorePersistence(src, tmp_path)
+    p.open()
+    calls = []
+    write = p.write
+
+    def flaky(seq, owners):
+        calls.append(seq)
+        if len(calls) == 1:
+            raise struct.error("boom")
+        write(seq, owners)
+
+    monkeypatch.setattr(p, "write", flaky)
+
+    async def run():
+        task = asyncio.create_task(p.run(0.01))
+        src.add("alice", _rec(1))
+        while p.snapshots == 0:
+            await asyncio.sleep(0.01)
+        task.cancel()
+
+    asyncio.run(asyncio.wait_for(run(), 5))
+    p.close()
+    assert (p.failures, p.snapshots) == (1, 1)
+    assert _reopen(tmp_path).get("alice", 1)["title"] == "W1"
+
+
+def test_journaled_writes_leave_the_event_loop(tmp_path):
+    s = WishStore()
+    p = StorePersistence(s, tmp_path)
+    p.open()
+    threads = []
+    put = p._wal.put
+
+    def tracking_put(owner, records):
+        threads.append(threading.get_ident())
+        put(owner, records)
+
+    p._wal.put = tracking_put
+    facade = AsyncWishStore(s)
+
+    async def run():
+        await facade.add("alice", _rec(1))
+        batch = facade.begin_import("alice")
+        await batch.write([_rec(2)])
+        await batch.commit()
+        return threading.get_ident()
+
+    loop_thread = asyncio.run(run())
+    p.close()
+    assert len(threads) == 2 and loop_thread not in threads
+    assert [w["id"] for w in _reopen(tmp_path).items("alice")] == [1, 2]
+
+
+def test_background_snapshot_captures_off_the_event_loop(tmp_path, monkeypatch):
+    s = WishStore()
+    p = StorePersistence(s, tmp_path)
+    p.open()
+    s.add("alice", _rec(1))
+    threads = []
+    snapshot = s.snapshot
+
+    def tracking_snapshot():
+        threads.append(threading.get_ident())
+        return snapshot()
+
+    monkeypatch.setattr(s, "snapshot", tracking_snapshot)
+
+    async def run():
+        await p.acheckpoint()
+        return threading.get_ident()
+
+    loop_thread = asyncio.run(run())
+    p.close()
+    assert p.snapshots == 1 and threads and loop_thread not in threads
@@ -0,0 +1,178 @@
+from decimal import Decimal
+
+import pytest
+from fastapi.testclient import TestClient
+
+from app.core.db import store
+from app.core.pagination import encode_cursor
+from app.core.query import WishQuery
+from app.core.store import WishStore
+from app.main import app
+
+client = TestClient(app)
+
+USER = {"X-Auth-Token": "token123"}
+
+
+@pytest.fixture(autouse=True)
+def clear_db():
+    store.clear()
+
+
+def _wish(i):
+    return {
+        "id": i,
+        "title": f"Book {i:03d}" if i % 10 == 0 else f"Wish {i:03d}",
+        "link": f"https://example.com/{i}" if i % 2 else None,
+        "price_estimate": Decimal(i) if i % 7 else None,
+        "category": "rare" if i in (3, 50) else f"cat{i % 4}",
+        "owner": "alice",
+    }
+
+
+@pytest.fixture
+def wishes():
+    s = WishStore()
+    s.extend("alice", [_wish(i) for i in range(1, 201)])
+    return s
+
+
+def _expected(q):
+    found = []
+    for i in range(1, 201):
+        w = _wish(i)
+        price = w["price_estimate"]
+        if q.categories and w["category"] not in q.categories:
+            continue
+        if q.above is not None and (price is None or price <= q.above):
+            continue
+        if q.below is not None and (price is None or price >= q.below):
+            continue
+        if q.title_prefix is not None and not w["title"].startswith(q.title_prefix):
+            continue
+        if q.has_link is not None and (w["link"] is not None) != q.has_link:
+            continue
+        found.append(w)
+    if q.order_by == "price_estimate":
+        found.sort(key=lambda w: (w["price_estimate"] or 0, w["id"]))
+    else:
+        found.sort(key=lambda w: (w[q.order_by], w["id"]))
+    if not q.ascending:
+        found.reverse()
+    return [w["id"] for w in found]
+
+
+QUERIES = [
+    # Редкая категория селективнее ценового диапазона и префикса
+    (
+        WishQuery(categories=("rare",), above=Decimal(1)),
+        "category",
+        ("price_estimate",),
+    ),
+    # Узкий диапазон цен отбирает меньше, чем категория на четверть записей
+    (
+        WishQuery(categories=("cat1", "cat2"), above=Decimal(190), has_link=True),
+        "price_estimate",
+        ("category", "link"),
+    ),
+    (WishQuery(title_prefix="Book 1", has_link=False), "title", ("link",)),
+    # Неиндексируемое условие — обход в порядке выдачи
+    (WishQuery(has_link=True, order_by="title"), "title", ("link",)),
+    (WishQuery(has_link=True), "id", ("link",)),
+]
+
+
+@pytest.mark.parametrize("q, driver, residual", QUERIES)
+def test_planner_picks_most_selective_index(wishes, q, driver, residual):
+    plan = wishes.explain("alice", q)
+    assert (plan.driver, plan.residual) == (driver, residual)
+    assert [w["id"] for w in wishes.query("alice", q).items] == _expected(q)
+
+
+def test_planner_estimates_are_exact_and_prefer_sort_order_on_ties(wishes):
+    plan = wishes.explain("alice", WishQuery(categories=("rare", "nope")))
+    assert (plan.driver, plan.estimate, plan.ordered) == ("category", 2, True)
+    plan = wishes.explain("alice", WishQuery(above=Decimal(190), order_by="title"))
+    assert (plan.driver, plan.estimate, plan.ordered) == ("price_estimate", 9, False)
+    # Ни одна запись не проходит по индексу — кандидатов нет вовсе
+    plan = wishes.explain("alice", WishQuery(title_prefix="Zzz", has_link=True))
+    assert (plan.driver, plan.estimate) == ("title", 0)
+    # Полный обход: все индексы дают 200 кандидатов, выигрывает порядок выдачи
+    for order_by in ("price_estimate", "title"):
+        plan = wishes.explain("alice", WishQuery(order_by=order_by))
+        assert (plan.driver, plan.estimate, plan.ordered) == (order_by, 200, True)
+
+
+@pytest.mark.parametrize("order_by", ["id", "price_estimate", "title"])
+@pytest.mark.parametrize("ascending", [True, False])
+def test_query_pages_with_cursor_in_any_order(wishes, order_by, ascending):
+    q = WishQuery(
+        categories=("cat1", "rare"), below=Decimal(150), order_by=order_by
+    )._replace(ascending=ascending)
+    ids, after = [], None
+    while True:
+        page = wishes.query("alice", q, after=after, limit=7)
+        ids.extend(w["id"] for w in page.items)
+        if page.next_key is None:
+            break
+        after = page.next_key
+    assert ids == _expected(q)
+
+
+def _ids(r):
+    assert r.status_code == 200
+    return [w["id"] for w in r.json()]
+
+
+def test_query_endpoint_combines_predicates():
+    for i in range(1, 41):
+        wish = {k: v for k, v in _wish(i).items() if k != "owner"}
+        r = client.post(
+            "/wishes", json={**wish, "price_estimate": str(i)}, headers=USER
+        )
+        assert r.status_code == 200
+    params = {
+        "category": ["cat0", "cat2"],
+        "price_gt": "10",
+        "has_link": "false",
+        "order_by": "price",
+        "ascending": "false",
+        "limit": 3,
+    }
+    r = client.get("/wishes/query", params=params, headers=USER)
+    assert _ids(r) == [40, 38, 36]
+    r = client.get(
+        "/wishes/query",
+        params={**params, "cursor": r.headers["X-Next-Cursor"]},
+        headers=USER,
+    )
+    assert _ids(r) == [34, 32, 30]
+    r = client.get("/wishes/query", params={"title_prefix": "Book"}, headers=USER)
+    assert _ids(r) == [10, 20, 30, 40]
+
+
+@pytest.mark.parametrize(
+    "params",
+    [{"order_by": "notes"}, {"title_prefix": ""}, {"category": ["x"] * 21}],
+)
+def test_query_endpoint_rejects_invalid_params(params):
+    r = client.get("/wishes/query", params=params, headers=USER)
+    assert r.status_code == 422
+
+
+def test_huge_price_bounds_and_cursors_do_not_overflow():
+    for i in (1, 2):
+        body = {"id": i, "title": f"W{i}", "price_estimate": str(i)}
+        assert client.post("/wishes", json=body, headers=USER).status_code == 200
+    r = client.get("/wishes/price/less", params={"price": "1e999999"}, headers=USER)
+    assert _ids(r) == [1, 2]
+    r = client.get("/wishes/price/greater", params={"price": "-1e999999"}, headers=USER)
+    assert _ids(r) == [1, 2]
+    r = client.get("/wishes/query", params={"price_lt": "1e999999"}, headers=USER)
+    assert _ids(r) == [1, 2]
+    r = client.get("/wishes/query", params={"price_gt": "1e999999"}, headers=USER)
+    assert _ids(r) == []
+    cursor = encode_cursor("price_estimate", (Decimal("1e999999"), 1))
+    params = {"order_by": "price", "cursor": cursor}
+    assert _ids(client.get("/wishes/sorted", params=params, headers=USER)) == []
+    assert _ids(client.get("/wishes/query", params=params, headers=USER)) == []
@@ -0,0 +1,118 @@
+import threading
+
+import pytest
+from fastapi.testclient import TestClient
+
+from app.core import ratelimit
+from app.core.db import store
+from app.core.ratelimit import (
+    Budget,
+    ConcurrencyLimit,
+    LocalKeyValue,
+    MemoryBuckets,
+    RateLimiter,
+    SharedBuckets,
+)
+from app.main import app
+
+client = TestClient(app)
+
+USER = {"X-Auth-Token": "token123"}
+OTHER = {"X-Auth-Token": "token456"}
+
+
+@pytest.fixture(autouse=True)
+def clear_db():
+    store.clear()
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_token_bucket_allows_burst_then_refills():
+    clock = FakeClock()
+    limiter = RateLimiter(MemoryBuckets(), clock=clock)
+    budget = Budget("test", rate=2, burst=3)
+    for _ in range(3):
+        limiter.check("alice", budget)
+    with pytest.raises(ratelimit.RateLimitedError) as exc:
+        limiter.check("alice", budget)
+    assert exc.value.status == 429 and exc.value.headers == {"Retry-After": "1"}
+    # Другой пользователь и другой бюджет — свои вёдра
+    limiter.check("bob", budget)
+    limiter.check("alice", budget._replace(name="other"))
+    clock.now += 0.5
+    limiter.check("alice", budget)
+    assert limiter.stats() == {"test": 1}
+
+
+def test_shared_backend_enforces_one_budget_across_workers():
+    kv = LocalKeyValue()
+    workers = [RateLimiter(SharedBuckets(kv)) for _ in range(4)]
+    budget = Budget("shared", rate=0.001, burst=10)
+    admitted = []
+
+    def hit(limiter):
+        for _ in range(10):
+            try:
+                limiter.check("alice", budget)
+                admitted.append(1)
+            except ratelimit.RateLimitedError:
+                pass
+
+    threads = [threading.Thread(target=hit, args=(w,)) for w in workers]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert len(admitted) == 10
+
+
+def test_api_returns_429_in_error_format_with_retry_after(monkeypatch):
+    monkeypatch.setattr(ratelimit, "DEFAULT", Budget("default", rate=0.01, burst=2))
+    assert client.get("/wishes", headers=USER).status_code == 200
+    assert client.get("/wishes", headers=USER).status_code == 200
+    r = client.get("/wishes", headers=USER)
+    assert r.status_code == 429
+    assert r.json() == {
+        "error": {"code": "rate_limited", "message": "too many requests"}
+    }
+    assert r.headers["Retry-After"] == "100"
+    r = client.get("/wishes", headers={**USER, "Accept": "application/problem+json"})
+    assert (r.status_code, r.json()["title"]) == (429, "rate_limited")
+    assert "Retry-After" in r.headers
+    # Бюджет — на пользователя; без токена по-прежнему 401, а не 429
+    assert client.get("/wishes", headers=OTHER).status_code == 200
+    assert client.get("/wishes").status_code == 401
+
+
+def test_bulk_operations_have_their_own_budget(monkeypatch):
+    monkeypatch.setattr(ratelimit, "BULK", Budget("bulk", rate=0.01, burst=2))
+    for _ in range(2):
+        assert client.get("/wishes/export", headers=USER).status_code == 200
+    r = client.post("/wishes/import", json={"backup": []}, headers=USER)
+    assert r.status_code == 429
+    assert client.get("/wishes", headers=USER).status_code == 200
+    assert client.get("/wishes/export", headers=OTHER).status_code == 200
+
+
+def test_bulk_concurrency_cap_rejects_and_streaming_releases_slot(monkeypatch):
+    slots = ConcurrencyLimit(1)
+    monkeypatch.setattr(ratelimit, "bulk_slots", slots)
+    held = slots.acquire("alice")
+    r = client.post("/wishes/import", json={"backup": []}, headers=USER)
+    assert r.status_code == 429
+    assert r.json()["error"]["message"] == "too many concurrent bulk operations"
+    assert client.get("/wishes/export", headers=OTHER).status_code == 200
+    held.release()
+
+    body = {"backup": [{"id": i, "title": f"W{i}"} for i in range(1, 4)]}
+    assert client.post("/wishes/import", json=body, headers=USER).status_code == 200
+    r = client.get("/wishes/export", params={"format": "ndjson"}, headers=USER)
+    assert len(r.text.splitlines()) == 3
+    assert slots.active("alice") == 0
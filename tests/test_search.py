@@ -0,0 +1,58 @@
+import pytest
+from fastapi.testclient import TestClient
+
+from app.core.db import store
+from app.main import app
+
+client = TestClient(app)
+
+USER = {"X-Auth-Token": "token123"}
+OTHER = {"X-Auth-Token": "token456"}
+
+
+@pytest.fixture(autouse=True)
+def clear_db():
+    store.clear()
+
+
+def _seed():
+    wishes = [
+        {"id": 1, "title": "Книга по Python", "category": "Books"},
+        {"id": 2, "title": "Наушники", "notes": "для книг и python-подкастов"},
+        {"id": 3, "title": "Python mug", "category": "kitchen"},
+    ]
+    for wish in wishes:
+        assert client.post("/wishes", json=wish, headers=USER).status_code == 200
+
+
+def _ids(r):
+    assert r.status_code == 200
+    return [w["id"] for w in r.json()]
+
+
+def test_search_ranks_title_matches_and_completes_last_word():
+    _seed()
+    assert _ids(client.get("/wishes/search?q=PYTHON", headers=USER)) == [1, 3, 2]
+    assert _ids(client.get("/wishes/search?q=python кни", headers=USER)) == [1, 2]
+    assert _ids(client.get("/wishes/search?q=py&category=books", headers=USER)) == [1]
+    assert _ids(client.get("/wishes/search?q=python", headers=OTHER)) == []
+
+
+def test_search_pages_with_cursor_and_follows_updates():
+    _seed()
+    r = client.get("/wishes/search", params={"q": "python", "limit": 2}, headers=USER)
+    assert _ids(r) == [1, 3]
+    cursor = r.headers["X-Next-Cursor"]
+    r = client.get(
+        "/wishes/search", params={"q": "python", "cursor": cursor}, headers=USER
+    )
+    assert _ids(r) == [2]
+
+    client.delete("/wishes/1", headers=USER)
+    assert _ids(client.get("/wishes/search?q=python", headers=USER)) == [3, 2]
+
+
+@pytest.mark.parametrize("q", ["", "!!!", "x" * 201])
+def test_search_rejects_empty_or_long_queries(q):
+    r = client.get("/wishes/search", params={"q": q}, headers=USER)
+    assert r.status_code == 422
@@ -1,11 +1,16 @@
 from __future__ import annotations
 
+import asyncio
 import json
+import time
+from decimal import Decimal
 
+import pytest
 from fastapi.testclient import TestClient
 
-from app.core.db import _DB
-from app.core.secrets import SecretsProvider
+from app.core.db import store
+from app.core.jsonsec import JsonTooLargeError, iter_json_array, iter_ndjson
+from app.core.secrets import FileTokenSource, LocalVaultTokenSource, SecretsProvider
 from app.main import app
 
 client = TestClient(app)
@@ -13,7 +18,7 @@ USER = {"X-Auth-Token": "token123"}
 
 
 def setup_function(_):
-    _DB["wishes"].clear()
+    store.clear()
 
 
 def test_import_too_large_returns_413():
@@ -76,6 +81,70 @@ def test_secrets_provider_from_env_json(monkeypatch):
     assert sp.get_token_map() == mp
 
 
+class _Clock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def _wait_for(predicate):
+    for _ in range(200):
+        if predicate():
+            return True
+        time.sleep(0.005)
+    return False
+
+
+def test_secrets_provider_reloads_file_after_ttl(tmp_path):
+    path = tmp_path / "tokens.json"
+    path.write_text('{"t1": "u1"}')
+    clock = _Clock()
+    sp = SecretsProvider(source=FileTokenSource(path), ttl=10, clock=clock)
+    assert sp.lookup("t1") == "u1"
+
+    path.write_text('{"t2": "u2"}')
+    clock.now = 5
+    assert sp.lookup("t1") == "u1"  # карта ещё свежая
+
+    clock.now = 11
+    sp.get_token_map()  # старая карта отдаётся сразу, обновление — в фоне
+    assert _wait_for(lambda: sp.get_token_map() == {"t2": "u2"})
+    assert sp.lookup("t1") is None
+
+
+def test_secrets_provider_keeps_map_when_source_breaks(tmp_path):
+    path = tmp_path / "vault.json"
+    path.write_text(json.dumps({"data": {"data": {"t1": "u1"}}}))
+    sp = SecretsProvider(source=LocalVaultTokenSource(path), ttl=0)
+    assert sp.lookup("t1") == "u1"
+    path.write_text("not json")
+    sp.refresh()
+    assert sp.lookup("t1") == "u1"
+
+
+def test_secrets_provider_negative_cache_limits_source_calls():
+    class Source:
+        calls = 0
+
+        def load(self):
+            Source.calls += 1
+            return {"t1": "u1"}
+
+    clock = _Clock()
+    sp = SecretsProvider(source=Source(), ttl=60, negative_ttl=5, clock=clock)
+    assert sp.lookup("t1") == "u1"
+    clock.now = 10
+    assert sp.lookup("bogus") is None  # первый промах — внеочередное обновление
+    assert _wait_for(lambda: Source.calls == 2)
+    for _ in range(100):
+        assert sp.lookup("bogus") is None
+        assert sp.lookup("other") is None
+    time.sleep(0.02)
+    assert Source.calls == 2
+
+
 def test_wish_rejects_extra_fields():
     payload = {"id": 1, "title": "Book", "price_estimate": 10.00, "extra": "oops"}
     r = client.post("/wishes", json=payload, headers=USER)
@@ -124,7 +193,7 @@ def test_import_atomic_validation_and_schema_enforced():
     bad_backup = [{"id": 1, "title": "OK"}, {"id": 2, "no_title": "bad"}]
     r = client.post("/wishes/import", json={"backup": bad_backup}, headers=USER)
     assert r.status_code in (422, 400)
-    assert _DB["wishes"] == []
+    assert len(store) == 0
 
 
 def test_import_body_size_limit_enforced():
@@ -149,3 +218,176 @@ def test_import_decimal_precision_preserved():
     listed = client.get("/wishes", headers=USER).json()
     assert listed[0]["price_estimate"] in ("0.10", "0.1")
     assert listed[1]["price_estimate"] in ("0.20", "0.2")
+
+
+def test_import_rejects_duplicate_ids_atomically():
+    r = client.post(
+        "/wishes/import",
+        json={"backup": [{"id": 1, "title": "A"}, {"id": 1, "title": "B"}]},
+        headers=USER,
+    )
+    assert r.status_code == 422
+    assert len(store) == 0
+
+    client.post("/wishes", json={"id": 7, "title": "Existing"}, headers=USER)
+    r = client.post(
+        "/wishes/import",
+        json={"backup": [{"id": 6, "title": "New"}, {"id": 7, "title": "Clash"}]},
+        headers=USER,
+    )
+    assert r.status_code == 422
+    assert [w["title"] for w in store.items("alice")] == ["Existing"]
+
+
+async def _chunks(raw: bytes, size: int, consumed: list[int] | None = None):
+    for i in range(0, len(raw), size):
+        if consumed is not None:
+            consumed.append(i)
+        yield raw[i : i + size]
+
+
+def _collect(raw: bytes, size: int = 7, **kwargs):
+    async def run():
+        return [
+            x async for x in iter_json_array(_chunks(raw, size), "backup", **kwargs)
+        ]
+
+    return asyncio.run(run())
+
+
+def test_stream_parser_handles_chunk_boundaries():
+    doc = {
+        "meta": {"v": [1, 2]},
+        "backup": [{"id": 12345, "title": "Ёлка", "price_estimate": 0.10}, {"id": 2}],
+        "count": 1234567,
+    }
+    raw = json.dumps(doc, ensure_ascii=False).encode("utf-8")
+    for size in (1, 3, 7, 64):
+        items = _collect(raw, size)
+        assert items == [
+            {"id": 12345, "title": "Ёлка", "price_estimate": "0.1"},
+            {"id": 2},
+        ]
+    assert _collect(b'{"other": 1}') == []
+
+
+def test_stream_parser_rejects_malformed_documents():
+    for raw in (b"[]", b'{"backup": {}}', b'{"backup": [1] } x', b'{"backup": [1,'):
+        with pytest.raises(ValueError):
+            _collect(raw)
+    with pytest.raises(ValueError):
+        _collect(b'{"backup": [], "backup": []}')
+
+
+def test_stream_parser_fails_early_on_size_limit():
+    consumed: list[int] = []
+    raw = json.dumps({"backup": [{"id": i} for i in range(10_000)]}).encode()
+
+    async def run():
+        stream = _chunks(raw, 1000, consumed)
+        return [x async for x in iter_json_array(stream, "backup", max_bytes=5000)]
+
+    with pytest.raises(JsonTooLargeError):
+        asyncio.run(run())
+    assert len(consumed) <= 6
+
+
+def _parse_seconds(raw: bytes, parse, *args) -> float:
+    async def run():
+        stream = _chunks(raw, 16)
+        async for _ in parse(stream, *args, max_bytes=len(raw)):
+            pass
+
+    best = float("inf")
+    for _ in range(3):
+        t0 = time.perf_counter()
+        asyncio.run(run())
+        best = min(best, time.perf_counter() - t0)
+    return best
+
+
+def test_stream_parsers_are_linear_in_small_chunks():
+    # Значение в 8 раз больше: линейный разбор — ~8x, квадратичный — ~64x
+    def doc(n):
+        return json.dumps({"note": "x" * n, "backup": [{"t": "y" * n}]}).encode()
+
+    def lines(n):
+        return b"\n".join([json.dumps({"t": "y" * n}).encode()] * 4)
+
+    for make, parse, args in (
+        (doc, iter_json_array, ("backup",)),
+        (lines, iter_ndjson, ()),
+    ):
+        small = _parse_seconds(make(25_000), parse, *args)
+        large = _parse_seconds(make(200_000), parse, *args)
+        assert large < small * 24
+
+
+def test_stream_parsers_cap_only_import_entries():
+    big = "x" * 300_000
+
+    async def run(raw, parse, *args):
+        stream = _chunks(raw, 1000)
+        return [x async for x in parse(stream, *args, max_bytes=10**7, max_item=1000)]
+
+    raw = json.dumps({"backup": [big]}).encode()
+    with pytest.raises(JsonTooLargeError):
+        asyncio.run(run(raw, iter_json_array, "backup"))
+    with pytest.raises(JsonTooLargeError):
+        asyncio.run(run(json.dumps(big).encode(), iter_ndjson))
+    # Прочие ключи документа ограничены только размером тела
+    raw = json.dumps({"skipped": [big], "backup": [1]}).encode()
+    assert asyncio.run(run(raw, iter_json_array, "backup")) == [1]
+
+
+def test_import_limits_entries_by_wish_schema():
+    # Самая длинная допустимая запись: поля до max_length, символы вне BMP
+    widest = "\U0001f381"
+    entry = {
+        "id": 1,
+        "title": widest * 50,
+        "link": widest * 200,
+        "notes": widest * 500,
+        "category": widest * 30,
+        "price_estimate": "9999999999.99",
+    }
+    body = json.dumps({"meta": "m" * 500_000, "backup": [entry]}, indent=2)
+    r = client.post(
+        "/wishes/import",
+        content=body.encode(),
+        headers={"Content-Type": "application/json", **USER},
+    )
+    assert r.status_code == 200 and r.json()["count"] == 1
+
+    entry = {"id": 2, "title": "t", "notes": " " * 100_000}
+    r = client.post("/wishes/import", json={"backup": [entry]}, headers=USER)
+    assert r.status_code == 413
+
+
+def test_streamed_exports_round_trip_through_import():
+    backup = [
+        {"id": i, "title": f"W{i}", "price_estimate": "0.10"} for i in range(1200)
+    ]
+    client.post("/wishes/import", json={"backup": backup}, headers=USER)
+    other = {"X-Auth-Token": "token456"}
+
+    r = client.get("/wishes/export", params={"format": "ndjson"}, headers=USER)
+    assert r.status_code == 200
+    assert r.headers["content-type"].startswith("application/x-ndjson")
+    lines = r.text.splitlines()
+    assert len(lines) == 1200 and json.loads(lines[0])["price_estimate"] == "0.10"
+
+    r2 = client.post(
+        "/wishes/import",
+        content=r.content,
+        headers={"Content-Type": "application/x-ndjson", **other},
+    )
+    assert r2.status_code == 200 and r2.json()["count"] == 1200
+
+    r = client.get("/wishes/export", params={"format": "json-stream"}, headers=USER)
+    doc = r.json()
+    assert doc["count"] == 1200 and len(doc["backup"]) == 1200
+    store.clear()
+    r3 = client.post("/wishes/import", content=r.content, headers=USER)
+    assert r3.status_code == 200 and r3.json()["count"] == 1200
+    assert store.get("alice", 5)["price_estimate"] == Decimal("0.10")
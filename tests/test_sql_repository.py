@@ -0,0 +1,401 @@
+import asyncio
+import json
+import os
+import subprocess
+import sys
+import tempfile
+from decimal import Decimal
+
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine, delete, event
+from sqlalchemy.dialects import postgresql
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+from sqlalchemy.pool import NullPool
+from sqlalchemy.schema import CreateTable
+
+from app.core.db import store
+from app.core.db_base import Base
+from app.core.db_session import make_engine, pool_stats
+from app.core.repository import get_repository
+from app.core.sql_store import AsyncSqlWishRepository
+from app.db_models.wish import WishORM
+from app.main import app
+
+# TestClient может крутить каждый запрос в своём цикле событий, поэтому —
+# файловая БД и NullPool: соединение не переживает цикл, в котором открыто
+_DB_DIR = tempfile.mkdtemp()
+_URL = f"sqlite:///{os.path.join(_DB_DIR, 'wishes.db')}"
+engine = create_engine(_URL)
+Base.metadata.create_all(engine)
+async_engine = create_async_engine(
+    _URL.replace("sqlite", "sqlite+aiosqlite", 1), poolclass=NullPool
+)
+AsyncSession = async_sessionmaker(async_engine, expire_on_commit=False)
+
+client = TestClient(app)
+USER = {"X-Auth-Token": "token123"}
+OTHER = {"X-Auth-Token": "token456"}
+
+
+opened_sessions = []
+
+
+def _open_session():
+    opened_sessions.append(1)
+    return AsyncSession()
+
+
+async def _sql_repository():
+    repo = AsyncSqlWishRepository(sessions=_open_session)
+    try:
+        yield repo
+    finally:
+        await repo.close()
+
+
+@pytest.fixture(autouse=True)
+def sql_backend():
+    app.dependency_overrides[get_repository] = _sql_repository
+    yield
+    app.dependency_overrides.pop(get_repository, None)
+    with engine.begin() as conn:
+        conn.execute(delete(WishORM))
+
+
+def _seed():
+    for i, (title, price, cat) in enumerate(
+        [("b", "5.00", "books"), ("a", None, None), ("c", "1.50", "books")], start=1
+    ):
+        r = client.post(
+            "/wishes",
+            json={"id": i, "title": title, "price_estimate": price, "category": cat},
+            headers=USER,
+        )
+        assert r.status_code == 200
+
+
+def test_crud_roundtrip_and_owner_isolation():
+    _seed()
+    assert client.get("/wishes/1", headers=USER).json()["title"] == "b"
+    assert client.get("/wishes/1", headers=OTHER).status_code == 404
+    assert (
+        client.post("/wishes", json={"id": 1, "title": "x"}, headers=USER).status_code
+        == 422
+    )
+
+    r = client.put("/wishes/1", json={"id": 3, "title": "dup"}, headers=USER)
+    assert r.status_code == 422
+    r = client.put("/wishes/1", json={"id": 10, "title": "moved"}, headers=USER)
+    assert r.status_code == 200
+    assert client.get("/wishes/10", headers=USER).json()["title"] == "moved"
+
+    assert client.delete("/wishes/10", headers=USER).status_code == 200
+    assert client.delete("/wishes/10", headers=USER).status_code == 404
+
+
+@pytest.mark.parametrize("wish_id", [2**31, 2**63 - 1])
+def test_ids_beyond_int32_are_stored(wish_id):
+    # В PostgreSQL колонка id — BIGINT: id за пределами INT4 не дают 500
+    ddl = str(CreateTable(WishORM.__table__).compile(dialect=postgresql.dialect()))
+    assert "id BIGINT NOT NULL" in ddl
+    r = client.post("/wishes", json={"id": wish_id, "title": "big"}, headers=USER)
+    assert r.status_code == 200
+    assert client.get(f"/wishes/{wish_id}", headers=USER).json()["id"] == wish_id
+    r = client.post("/wishes", json={"id": 2**63, "title": "x"}, headers=USER)
+    assert r.status_code == 422
+
+
+def test_sorted_filters_and_pages_match_memory_semantics():
+    _seed()
+    r = client.get("/wishes/sorted", params={"order_by": "price"}, headers=USER)
+    assert [w["id"] for w in r.json()] == [2, 3, 1]
+
+    r = client.get("/wishes/price/less", params={"price": "5.00"}, headers=USER)
+    assert [w["id"] for w in r.json()] == [3]
+    r = client.get("/wishes/category/books", headers=USER)
+    assert [w["id"] for w in r.json()] == [1, 3]
+
+    r = client.get(
+        "/wishes/sorted", params={"order_by": "title", "limit": 2}, headers=USER
+    )
+    assert [w["title"] for w in r.json()] == ["a", "b"]
+    cursor = r.headers["X-Next-Cursor"]
+    r = client.get(
+        "/wishes/sorted",
+        params={"order_by": "title", "limit": 2, "cursor": cursor},
+        headers=USER,
+    )
+    assert [w["title"] for w in r.json()] == ["c"]
+    assert "X-Next-Cursor" not in r.headers
+
+
+def test_import_then_export():
+    backup = [{"id": i, "title": f"W{i}", "price_estimate": "0.10"} for i in range(50)]
+    r = client.post("/wishes/import", json={"backup": backup}, headers=USER)
+    assert r.status_code == 200
+
+    exported = client.get("/wishes/export", headers=USER).json()
+    assert exported["count"] == 50
+    assert client.get("/wishes/0", headers=USER).json()["price_estimate"] == "0.10"
+
+
+def test_import_conflict_with_existing_id_writes_nothing():
+    _seed()
+    backup = [{"id": 100, "title": "new"}, {"id": 2, "title": "clash"}]
+    r = client.post("/wishes/import", json={"backup": backup}, headers=USER)
+    assert r.status_code == 422
+    assert client.get("/wishes/100", headers=USER).status_code == 404
+    assert client.get("/wishes/2", headers=USER).json()["title"] == "a"
+
+
+def test_batch_is_atomic_in_database():
+    _seed()
+    ops = [
+        {"op": "update", "id": 1, "wish": {"id": 1, "title": "b2"}},
+        {"op": "delete", "id": 2},
+        {"op": "create", "wish": {"id": 3, "title": "clash"}},
+    ]
+    r = client.post("/wishes/batch", json={"operations": ops}, headers=USER)
+    assert r.status_code == 422
+    assert client.get("/wishes/1", headers=USER).json()["title"] == "b"
+    assert client.get("/wishes/2", headers=USER).status_code == 200
+
+    ops[2] = {"op": "create", "wish": {"id": 2, "title": "a2"}}
+    r = client.post("/wishes/batch", json={"operations": ops}, headers=USER)
+    assert r.status_code == 200
+    titles = {w["id"]: w["title"] for w in client.get("/wishes", headers=USER).json()}
+    assert titles == {1: "b2", 2: "a2", 3: "c"}
+
+
+def test_search_ranks_like_memory_backend():
+    _seed()
+    client.post(
+        "/wishes",
+        json={"id": 4, "title": "Ёлка", "notes": "b-side", "category": "Books"},
+        headers=USER,
+    )
+    r = client.get("/wishes/search", params={"q": "b"}, headers=USER)
+    assert [w["id"] for w in r.json()] == [1, 3, 4]
+    r = client.get(
+        "/wishes/search", params={"q": "ёл", "category": "BOOKS"}, headers=USER
+    )
+    assert [w["id"] for w in r.json()] == [4]
+
+
+def test_search_folds_case_like_memory_backend():
+    wishes = [
+        {"id": 1, "title": "Straße", "category": "Straße"},
+        {"id": 2, "title": "\u212aettle", "notes": "ÉCLAIR"},
+        {"id": 3, "title": "strass"},
+        {"id": 4, "title": "snake_case"},
+    ]
+    queries = [
+        {"q": "strasse"},
+        {"q": "stras"},
+        {"q": "STRASS"},
+        {"q": "straße", "category": "STRASSE"},
+        {"q": "kettle éclair"},
+        {"q": "snake_c"},
+        {"q": "nake"},
+    ]
+
+    def run():
+        for wish in wishes:
+            client.post("/wishes", json=wish, headers=USER)
+        return [
+            [
+                w["id"]
+                for w in client.get("/wishes/search", params=q, headers=USER).json()
+            ]
+            for q in queries
+        ]
+
+    sql = run()
+    app.dependency_overrides.pop(get_repository)
+    try:
+        store.clear()
+        memory = run()
+    finally:
+        store.clear()
+        app.dependency_overrides[get_repository] = _sql_repository
+    assert sql == memory
+    assert sql == [[1], [1, 3], [1, 3], [1], [2], [4], []]
+
+
+def test_ndjson_export_streams_from_database():
+    _seed()
+    r = client.get("/wishes/export", params={"format": "ndjson"}, headers=USER)
+    assert [json.loads(line)["id"] for line in r.text.splitlines()] == [1, 2, 3]
+
+
+def test_rejected_request_does_not_open_a_session():
+    opened_sessions.clear()
+    assert client.get("/wishes", headers={"X-Auth-Token": "nope"}).status_code == 401
+    assert client.get("/health").status_code == 200
+    assert opened_sessions == []
+    client.get("/wishes", headers=USER)
+    assert opened_sessions == [1]
+
+
+def test_file_engine_uses_wal_and_reports_pool():
+    tuned = make_engine(f"sqlite:///{os.path.join(_DB_DIR, 'pragmas.db')}")
+    with tuned.connect() as conn:
+        assert conn.exec_driver_sql("PRAGMA journal_mode").scalar() == "wal"
+        assert conn.exec_driver_sql("PRAGMA busy_timeout").scalar() == 5000
+        stats = pool_stats(tuned)
+        assert stats["checked_out"] == 1
+    assert pool_stats(tuned)["checked_in"] == 1
+    tuned.dispose()
+
+
+def _query_plans(calls, method="page"):
+    statements = []
+
+    def capture(conn, cursor, statement, params, context, executemany):
+        statements.append((statement, params))
+
+    async def run():
+        repo = AsyncSqlWishRepository(sessions=AsyncSession)
+        try:
+            for args, kwargs in calls:
+                await getattr(repo, method)("alice", *args, **kwargs)
+        finally:
+            await repo.close()
+
+    event.listen(async_engine.sync_engine, "before_cursor_execute", capture)
+    try:
+        asyncio.run(run())
+    finally:
+        event.remove(async_engine.sync_engine, "before_cursor_execute", capture)
+    with engine.connect() as conn:
+        return [
+            " ".join(
+                row[3]
+                for row in conn.exec_driver_sql(f"EXPLAIN QUERY PLAN {sql}", params)
+            )
+            for sql, params in statements
+        ]
+
+
+@pytest.mark.parametrize(
+    "calls, index",
+    [
+        ([(("price_estimate",), {"limit": 10})], "ix_wishes_owner_price"),
+        (
+            [(("price_estimate",), {"after": (Decimal("5"), 3), "ascending": False})],
+            "ix_wishes_owner_price",
+        ),
+        (
+            [(("price_estimate",), {"below": Decimal("5"), "limit": 10})],
+            "ix_wishes_owner_price",
+        ),
+        ([(("price_estimate",), {"above": Decimal("5")})], "ix_wishes_owner_price"),
+        ([(("title",), {"after": ("m", 3), "limit": 10})], "ix_wishes_owner_title"),
+        (
+            [((), {"category": "books", "after": (3, 3), "limit": 10})],
+            "ix_wishes_owner_category",
+        ),
+    ],
+)
+def test_page_queries_are_served_by_indexes(calls, index):
+    plans = _query_plans(calls)
+    assert plans
+    for plan in plans:
+        # Поиск по составному индексу, без полного прохода и сортировки в temp b-tree
+        assert f"SEARCH wishes USING INDEX {index}" in plan, plan
+        assert "TEMP B-TREE" not in plan, plan
+
+
+def test_price_order_treats_unpriced_as_free_across_pages():
+    for i, price in enumerate(["0.00", None, "2.00", None, "1.00"], start=1):
+        client.post(
+            "/wishes",
+            json={"id": i, "title": "t", "price_estimate": price},
+            headers=USER,
+        )
+    seen, cursor = [], None
+    while True:
+        params = {"order_by": "price", "limit": 2}
+        if cursor:
+            params["cursor"] = cursor
+        r = client.get("/wishes/sorted", params=params, headers=USER)
+        seen += [w["id"] for w in r.json()]
+        cursor = r.headers.get("X-Next-Cursor")
+        if cursor is None:
+            break
+    assert seen == [1, 2, 4, 5, 3]
+
+
+def test_query_combines_predicates_like_memory_backend():
+    for i, (title, price, category, link) in enumerate(
+        [
+            ("Book a", "5", "Books", None),
+            ("Book b", None, "Books", "https://example.com/b"),
+            ("Bookmark", "15", "Office", None),
+            ("Pen", "25", "Office", None),
+            ("Book c", "30", "Books", None),
+        ],
+        start=1,
+    ):
+        wish = {
+            "id": i,
+            "title": title,
+            "price_estimate": price,
+            "category": category,
+            "link": link,
+        }
+        assert client.post("/wishes", json=wish, headers=USER).status_code == 200
+    params = {"category": ["Books", "Office"], "title_prefix": "Book"}
+    r = client.get(
+        "/wishes/query", params={**params, "order_by": "price"}, headers=USER
+    )
+    assert [w["id"] for w in r.json()] == [2, 1, 3, 5]
+    r = client.get(
+        "/wishes/query",
+        params={**params, "price_gt": "10", "has_link": "false", "order_by": "title"},
+        headers=USER,
+    )
+    assert [w["id"] for w in r.json()] == [5, 3]
+
+
+def test_stats_group_by_matches_memory_rollups():
+    for i, (price, category) in enumerate(
+        [("10.00", "books"), ("30.00", "books"), (None, "books"), ("7.00", None)],
+        start=1,
+    ):
+        wish = {"id": i, "title": "t", "price_estimate": price, "category": category}
+        assert client.post("/wishes", json=wish, headers=USER).status_code == 200
+    r = client.get("/wishes/stats", headers=USER)
+    assert r.status_code == 200
+    books, other = r.json()["categories"]
+    assert books == {
+        "category": "books",
+        "count": 3,
+        "priced": 2,
+        "price_sum": "40.00",
+        "price_min": "10.00",
+        "price_max": "30.00",
+        "price_median": "20.00",
+    }
+    assert (other["category"], other["price_median"]) == (None, "7.00")
+
+
+def test_stats_queries_read_only_the_covering_index():
+    plans = _query_plans([((), {})], method="category_stats")
+    assert len(plans) == 2
+    for plan in plans:
+        assert "COVERING INDEX ix_wishes_owner_category_price" in plan, plan
+        assert "TEMP B-TREE" not in plan, plan
+
+
+def test_migrations_refuse_the_memory_backend():
+    env = {k: v for k, v in os.environ.items() if k != "DATABASE_URL"}
+    r = subprocess.run(
+        [sys.executable, "-m", "alembic", "upgrade", "head"],
+        env=env,
+        capture_output=True,
+        text=True,
+    )
+    assert r.returncode != 0
+    assert "is not a SQL database" in r.stderr
@@ -0,0 +1,91 @@
+import pytest
+from fastapi.testclient import TestClient
+
+from app.core.db import store
+from app.main import app
+
+client = TestClient(app)
+
+USER = {"X-Auth-Token": "token123"}
+OTHER = {"X-Auth-Token": "token456"}
+
+
+@pytest.fixture(autouse=True)
+def clear_db():
+    store.clear()
+
+
+def _seed():
+    wishes = [
+        (1, "10.00", "books"),
+        (2, "30.00", "books"),
+        (3, None, "books"),
+        (4, "15.50", "books"),
+        (5, "7.00", "games"),
+        (6, None, None),
+    ]
+    for wish_id, price, category in wishes:
+        wish = {
+            "id": wish_id,
+            "title": f"W{wish_id}",
+            "price_estimate": price,
+            "category": category,
+        }
+        assert client.post("/wishes", json=wish, headers=USER).status_code == 200
+
+
+def test_stats_rolls_up_prices_per_category():
+    _seed()
+    r = client.get("/wishes/stats", headers=USER)
+    assert r.status_code == 200
+    assert r.json() == {
+        "total": 6,
+        "categories": [
+            {
+                "category": "books",
+                "count": 4,
+                "priced": 3,
+                "price_sum": "55.50",
+                "price_min": "10.00",
+                "price_max": "30.00",
+                "price_median": "15.50",
+            },
+            {
+                "category": "games",
+                "count": 1,
+                "priced": 1,
+                "price_sum": "7.00",
+                "price_min": "7.00",
+                "price_max": "7.00",
+                "price_median": "7.00",
+            },
+            {
+                "category": None,
+                "count": 1,
+                "priced": 0,
+                "price_sum": "0.00",
+                "price_min": None,
+                "price_max": None,
+                "price_median": None,
+            },
+        ],
+    }
+    assert client.get("/wishes/stats", headers=OTHER).json() == {
+        "total": 0,
+        "categories": [],
+    }
+
+
+def test_stats_follow_writes_and_revalidate_with_etag():
+    _seed()
+    r = client.get("/wishes/stats", headers=USER)
+    etag = r.headers["ETag"]
+    r = client.get("/wishes/stats", headers={**USER, "If-None-Match": etag})
+    assert r.status_code == 304
+
+    client.delete("/wishes/4", headers=USER)
+    r = client.get("/wishes/stats", headers={**USER, "If-None-Match": etag})
+    assert r.status_code == 200
+    books = r.json()["categories"][0]
+    # Две цены — медиана как их среднее
+    assert (books["count"], books["price_median"]) == (3, "20.00")
@@ -0,0 +1,296 @@
+import sys
+import threading
+from decimal import Decimal
+
+import pytest
+from pydantic import TypeAdapter
+
+from app.core.batch import Change
+from app.core.store import WishStore
+from app.models.wish import Wish
+
+
+def _rec(owner, wish_id, **extra):
+    return {"id": wish_id, "title": f"W{wish_id}", "owner": owner, **extra}
+
+
+def test_add_is_scoped_per_owner_and_rejects_duplicates():
+    s = WishStore()
+    assert s.add("alice", _rec("alice", 1))
+    assert s.add("bob", _rec("bob", 1))
+    assert not s.add("alice", _rec("alice", 1))
+    assert len(s) == 2
+    assert s.get("alice", 1)["owner"] == "alice"
+    assert s.get("carol", 1) is None
+
+
+def test_replace_and_remove_keep_counts_consistent():
+    s = WishStore()
+    s.add("alice", _rec("alice", 1))
+    s.add("alice", _rec("alice", 2))
+
+    assert s.replace("alice", 1, _rec("alice", 2)) == "exists"
+    assert s.replace("alice", 9, _rec("alice", 9)) == "missing"
+    assert s.replace("alice", 1, _rec("alice", 3)) is None
+    assert [w["id"] for w in s.items("alice")] == [2, 3]
+
+    assert s.remove("alice", 2)
+    assert not s.remove("alice", 2)
+    assert len(s) == 1 and s.count("alice") == 1
+
+
+def test_extend_overwrites_existing_ids():
+    s = WishStore()
+    s.add("alice", _rec("alice", 1))
+    s.extend("alice", [_rec("alice", 1, notes="new"), _rec("alice", 2)])
+    assert len(s) == 2
+    assert s.get("alice", 1)["notes"] == "new"
+
+
+def test_sorted_index_follows_updates_and_deletes():
+    s = WishStore()
+    for i, price in enumerate(["5", None, "1", "3"], start=1):
+        s.add("alice", _rec("alice", i, price_estimate=price and Decimal(price)))
+
+    by_price = [w["id"] for w in s.page("alice", "price_estimate").items]
+    assert by_price == [2, 3, 4, 1]
+
+    s.replace("alice", 3, _rec("alice", 3, price_estimate=Decimal("9")))
+    s.remove("alice", 4)
+    desc = [w["id"] for w in s.page("alice", "price_estimate", ascending=False).items]
+    assert desc == [3, 1, 2]
+
+
+def test_title_index_after_bulk_extend():
+    s = WishStore()
+    s.add("alice", {"id": 1, "title": "b", "owner": "alice"})
+    s.extend(
+        "alice",
+        [{"id": i, "title": t, "owner": "alice"} for i, t in [(2, "c"), (3, "a")]],
+    )
+    assert [w["title"] for w in s.page("alice", "title").items] == ["a", "b", "c"]
+
+
+def test_price_range_skips_unpriced_and_bounds_are_strict():
+    s = WishStore()
+    s.add("alice", _rec("alice", 1, price_estimate=None))
+    s.add("alice", _rec("alice", 2, price_estimate=Decimal("0")))
+    s.add("alice", _rec("alice", 3, price_estimate=Decimal("10.00")))
+    s.add("alice", _rec("alice", 4, price_estimate=Decimal("15.50")))
+
+    def ids(**bounds):
+        return [w["id"] for w in s.page("alice", "price_estimate", **bounds).items]
+
+    assert ids(below=Decimal("10")) == [2]
+    assert ids(above=Decimal("10")) == [4]
+    assert ids(above=Decimal("-1")) == [2, 3, 4]
+
+
+def test_keyset_pages_cover_everything_once():
+    s = WishStore()
+    for i in range(1, 11):
+        s.add(
+            "alice", _rec("alice", i, price_estimate=Decimal(i % 3) if i % 4 else None)
+        )
+
+    seen, after = [], None
+    while True:
+        page = s.page("alice", "price_estimate", ascending=False, after=after, limit=3)
+        seen.extend(w["id"] for w in page.items)
+        if page.next_key is None:
+            break
+        after = page.next_key
+    full = [w["id"] for w in s.page("alice", "price_estimate", ascending=False).items]
+    assert seen == full and sorted(seen) == list(range(1, 11))
+
+
+def test_stats_track_every_write_path():
+    s = WishStore()
+    s.add("alice", _rec("alice", 1, price_estimate=Decimal("2"), category="x"))
+    s.extend(
+        "alice",
+        [
+            _rec("alice", 1, price_estimate=Decimal("3"), category="y"),
+            _rec("alice", 2, price_estimate=None, category="y"),
+        ],
+    )
+    s.replace("alice", 2, _rec("alice", 2, price_estimate=Decimal("1")))
+    s.add("bob", _rec("bob", 1, price_estimate=Decimal("4"), category="x"))
+    s.remove("bob", 1)
+
+    assert (s.stats.total, s.stats.priced, s.stats.price_sum) == (2, 2, Decimal("4"))
+    assert s.stats.by_category == {"y": 1}
+
+
+def test_encode_matches_response_model_and_follows_updates():
+    s = WishStore()
+    s.add(
+        "alice",
+        {
+            "id": 1,
+            "title": 'Книга "Ё" \x01',
+            "link": None,
+            "price_estimate": Decimal("1.50"),
+            "notes": "\t",
+            "category": "books",
+            "owner": "alice",
+        },
+    )
+    s.add("alice", _rec("alice", 2, price_estimate=Decimal("100")))
+    records = s.page("alice").items
+    adapter = TypeAdapter(list[Wish])
+    assert s.encode("alice", records) == adapter.dump_json(
+        adapter.validate_python(records)
+    )
+
+    s.replace("alice", 2, _rec("alice", 2, title="new"))
+    assert b'"title":"new"' in s.encode("alice", s.page("alice").items)
+    assert s.version("alice") > 0
+
+    # Страница прочитана до записи: её JSON не должен остаться в кэше
+    stale = s.page("alice").items
+    s.replace("alice", 2, _rec("alice", 2, title="newer"))
+    assert b'"title":"new"' in s.encode("alice", stale)
+    assert b'"title":"newer"' in s.encode("alice", s.page("alice").items)
+
+
+def test_compact_records_unpack_to_wish_shape():
+    s = WishStore()
+    s.add("alice", _rec("alice", 1, price_estimate=Decimal("1.5"), category="books"))
+    s.add("alice", _rec("alice", 2, price_estimate=Decimal("2.25")))
+    assert s.get("alice", 1) == {
+        "id": 1,
+        "title": "W1",
+        "link": None,
+        "price_estimate": Decimal("1.50"),
+        "notes": None,
+        "category": "books",
+        "owner": "alice",
+    }
+
+    # Границы и курсор не обязаны попадать в копейки
+    def ids(**kw):
+        return [w["id"] for w in s.page("alice", "price_estimate", **kw).items]
+
+    assert ids(below=Decimal("1.505")) == [1]
+    assert ids(above=Decimal("1.495")) == [1, 2]
+    assert ids(after=(Decimal("1.505"), 0)) == [2]
+    page = s.page("alice", "price_estimate", limit=1)
+    assert page.next_key == (Decimal("1.50"), 1)
+
+
+@pytest.fixture
+def racy():
+    # Частое переключение потоков, чтобы гонки проявлялись в пределах теста
+    interval = sys.getswitchinterval()
+    sys.setswitchinterval(1e-6)
+    yield
+    sys.setswitchinterval(interval)
+
+
+def _run_threads(n, target):
+    threads = [threading.Thread(target=target, args=(t,)) for t in range(n)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+
+def test_concurrent_inserts_and_deletes_neither_duplicate_nor_lose(racy):
+    s = WishStore(stripes=4)
+    owners = [f"user{i}" for i in range(6)]
+    added, removed = [], []
+
+    def insert(t):
+        mine = []
+        for wish_id in range(300):
+            owner = owners[(wish_id + t) % len(owners)]
+            if s.add(owner, _rec(owner, wish_id)):
+                mine.append((owner, wish_id))
+        added.extend(mine)
+
+    _run_threads(8, insert)
+    # Каждый id пробуют все владельцы, и ровно одна вставка на пару успешна
+    assert len(added) == len(set(added)) == 300 * len(owners)
+    assert len(s) == s.stats.total == len(added)
+
+    def delete(t):
+        mine = [(o, i) for o, i in sorted(added) if s.remove(o, i)]
+        removed.extend(mine)
+
+    _run_threads(8, delete)
+    assert sorted(removed) == sorted(added)
+    assert len(s) == 0 and s.owners() == 0 and s.stats.by_category == {}
+
+
+def test_compare_and_swap_updates_lose_nothing(racy):
+    s = WishStore()
+    s.add("alice", _rec("alice", 1, notes="0"))
+
+    def increment(t):
+        for _ in range(200):
+            while True:
+                current = s.get("alice", 1)
+                updated = {**current, "notes": str(int(current["notes"]) + 1)}
+                if s.replace("alice", 1, updated, expected=current) is None:
+                    break
+
+    _run_threads(8, increment)
+    assert s.get("alice", 1)["notes"] == "1600"
+
+    stale = s.get("alice", 1)
+    s.replace("alice", 1, {**stale, "title": "changed"})
+    assert not s.remove("alice", 1, expected=stale)
+    assert s.remove("alice", 1, expected=s.get("alice", 1))
+
+
+def test_search_index_follows_writes_and_bulk_import():
+    s = WishStore()
+    s.add("alice", _rec("alice", 1, title="Red bicycle", notes="road bike"))
+    s.add("alice", _rec("alice", 2, title="Bike lights", category="Bikes"))
+    s.extend("alice", [_rec("alice", i, notes="bicycle pump") for i in range(3, 8)])
+
+    def ids(*terms, **kw):
+        return [w["id"] for w in s.search("alice", list(terms), **kw).items]
+
+    # Название весит больше заметок, при равном ранге — по id
+    assert ids("bicycle") == [1, 3, 4, 5, 6, 7]
+    assert ids("bi") == [1, 2, 3, 4, 5, 6, 7]
+    assert ids("bike", category="BIKES") == [2]
+
+    s.replace("alice", 1, _rec("alice", 1, title="Ёлочная игрушка"))
+    s.remove("alice", 3)
+    assert ids("ёлочная") == [1]
+    assert ids("bicycle") == [4, 5, 6, 7]
+    assert ids("red") == []
+
+    page = s.search("alice", ["bicycle"], limit=3)
+    assert page.next_key == (-1, 6)
+    rest = s.search("alice", ["bicycle"], after=page.next_key)
+    assert [w["id"] for w in rest.items] == [7]
+
+
+def test_category_rollups_match_a_rebuild_after_writes():
+    s = WishStore()
+    s.extend(
+        "alice",
+        [
+            _rec("alice", i, price_estimate=Decimal(i), category=f"c{i % 3}")
+            for i in range(1, 31)
+        ],
+    )
+    s.add("alice", _rec("alice", 31, category="c1"))
+    s.replace("alice", 2, _rec("alice", 2, price_estimate=Decimal("99.99")))
+    s.replace("alice", 4, _rec("alice", 40, price_estimate=Decimal(1), category="c0"))
+    s.remove("alice", 5)
+    s.apply("alice", [Change("delete", 6), Change("delete", 9)])
+
+    incremental = s.category_stats("alice")
+    rebuilt = WishStore()
+    rebuilt.extend("alice", s.items("alice"))
+    assert incremental == rebuilt.category_stats("alice")
+    assert [r["category"] for r in incremental] == ["c0", "c1", "c2", None]
+    c0 = incremental[0]
+    # c0: цены 3, 12, 15, ..., 30 и перенесённая в неё запись 40 с ценой 1
+    assert (c0["count"], c0["price_min"], c0["price_max"]) == (9, 1, 30)
+    assert c0["price_median"] == 18